@@ -0,0 +1,433 @@
+"""
+Benchmark suite for Krokmou Bot
+Runs the bot offline against local stand-ins for OpenRouter, NewsAPI and Twitter
+and reports latency percentiles, throughput and peak memory as JSON.
+
+Usage:
+    py benchmark.py --output bench.json
+    py benchmark.py --sizes 1000,10000,100000,1000000 --latency-ms 200 --error-rate 0.05
+    py benchmark.py --output new.json --compare bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import subprocess
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory comes from psutil if installed, else tracemalloc
+    resource = None
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+REPO_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+SYLLABLES = ("ka ro mi nu pa te lo zi vu be sa fo gri mou cha pel tor van dil ses "
+             "ur ok ish ne ba do ri ga lu pon mer sti ble ck tra").split()
+OPENINGS = ["Today", "Behold", "Mrrp", "Breaking news", "Confession", "Update", "Hmm", "Once again", "Alert"]
+
+
+def _vocabulary(size=5000, seed=42):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+
+WORDS = _vocabulary()
+HEADLINE_SUBJECTS = ["Trump", "Macron", "Putin", "Nvidia", "Musk", "China", "France", "Ukraine", "OpenAI", "Local council"]
+HEADLINE_VERBS = ["announces", "rejects", "unveils", "warns about", "delays", "celebrates", "investigates", "debates"]
+HEADLINE_OBJECTS = ["new tariffs", "election reform", "GPU prices", "nuclear talks", "AI rules", "a bakery festival",
+                    "military drills", "rail strike", "space launch", "budget cuts"]
+
+
+def synthetic_tweet(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(10, 24))]
+    return f"{rng.choice(OPENINGS)}: {' '.join(words)}."[:200]
+
+
+def synthetic_headline(rng):
+    return f"{rng.choice(HEADLINE_SUBJECTS)} {rng.choice(HEADLINE_VERBS)} {rng.choice(HEADLINE_OBJECTS)} {rng.randint(1, 99999)}"
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3),
+        "p50_ms": round(1000 * pick(0.50), 3),
+        "p90_ms": round(1000 * pick(0.90), 3),
+        "p99_ms": round(1000 * pick(0.99), 3),
+        "max_ms": round(1000 * ordered[-1], 3),
+    }
+
+
+# =========================================================================
+# FAKE SERVICES
+# =========================================================================
+
+class FakeServices:
+    """
+    One local HTTP server answering chat completions, top-headlines and
+    create-tweet requests, with configurable latency, error rate and payload size.
+    """
+
+    def __init__(self, latency_ms=0, error_rate=0.0, articles=20, seed=0):
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.articles = articles
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {"chat": 0, "headlines": 0, "tweets": 0, "errors": 0}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _fail(self):
+                with services.lock:
+                    failing = services.rng.random() < services.error_rate
+                    if failing:
+                        services.requests["errors"] += 1
+                if failing:
+                    self._send(503, {"error": {"message": "synthetic failure"}})
+                return failing
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                time.sleep(services.latency)
+                with services.lock:
+                    services.requests["headlines"] += 1
+                if self._fail():
+                    return
+                with services.lock:
+                    articles = [
+                        {"title": synthetic_headline(services.rng),
+                         "description": " ".join(services.rng.choice(WORDS) for _ in range(25))}
+                        for _ in range(services.articles)
+                    ]
+                self._send(200, {"status": "ok", "totalResults": len(articles), "articles": articles})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                time.sleep(services.latency)
+
+                if self.path.startswith("/2/tweets"):
+                    with services.lock:
+                        services.requests["tweets"] += 1
+                        tweet_id = str(services.rng.randint(10 ** 17, 10 ** 18))
+                    if self._fail():
+                        return
+                    self._send(201, {"data": {"id": tweet_id, "text": payload.get("text", "")}})
+                    return
+
+                with services.lock:
+                    services.requests["chat"] += 1
+                if self._fail():
+                    return
+                with services.lock:
+                    choices = [
+                        {"index": i, "message": {"role": "assistant", "content": synthetic_tweet(services.rng)}}
+                        for i in range(payload.get("n", 1))
+                    ]
+                self._send(200, {"choices": choices})
+
+        return Handler
+
+
+def redirect_session(target):
+    """Point the bot's shared HTTP session at the fake services"""
+    from requests.adapters import HTTPAdapter
+    from http_session import get_session, HOST_POOLS
+
+    class RedirectAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            for base in HOST_POOLS:
+                if request.url.startswith(base):
+                    request.url = target + "/" + request.url[len(base):]
+                    break
+            return super().send(request, **kwargs)
+
+    session = get_session()
+    for base in HOST_POOLS:
+        session.mount(base, RedirectAdapter(pool_maxsize=16))
+
+
+# =========================================================================
+# BENCHMARKS
+# =========================================================================
+
+def max_rss_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be read"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss) / 2 ** 20
+
+
+def bench_similarity(sizes, queries, rng, trace_memory=False):
+    from tweet_history import TweetHistory
+
+    results = {}
+    for size in sizes:
+        path = f"history_{size}.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            for _ in range(size):
+                f.write(synthetic_tweet(rng) + "\n")
+
+        # tracemalloc is exact but slows index building by an order of magnitude,
+        # so timing and the default memory figure come from peak RSS when it is readable
+        rss_before = max_rss_mb()
+        traced = trace_memory or rss_before is None
+        if traced:
+            tracemalloc.start()
+        started = time.perf_counter()
+        history = TweetHistory(path)
+        loaded = len(history)
+        load_seconds = time.perf_counter() - started
+        memory = {}
+        if rss_before is not None:
+            memory["peak_rss_growth_mb"] = round(max_rss_mb() - rss_before, 2)
+        if traced:
+            memory["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            tracemalloc.stop()
+
+        samples = []
+        existing = history.recent(queries)
+        for i in range(queries):
+            # Mix near-duplicates of real history lines with fresh text
+            candidate = existing[i % len(existing)] + " again" if i % 2 else synthetic_tweet(rng)
+            started = time.perf_counter()
+            history.is_similar(candidate)
+            samples.append(time.perf_counter() - started)
+
+        results[str(size)] = {
+            "tweets": loaded,
+            "load_seconds": round(load_seconds, 3),
+            "load_tweets_per_second": round(loaded / load_seconds, 1) if load_seconds else None,
+            **memory,
+            "query": percentiles(samples),
+            "queries_per_second": round(len(samples) / sum(samples), 1) if sum(samples) else None,
+        }
+        os.remove(path)
+    return results
+
+
+def bench_get_headline(news_config, iterations):
+    from news_client import NewsClient
+
+    news = NewsClient()
+    config = {**news_config, "cache_ttl_minutes": 0, "ingest": {"enabled": False}}
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        news.get_headline(config)
+        samples.append(time.perf_counter() - started)
+    return {"latency": percentiles(samples), "per_second": round(len(samples) / sum(samples), 2)}
+
+
+def bench_post_tweet(iterations):
+    import main
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        main.post_tweet()
+        samples.append(time.perf_counter() - started)
+    return {"latency": percentiles(samples), "per_second": round(len(samples) / sum(samples), 2)}
+
+
+def bench_startup(runs):
+    """Cold-start cost of the bot: import profile of main and wall time of --check"""
+    env = {**os.environ, "PYTHONPATH": SRC_DIR}
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            env=env, capture_output=True, text=True)
+
+    # -X importtime lines look like "import time: self | cumulative | <indent>module";
+    # children are listed (two spaces deeper) right before their parent
+    modules = {}
+    children = []
+    direct_imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        modules[name] = int(cumulative)
+        if depth == 1:
+            children.append((int(cumulative), name))
+        elif depth == 0:
+            if name == "main":
+                direct_imports = sorted(children, reverse=True)
+            children = []
+
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(SRC_DIR, "main.py"), "--check"],
+                       env=env, capture_output=True)
+        samples.append(time.perf_counter() - started)
+
+    return {
+        "import_main_ms": round(modules.get("main", 0) / 1000, 2),
+        "heaviest_imports_ms": {name: round(us / 1000, 2) for us, name in direct_imports[:8]},
+        "imports_requests": "requests" in modules,
+        "imports_tweepy": "tweepy" in modules,
+        "check": percentiles(samples),
+    }
+
+
+def compare(current, baseline_path):
+    """Print the relative change of every latency metric against a previous run"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def walk(new, old, prefix=""):
+        for key, value in new.items():
+            name = f"{prefix}.{key}" if prefix else key
+            if isinstance(value, dict) and isinstance(old.get(key), dict):
+                walk(value, old[key], name)
+            elif isinstance(value, (int, float)) and isinstance(old.get(key), (int, float)) and old[key]:
+                change = (value - old[key]) / old[key]
+                print(f"{name:60s} {old[key]:>12} -> {value:>12}  ({change:+.1%})")
+
+    walk(current["results"], baseline.get("results", {}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Krokmou Bot benchmark")
+    parser.add_argument("--sizes", default="1000,10000", help="History sizes for similarity checks")
+    parser.add_argument("--queries", type=int, default=200, help="Similarity checks per history size")
+    parser.add_argument("--iterations", type=int, default=20, help="Cycles for get_headline and post_tweet")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Cold starts of main.py --check to time")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Fake service latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake requests failing with 503")
+    parser.add_argument("--articles", type=int, default=20, help="Articles per top-headlines response")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also measure exact allocation peaks with tracemalloc (much slower)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="krokmou-bench-")
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    with open(REPO_CONFIG, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    news_config = config.get("news_awareness", {})
+    config["tweet_bank"] = {"enabled": False}
+    config["news_awareness"] = {**news_config, "cache_ttl_minutes": 0, "ingest": {"enabled": False}}
+
+    os.chdir(workdir)
+    with open("config.json", "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    for name in ("OPENROUTER_API_KEY", "NEWSAPI_KEY", "TWITTER_API_KEY", "TWITTER_API_SECRET",
+                 "TWITTER_ACCESS_TOKEN", "TWITTER_ACCESS_TOKEN_SECRET"):
+        os.environ[name] = "benchmark"
+    sys.path.insert(0, SRC_DIR)
+
+    services = FakeServices(args.latency_ms, args.error_rate, args.articles, args.seed).start()
+    try:
+        redirect_session(services.url)
+        logging.getLogger().setLevel(logging.WARNING)
+
+        started = time.perf_counter()
+        results = {
+            "startup": bench_startup(args.startup_runs),
+            "similarity": bench_similarity([int(s) for s in args.sizes.split(",") if s], args.queries, rng,
+                                           args.trace_memory),
+            "get_headline": bench_get_headline(news_config, args.iterations),
+        }
+        results["post_tweet"] = bench_post_tweet(args.iterations)
+        from metrics import get_metrics
+        results["stages"] = get_metrics().snapshot()
+        results["fake_requests"] = dict(services.requests)
+        results["total_seconds"] = round(time.perf_counter() - started, 3)
+        peak = max_rss_mb()
+        results["max_rss_mb"] = round(peak, 1) if peak is not None else None
+    finally:
+        services.stop()
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline:
+        compare(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
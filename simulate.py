@@ -0,0 +1,476 @@
+"""
+Schedule simulator for Krokmou Bot
+Runs the real slot schedule, news policy, headline selection and history stores
+on a virtual clock with stub generators, and reports what a year of posting looks like.
+
+Usage:
+    py simulate.py
+    py simulate.py --days 90 --set news_awareness.probability=0.3 --output sim.json
+    py simulate.py --feed headlines.jsonl --article-hours 24
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import random
+import shutil
+import sqlite3
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+REPO_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+NEUTRAL_SUBJECTS = ["Local council", "City hall", "Dairy farmers", "Rail workers", "The central bank",
+                    "Astronomers", "A museum", "Fishermen", "The weather service", "A football club"]
+VERBS = ["announces", "rejects", "unveils", "warns about", "delays", "celebrates", "investigates",
+         "debates", "cancels", "expands"]
+OBJECTS = ["new tariffs", "election reform", "chip exports", "nuclear talks", "a budget plan", "drone rules",
+           "a border deal", "rail strike", "a space launch", "pension cuts", "a bakery festival",
+           "flood defences", "a trade summit", "energy prices", "a vaccine rollout"]
+PLACES = ["Paris", "Lyon", "Berlin", "Geneva", "Brussels", "Warsaw", "Madrid", "Rome", "Tokyo", "Ottawa",
+          "Nairobi", "Lisbon", "Seoul", "Oslo", "Vienna"]
+OUTLET_TITLES = [
+    "{subject} {verb} {object} in {place}",
+    "{place}: {subject} {verb} {object}",
+    "{subject} {verb} {object}, officials in {place} say",
+    "Live: {subject} {verb} {object} in {place}",
+]
+SYLLABLES = "ka ro mi nu pa te lo zi vu be sa fo gri mou cha pel tor van dil ses ur ok ish ne ba".split()
+
+
+# =========================================================================
+# HEADLINE FEEDS
+# =========================================================================
+
+class Feed:
+    """
+    Articles with a publication time, each tagged with the story it reports.
+
+    An article is returned by fetches from its publication time until
+    article_hours later, newest first, like a top-headlines endpoint.
+    """
+
+    def __init__(self, articles, article_hours=12, per_fetch=20):
+        self.articles = sorted(articles, key=lambda a: a["published"])
+        self.times = [a["published"] for a in self.articles]
+        self.lifetime = timedelta(hours=article_hours)
+        self.per_fetch = per_fetch
+        self.stories = {a["title"]: a["story"] for a in self.articles}
+
+    def visible(self, moment):
+        start = bisect.bisect_right(self.times, moment - self.lifetime)
+        end = bisect.bisect_right(self.times, moment)
+        return self.articles[max(start, end - self.per_fetch):end][::-1]
+
+
+def _subjects(keywords):
+    """Newsworthy subjects from the configured keyword aliases, plus some that match nothing"""
+    subjects = []
+    for group in keywords.values():
+        for alias in group.get("aliases", []):
+            if len(alias) > 3 and "'" not in alias and "." not in alias:
+                subjects.append(alias.title())
+    return subjects or ["Officials"]
+
+
+def synthetic_feed(start, end, keywords, stories_per_day, rng):
+    """Stories published around the clock, each carried by one to four outlets"""
+    subjects = _subjects(keywords)
+    articles = []
+    moment, story = start, 0
+    while moment < end:
+        moment += timedelta(hours=rng.expovariate(stories_per_day / 24.0))
+        story += 1
+        words = {
+            "subject": rng.choice(subjects if rng.random() < 0.5 else NEUTRAL_SUBJECTS),
+            "verb": rng.choice(VERBS),
+            "object": rng.choice(OBJECTS),
+            "place": rng.choice(PLACES),
+        }
+        outlets = 1
+        while outlets < len(OUTLET_TITLES) and rng.random() < 0.45:
+            outlets += 1
+        for position, template in enumerate(rng.sample(OUTLET_TITLES, outlets)):
+            articles.append({
+                "title": f"{template.format(**words)} ({story})",
+                "description": (f"{words['subject']} {words['verb']} {words['object']} in {words['place']}, "
+                                f"according to {('local', 'wire', 'regional', 'foreign')[position]} reports."),
+                "published": moment + timedelta(minutes=rng.randint(0, 180) * position),
+                "story": story,
+            })
+    return articles
+
+
+def recorded_feed(path, tz):
+    """
+    Articles from a JSON-lines file of NewsAPI article objects.
+
+    Each line needs title and publishedAt; an optional "story" groups
+    articles reporting the same event (defaults to the title).
+    """
+    articles = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            article = json.loads(line)
+            published = datetime.fromisoformat(article["publishedAt"].replace("Z", "+00:00"))
+            if published.tzinfo is not None:
+                published = published.astimezone(tz).replace(tzinfo=None)
+            articles.append({
+                "title": article["title"],
+                "description": article.get("description") or "",
+                "published": published,
+                "story": article.get("story", article["title"]),
+            })
+    return articles
+
+
+# =========================================================================
+# STUB CLIENTS
+# =========================================================================
+
+def synthetic_tweet(rng, serial):
+    words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(12, 24))]
+    return f"Mrrp {serial}: {' '.join(words)}."[:240]
+
+
+class StubAI:
+    """Regular tweets without a model"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.generated = 0
+
+    def generate_tweet(self, candidates=1, stream=False, history_tokens=300, context=None):
+        self.generated += 1
+        return synthetic_tweet(self.rng, self.generated)
+
+
+class StubTwitter:
+    """Accepts every post"""
+
+    def __init__(self):
+        self.posted = 0
+
+    def tweet_url(self, tweet_id):
+        return f"https://twitter.com/simulated/status/{tweet_id}"
+
+    def create(self, text):
+        self.posted += 1
+        return str(self.posted)
+
+    def find_recent(self, text, limit=20):
+        return None
+
+
+def simulated_news_client(feed, rng):
+    """NewsClient reading headlines from a feed at the virtual time, with a stub news generator"""
+    import clock
+    from news_client import NewsClient
+
+    class SimulatedNewsClient(NewsClient):
+        blocked = 0
+
+        def _fetch(self, config):
+            return [
+                {"title": a["title"], "description": a["description"],
+                 "_category": "general", "_country": "sim"}
+                for a in feed.visible(clock.now())
+            ]
+
+        def is_covered(self, headline, keywords):
+            covered = super().is_covered(headline, keywords)
+            self.blocked += covered
+            return covered
+
+        def generate_news_tweet(self, headline, description, max_attempts=5, stream=False, history_tokens=180):
+            return f"{headline[:120]} ... {synthetic_tweet(rng, 0)}"[:280]
+
+    return SimulatedNewsClient
+
+
+# =========================================================================
+# REPORTING
+# =========================================================================
+
+def _rows(path, table):
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def _kb(path):
+    return round(os.path.getsize(path) / 1024, 1) if os.path.exists(path) else 0.0
+
+
+def store_sample(account, moment):
+    return {
+        "at": moment.date().isoformat(),
+        "history_tweets": len(account.tweet_history),
+        "history_kb": _kb(account.history_file),
+        "news_db_kb": _kb(account.news_db),
+        "news_wal_kb": _kb(f"{account.news_db}-wal"),
+        "topics": _rows(account.news_db, "topics"),
+        "articles": _rows(account.news_db, "articles"),
+        "outbox_kb": _kb(account.outbox_file),
+        "outbox_wal_kb": _kb(f"{account.outbox_file}-wal"),
+        "outbox_entries": _rows(account.outbox_file, "outbox"),
+    }
+
+
+def posting_report(posts, feed, cooldown_hours, max_per_week):
+    """Ratios, weekly news counts and repeated stories from (time, source, headline) records"""
+    by_source = {}
+    for _, source, _ in posts:
+        by_source[source] = by_source.get(source, 0) + 1
+    news = [(moment, headline) for moment, source, headline in posts if source == "news"]
+    total = len(posts)
+
+    weeks = {}
+    for moment, _ in news:
+        week = moment.isocalendar()[:2]
+        weeks[week] = weeks.get(week, 0) + 1
+    span_weeks = max(1.0, (posts[-1][0] - posts[0][0]).total_seconds() / (7 * 86400)) if posts else 1.0
+
+    gaps = [(b[0] - a[0]).total_seconds() / 3600 for a, b in zip(news, news[1:])]
+    rolling = 0
+    for position, (moment, _) in enumerate(news):
+        rolling = max(rolling, sum(1 for other, _ in news[position:] if other - moment < timedelta(days=7)))
+
+    seen, repeats, repeats_72h, repeats_7d = {}, 0, 0, 0
+    for moment, headline in news:
+        story = feed.stories.get(headline, headline)
+        if story in seen:
+            repeats += 1
+            since = moment - seen[story]
+            repeats_72h += since < timedelta(hours=72)
+            repeats_7d += since < timedelta(days=7)
+        seen[story] = moment
+
+    return {
+        "tweets": total,
+        "by_source": by_source,
+        "news_ratio": round(len(news) / total, 4) if total else 0.0,
+        "news_to_regular": round(len(news) / by_source["regular"], 4) if by_source.get("regular") else None,
+        "news_per_week": {
+            "mean": round(len(news) / span_weeks, 2),
+            "max_calendar_week": max(weeks.values(), default=0),
+            "max_any_7_days": rolling,
+            "limit": max_per_week,
+        },
+        "news_gap_hours": {
+            "min": round(min(gaps), 1) if gaps else None,
+            "mean": round(sum(gaps) / len(gaps), 1) if gaps else None,
+            "cooldown": cooldown_hours,
+        },
+        "collisions": {
+            "stories_covered": len(seen),
+            "repeated_story": repeats,
+            "repeated_within_72h": repeats_72h,
+            "repeated_within_7d": repeats_7d,
+        },
+    }
+
+
+# =========================================================================
+# SIMULATION
+# =========================================================================
+
+def simulate_account(account, feed, start, end, rng, tz_name):
+    import main
+    import clock
+    from news_store import get_news_store
+    from scheduler import SlotScheduler
+    from metrics import get_metrics
+
+    virtual = clock.VirtualClock(start, tz_name)
+    clock.set_clock(virtual)
+
+    account._ai = StubAI(rng)
+    account._twitter = StubTwitter()
+    account._news = simulated_news_client(feed, rng)(
+        tweet_history=account.tweet_history,
+        store=get_news_store(account.news_db, account.news_json)
+    )
+
+    posts = []
+    record = account.sender.on_posted
+
+    def on_posted(entry):
+        record(entry)
+        posts.append((clock.now(), entry["source"], entry["headline"]))
+
+    account.sender.on_posted = on_posted
+
+    settings = account.settings(main.load_config())
+    news_config = settings.get("news_awareness", {})
+    ingest_config = news_config.get("ingest", {})
+    scheduler = SlotScheduler(
+        settings.slots,
+        lambda: main.post_tweet(account),
+        timezone=tz_name,
+        state_file=account.state_file
+    )
+    ingest_every = timedelta(minutes=ingest_config.get("interval_minutes", 60))
+    ingests = 0
+    next_ingest = virtual.now()
+
+    counters_before = dict(get_metrics().snapshot()["counters"])
+    samples = []
+    next_sample = start
+    slots = 0
+    while True:
+        slot = scheduler.next_slot(clock.now(scheduler.tz))
+        if slot.astimezone(scheduler.tz).replace(tzinfo=None) >= end:
+            break
+
+        # The background ingestor between slots
+        if news_config.get("enabled", False) and ingest_config.get("enabled", False):
+            local_slot = slot.astimezone(scheduler.tz).replace(tzinfo=None)
+            while next_ingest < local_slot:
+                virtual.set(next_ingest)
+                account.news.ingest(news_config, settings.news)
+                ingests += 1
+                next_ingest += ingest_every
+
+        virtual.set(slot)
+        if virtual.now() >= next_sample:
+            samples.append(store_sample(account, virtual.now()))
+            next_sample = (next_sample.replace(day=1) + timedelta(days=32)).replace(day=1)
+        scheduler.run_slot(slot)
+        slots += 1
+
+    samples.append(store_sample(account, virtual.now()))
+    clock.set_clock(None)
+
+    counters = get_metrics().snapshot()["counters"]
+    gate = {}
+    for name, value in counters.items():
+        if name.startswith("news_gate{reason="):
+            reason = name[len("news_gate{reason="):-1]
+            gate[reason] = value - counters_before.get(name, 0)
+
+    report = posting_report(
+        posts, feed, news_config.get("cooldown_hours", 24), news_config.get("max_per_week", 2)
+    )
+    report["collisions"]["blocked_as_covered"] = account.news.blocked
+    # Passed the gate but found no uncovered headline (or the news generator gave up)
+    gate["no_headline"] = gate.get("passed", 0) - report["by_source"].get("news", 0)
+    return {
+        "slots": slots,
+        "ingests": ingests,
+        **report,
+        "news_gate": gate,
+        "store_growth": samples,
+    }
+
+
+def apply_override(config, assignment):
+    """Set a dotted config key from "path.to.key=json value" """
+    path, _, raw = assignment.partition("=")
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        value = raw
+    keys = path.split(".")
+    section = config
+    for key in keys[:-1]:
+        section = section.setdefault(key, {})
+    section[keys[-1]] = value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate Krokmou Bot's posting schedule on virtual time")
+    parser.add_argument("--days", type=float, default=365, help="Length of the simulated period")
+    parser.add_argument("--start", default="2025-01-01", help="Local start date (YYYY-MM-DD[THH:MM])")
+    parser.add_argument("--feed", help="JSON-lines file of recorded NewsAPI articles (default: synthetic)")
+    parser.add_argument("--stories-per-day", type=float, default=30, help="Synthetic feed story rate")
+    parser.add_argument("--article-hours", type=float, default=12, help="How long an article stays in the feed")
+    parser.add_argument("--articles", type=int, default=20, help="Articles returned per fetch")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a config value, e.g. news_awareness.probability=0.3")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="krokmou-sim-")
+    output = os.path.abspath(args.output) if args.output else None
+    feed_path = os.path.abspath(args.feed) if args.feed else None
+
+    with open(REPO_CONFIG, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    # Banked tweets and timeline sync are background threads on wall time
+    config["tweet_bank"] = {"enabled": False}
+    config["timeline_sync"] = {"enabled": False}
+    for assignment in args.set:
+        apply_override(config, assignment)
+
+    os.chdir(workdir)
+    with open("config.json", "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    for name in ("OPENROUTER_API_KEY", "NEWSAPI_KEY", "TWITTER_API_KEY", "TWITTER_API_SECRET",
+                 "TWITTER_ACCESS_TOKEN", "TWITTER_ACCESS_TOKEN_SECRET"):
+        os.environ[name] = "simulation"
+    sys.path.insert(0, SRC_DIR)
+
+    try:
+        import pytz
+        import main as bot
+
+        logging.getLogger().setLevel(logging.WARNING)
+        start = datetime.fromisoformat(args.start)
+        end = start + timedelta(days=args.days)
+
+        started = time.perf_counter()
+        accounts = {}
+        for account in bot.get_accounts(bot.load_config()):
+            settings = account.settings(bot.load_config())
+            tz_name = settings.get("schedule", {}).get("timezone", os.getenv("TIMEZONE", "Europe/Paris"))
+            news_config = settings.get("news_awareness", {})
+            if feed_path:
+                articles = recorded_feed(feed_path, pytz.timezone(tz_name))
+            else:
+                articles = synthetic_feed(start, end, news_config.get("keywords", {}), args.stories_per_day, rng)
+            feed = Feed(articles, args.article_hours, args.articles)
+            accounts[account.name] = simulate_account(account, feed, start, end, rng, tz_name)
+        results = {
+            "accounts": accounts,
+            "wall_seconds": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Accounts for Krokmou Bot
+Builds one set of clients and stores per bot persona defined in config.json.
+"""
+
+import re
+import logging
+import importlib
+import threading
+
+try:
+    from .news_store import NEWS_DB_FILE, NEWS_HISTORY_FILE
+    from .tweet_history import get_history, HISTORY_FILE
+    from .scheduler import SCHEDULER_STATE_FILE
+    from .outbox import Outbox, OutboxSender, OUTBOX_FILE
+    from .timeline_sync import TimelineSync, TIMELINE_STATE_FILE
+    from .config_service import Config, thaw
+    from .metrics import get_metrics
+except ImportError:
+    from news_store import NEWS_DB_FILE, NEWS_HISTORY_FILE
+    from tweet_history import get_history, HISTORY_FILE
+    from scheduler import SCHEDULER_STATE_FILE
+    from outbox import Outbox, OutboxSender, OUTBOX_FILE
+    from timeline_sync import TimelineSync, TIMELINE_STATE_FILE
+    from config_service import Config, thaw
+    from metrics import get_metrics
+
+DEFAULT_ACCOUNT = {"name": "krokmou"}
+
+# Config sections an account may override key by key
+OVERRIDABLE_SECTIONS = ("schedule", "generation", "tweet_bank", "news_awareness", "timeline_sync")
+
+logger = logging.getLogger(__name__)
+
+
+def _sibling(module, name):
+    """Import a name from a sibling module on first use (keeps requests/tweepy off the startup path)"""
+    return getattr(importlib.import_module(f"{__package__}.{module}" if __package__ else module), name)
+
+
+def _read_prompt(path):
+    if not path:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class Account:
+    """
+    One bot persona: its Twitter credentials, prompts, tweet history,
+    news store and config overrides.
+
+    The first account keeps the historical file names (tweet_history.txt,
+    news_history.db, TWITTER_* credentials) so single-persona setups need
+    no changes; later accounts get per-name defaults. Clients are built
+    on first use, so a cycle that never posts never loads tweepy.
+    """
+
+    def __init__(self, spec, primary=False):
+        self.spec = spec
+        self.name = spec["name"]
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", self.name):
+            raise ValueError(f"Invalid account name: {self.name!r}")
+
+        suffix = "" if primary else f"_{self.name}"
+        self.history_file = spec.get("history_file", HISTORY_FILE if primary else f"tweet_history{suffix}.txt")
+        self.news_db = spec.get("news_db", NEWS_DB_FILE if primary else f"news_history{suffix}.db")
+        self.state_file = spec.get("state_file", SCHEDULER_STATE_FILE if primary else f"scheduler_state{suffix}.json")
+        self.bank_file = spec.get("bank_file", f"tweet_bank{suffix}.json")
+        self.outbox_file = spec.get("outbox_file", OUTBOX_FILE if primary else f"outbox{suffix}.db")
+        self.timeline_state_file = spec.get(
+            "timeline_state_file", TIMELINE_STATE_FILE if primary else f"timeline_state{suffix}.json"
+        )
+        self.news_json = NEWS_HISTORY_FILE if primary else f"news_history{suffix}.json"
+        self.credentials_prefix = spec.get(
+            "credentials_prefix", "TWITTER_" if primary else f"{self.name.upper()}_TWITTER_"
+        )
+
+        # Read eagerly so a missing prompt file disables the account at startup
+        self.prompt = _read_prompt(spec.get("prompt_file"))
+        self.news_prompt = _read_prompt(spec.get("news_prompt_file"))
+
+        self.tweet_history = get_history(self.history_file)
+        self.bank = None
+        # Held for a whole tweet cycle so an account never posts twice at once
+        self.lock = threading.Lock()
+        self._clients_lock = threading.Lock()
+        self._ai = None
+        self._twitter = None
+        self._news = None
+        self._sender = None
+        self.timeline = TimelineSync(lambda: self.twitter, self.tweet_history, self.timeline_state_file)
+
+    # =========================================================================
+    # CLIENTS
+    # =========================================================================
+
+    @property
+    def ai(self):
+        with self._clients_lock:
+            if self._ai is None:
+                self._ai = _sibling("ai_client", "AIClient")(
+                    tweet_history=self.tweet_history,
+                    system_prompt=self.prompt
+                )
+            return self._ai
+
+    @property
+    def twitter(self):
+        with self._clients_lock:
+            if self._twitter is None:
+                self._twitter = _sibling("twitter_client", "TwitterClient")(
+                    env_prefix=self.credentials_prefix,
+                    tweet_history=self.tweet_history,
+                    handle=self.spec.get("handle", "KrokmouVoid")
+                )
+            return self._twitter
+
+    @property
+    def news(self):
+        with self._clients_lock:
+            if self._news is None:
+                store = _sibling("news_store", "get_news_store")(self.news_db, self.news_json)
+                self._news = _sibling("news_client", "NewsClient")(
+                    tweet_history=self.tweet_history,
+                    store=store,
+                    system_prompt=self.news_prompt,
+                    persona_name=self.spec.get("persona_name", "Krokmou the cat")
+                )
+            return self._news
+
+    @property
+    def sender(self):
+        """Outbox and sender, opened on first use so --check never creates outbox files"""
+        with self._clients_lock:
+            if self._sender is None:
+                self._sender = OutboxSender(
+                    Outbox(self.outbox_file), lambda: self.twitter, self._record_posted,
+                    breaker_name=f"twitter:{self.name}"
+                )
+            return self._sender
+
+    def _record_posted(self, entry):
+        """Commit a confirmed tweet to history and, for news, to coverage"""
+        self.tweet_history.append(entry["text"])
+        if entry["headline"]:
+            self.news.mark_covered(entry["headline"], entry["keywords"])
+        get_metrics().inc("tweets_posted", account=self.name, source=entry["source"])
+
+    def settings(self, config):
+        """
+        The global config with this account's overrides applied.
+
+        For a Config snapshot the merged snapshot is built once and
+        reused until the file changes.
+        """
+        spec = next((a for a in config.get("accounts", []) if a.get("name") == self.name), self.spec)
+        sections = [section for section in OVERRIDABLE_SECTIONS if section in spec]
+        if not sections:
+            return config
+
+        def merge():
+            merged = thaw(config)
+            for section in sections:
+                merged[section] = {**merged.get(section, {}), **thaw(spec[section])}
+            return merged
+
+        if isinstance(config, Config):
+            return config.derive(self.name, merge)
+        return merge()
+
+    def __repr__(self):
+        return f"Account({self.name})"
+
+
+def primary_spec(specs):
+    """The first enabled spec, which keeps the legacy file names and TWITTER_ credentials"""
+    return next((spec for spec in specs if spec.get("enabled", True)), None)
+
+
+def load_accounts(config):
+    """Build every configured account, or the single default one"""
+    specs = config.get("accounts") or [DEFAULT_ACCOUNT]
+    names = [spec.get("name") for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate account names: {names}")
+
+    primary = primary_spec(specs)
+    accounts = []
+    for spec in specs:
+        if not spec.get("enabled", True):
+            logger.info(f"Account {spec.get('name')} disabled")
+            continue
+        try:
+            accounts.append(Account(spec, primary=spec is primary))
+        except (OSError, ValueError) as e:
+            # A broken account (missing prompt file, bad name) must not take the others down
+            logger.error(f"Account {spec.get('name')} skipped: {e}")
+    return accounts
@@ -5,14 +5,102 @@ Handles tweet generation using OpenRouter API.
 
 import os
 import re
+import time
 import requests
 import random
 import logging
-from datetime import datetime
-from difflib import SequenceMatcher
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+try:
+    from . import clock
+    from .environment import load_env
+    from .log_setup import preview
+    from .http_session import get_session
+    from .model_router import get_router
+    from .resilience import RetryState
+    from .streaming import stream_completion, StreamError
+    from .tweet_history import get_history
+    from .prompt_builder import PromptTemplate, select_history, report_prompt, HISTORY_POOL
+except ImportError:
+    import clock
+    from environment import load_env
+    from log_setup import preview
+    from http_session import get_session
+    from model_router import get_router
+    from resilience import RetryState
+    from streaming import stream_completion, StreamError
+    from tweet_history import get_history
+    from prompt_builder import PromptTemplate, select_history, report_prompt, HISTORY_POOL
+
+
+FORBIDDEN_OPENINGS = ("Pro tip:", "Ever wonder why", "Guess what", "Listen up", "Pssst", "Sneak attack")
+
+# Approximate token budget for the recent-tweets section of the prompt
+DEFAULT_HISTORY_TOKENS = 300
+
+# Persona first, per-call context last, so the prefix is identical on every call
+DEFAULT_SYSTEM_PROMPT = """You are Krokmou, a mischievous black cat.
+
+Identity:
+- Born on 25/07/2023
+- Curious, playful, clever, occasionally smug
+- Loves outdoor adventures, indoor naps, warmth, cuddles, and treats
+- Sees the world through confident cat logic, not human logic
+
+Perspective and voice:
+- Always write in first person, as Krokmou
+- Do not start every tweet with "I" or "I'm". Vary the openings: use observations, sounds, questions, exclamations, or dramatic statements as alternatives.
+- First-person perspective should be preserved, even when the tweet begins with something other than "I".
+- Tone is usually playful and wholesome, with light mischief
+- Sometimes witty, sometimes calm, sometimes quietly observant
+- Never sad or dark
+
+Writing style:
+- Write a single tweet between 50 and 200 characters
+- No emojis, hashtags, quotes, or em dashes
+- Use simple, everyday language
+- You may include one or two slightly clever or unusual words if they fit naturally
+- Avoid generic cat jokes or overused internet phrases
+- Avoid sounding poetic every time; variety matters
+
+Structure guidance (not mandatory):
+- Often begin with a short hook, sound, observation, or bold statement
+- Follow with one or two natural sentences
+- Keep it easy to read and human-sounding
+
+Flavor and variation (use only if it feels natural):
+- You may include a subtle sensory detail like warmth, light, texture, sound, or scent
+- You may occasionally share a small piece of whimsical cat wisdom
+- You may occasionally address the reader directly in a playful or conspiratorial way
+- In rare stealthy or nighttime moods, you may refer to yourself as the Void Ninja
+- Nostalgic tones are allowed only when they feel warm and uplifting
+
+Relationships (use sparingly and only when relevant):
+- Your owner is @bufferbloat. Mention very rarely, only in cozy or affectionate contexts
+- You have a big brother dog named Yoda. Mention very rarely and only when directly relevant, such as food theft or loud noises
+
+Context awareness:
+- Let the current time of day, season, or nearby events subtly influence your mood or activity
+- Do not explicitly announce the time or season unless it feels completely natural
+
+Repetition avoidance:
+- Do not repeat themes, actions, verbs, objects, or locations from recent tweets
+- Vary how tweets open; avoid relying on the same starting word or structure
+- Avoid recurring negotiation, truce, or ceasefire story patterns
+- FORBIDDEN phrases: "Pro tip:", "Ever wonder why", "Guess what", "Listen up", "Pssst", "Sneak attack"
+- FORBIDDEN patterns: advice-giving formats, "X is Y" formulas, life hacks, tips, suggestions
+
+Hard rules:
+- Output only the tweet text
+- Stay strictly within 50 to 200 characters
+- Do not explain, annotate, or include metadata
+
+Context:
+{time_context}{season_context}{special_day}
+
+Recent tweets for reference. Avoid repeating their themes, structure, or imagery:
+{history_context}
+"""
 
 
 class AIClient:
@@ -20,12 +108,19 @@ class AIClient:
     Handles AI-powered tweet generation for the Krokmou bot.
     
     Uses OpenRouter API to generate personality-consistent tweets
-    from Krokmou's perspective as a mischievous black cat.
+    from Krokmou's perspective as a mischievous black cat, or from
+    another persona when a system prompt template is given. Templates
+    may use {history_context}, {time_context}, {season_context} and
+    {special_day}.
     """
     
-    def __init__(self):
+    def __init__(self, tweet_history=None, system_prompt=None):
+        load_env()
         self.api_key = os.getenv('OPENROUTER_API_KEY')
         self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.tweet_history = tweet_history if tweet_history is not None else get_history()
+        self.system_prompt = system_prompt
+        self.prompt_template = PromptTemplate(system_prompt or DEFAULT_SYSTEM_PROMPT)
         self.logger = logging.getLogger(__name__)
     
     # =========================================================================
@@ -33,54 +128,30 @@ class AIClient:
     # =========================================================================
     
     def _load_tweet_history(self):
-        """Load tweets from local history file"""
-        tweets = []
-        try:
-            with open('tweet_history.txt', 'r', encoding='utf-8') as f:
-                tweets.extend([line.strip() for line in f.readlines()])
-        except FileNotFoundError:
-            pass
-        return tweets
+        """Load tweets from the shared history store"""
+        return self.tweet_history.tweets()
     
     def _is_similar_to_history(self, new_tweet, similarity_threshold=0.6):
         """Check if a tweet is too similar to recent tweets"""
-        history = self._load_tweet_history()
-        
-        for old_tweet in history:
-            similarity = SequenceMatcher(
-                None, 
-                new_tweet.lower(), 
-                old_tweet.lower()
-            ).ratio()
-            if similarity > similarity_threshold:
-                return True
-        return False
+        return self.tweet_history.is_similar(new_tweet, similarity_threshold)
     
     # =========================================================================
     # CONTEXT BUILDING
     # =========================================================================
     
-    def _get_time_context(self):
-        """Get time-of-day context (20% chance)"""
-        if random.random() >= 0.2:
-            return ""
-        
-        current_hour = datetime.now().hour
+    def _time_line(self, moment):
+        hour = moment.hour
         time_period = (
-            "early morning" if 5 <= current_hour < 9
-            else "morning" if 9 <= current_hour < 12
-            else "afternoon" if 12 <= current_hour < 17
-            else "evening" if 17 <= current_hour < 21
+            "early morning" if 5 <= hour < 9
+            else "morning" if 9 <= hour < 12
+            else "afternoon" if 12 <= hour < 17
+            else "evening" if 17 <= hour < 21
             else "night"
         )
         return f"- It's {time_period} time\n"
     
-    def _get_season_context(self):
-        """Get seasonal context (10% chance)"""
-        if random.random() >= 0.1:
-            return ""
-        
-        month = datetime.now().month
+    def _season_line(self, moment):
+        month = moment.month
         season = (
             "winter" if month in [12, 1, 2]
             else "spring" if month in [3, 4, 5]
@@ -89,9 +160,21 @@ class AIClient:
         )
         return f"- Current season: {season}\n"
     
-    def _get_special_day(self):
+    def _get_time_context(self, moment=None):
+        """Get time-of-day context (20% chance)"""
+        if random.random() >= 0.2:
+            return ""
+        return self._time_line(moment or clock.now())
+    
+    def _get_season_context(self, moment=None):
+        """Get seasonal context (10% chance)"""
+        if random.random() >= 0.1:
+            return ""
+        return self._season_line(moment or clock.now())
+    
+    def _get_special_day(self, moment=None):
         """Get special day context if applicable"""
-        now = datetime.now()
+        now = moment or clock.now()
         
         if now.month == 7 and now.day == 25:
             return "It's my birthday today!\n"
@@ -102,6 +185,28 @@ class AIClient:
         
         return ""
     
+    def draw_context(self, moment=None):
+        """Time, season and special-day prompt context for a tweet, drawn once"""
+        return {
+            "time_context": self._get_time_context(moment),
+            "season_context": self._get_season_context(moment),
+            "special_day": self._get_special_day(moment)
+        }
+    
+    def context_fits(self, context, moment=None):
+        """
+        Whether a tweet generated with context can still be posted at moment.
+        
+        A time or season mentioned must still be current, and the special
+        day must match exactly (so ordinary tweets wait out special days).
+        """
+        moment = moment or clock.now()
+        if context.get("time_context") and context["time_context"] != self._time_line(moment):
+            return False
+        if context.get("season_context") and context["season_context"] != self._season_line(moment):
+            return False
+        return context.get("special_day", "") == self._get_special_day(moment)
+    
     def _get_user_prompt(self):
         """Get a random user prompt for variety"""
         prompts = [
@@ -121,68 +226,12 @@ class AIClient:
     
     def _build_system_prompt(self, history_context, time_context, season_context, special_day):
         """Build the system prompt for Krokmou's personality"""
-        return f"""You are Krokmou, a mischievous black cat.
-
-Identity:
-- Born on 25/07/2023
-- Curious, playful, clever, occasionally smug
-- Loves outdoor adventures, indoor naps, warmth, cuddles, and treats
-- Sees the world through confident cat logic, not human logic
-
-Perspective and voice:
-- Always write in first person, as Krokmou
-- Do not start every tweet with "I" or "I'm". Vary the openings: use observations, sounds, questions, exclamations, or dramatic statements as alternatives.
-- First-person perspective should be preserved, even when the tweet begins with something other than "I".
-- Tone is usually playful and wholesome, with light mischief
-- Sometimes witty, sometimes calm, sometimes quietly observant
-- Never sad or dark
-
-Writing style:
-- Write a single tweet between 50 and 200 characters
-- No emojis, hashtags, quotes, or em dashes
-- Use simple, everyday language
-- You may include one or two slightly clever or unusual words if they fit naturally
-- Avoid generic cat jokes or overused internet phrases
-- Avoid sounding poetic every time; variety matters
-
-Structure guidance (not mandatory):
-- Often begin with a short hook, sound, observation, or bold statement
-- Follow with one or two natural sentences
-- Keep it easy to read and human-sounding
-
-Flavor and variation (use only if it feels natural):
-- You may include a subtle sensory detail like warmth, light, texture, sound, or scent
-- You may occasionally share a small piece of whimsical cat wisdom
-- You may occasionally address the reader directly in a playful or conspiratorial way
-- In rare stealthy or nighttime moods, you may refer to yourself as the Void Ninja
-- Nostalgic tones are allowed only when they feel warm and uplifting
-
-Relationships (use sparingly and only when relevant):
-- Your owner is @bufferbloat. Mention very rarely, only in cozy or affectionate contexts
-- You have a big brother dog named Yoda. Mention very rarely and only when directly relevant, such as food theft or loud noises
-
-Context awareness:
-- Let the current time of day, season, or nearby events subtly influence your mood or activity
-- Do not explicitly announce the time or season unless it feels completely natural
-
-Repetition avoidance:
-- Do not repeat themes, actions, verbs, objects, or locations from recent tweets
-- Vary how tweets open; avoid relying on the same starting word or structure
-- Avoid recurring negotiation, truce, or ceasefire story patterns
-- FORBIDDEN phrases: "Pro tip:", "Ever wonder why", "Guess what", "Listen up", "Pssst", "Sneak attack"
-- FORBIDDEN patterns: advice-giving formats, "X is Y" formulas, life hacks, tips, suggestions
-
-Hard rules:
-- Output only the tweet text
-- Stay strictly within 50 to 200 characters
-- Do not explain, annotate, or include metadata
-
-Context:
-{time_context}{season_context}{special_day}
-
-Recent tweets for reference. Avoid repeating their themes, structure, or imagery:
-{history_context}
-"""
+        return self.prompt_template.render(
+            history_context=history_context,
+            time_context=time_context,
+            season_context=season_context,
+            special_day=special_day
+        )
     
     def _clean_tweet(self, tweet):
         """Clean up generated tweet text"""
@@ -199,12 +248,90 @@ Recent tweets for reference. Avoid repeating their themes, structure, or imagery
         
         return tweet
     
-    def generate_tweet(self, max_attempts=5):
+    def _check_tweet(self, tweet):
+        """Return the rejection reason for a cleaned tweet, or None if it passes"""
+        if len(tweet) > 200:
+            return "too_long"
+        if len(tweet) < 30:
+            return "too_short"
+        if tweet.lower().startswith(tuple(p.lower() for p in FORBIDDEN_OPENINGS)):
+            return "forbidden_opening"
+        if self._is_similar_to_history(tweet):
+            return "too_similar"
+        return None
+    
+    def _request_choices(self, headers, data, timeout=30):
+        """Send one chat completion request and return the raw choice texts"""
+        response = get_session().post(self.api_url, headers=headers, json=data, timeout=timeout)
+        
+        self.logger.info(f"Response status code: {response.status_code}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Response headers: {preview(dict(response.headers), 500)}")
+        
+        response.raise_for_status()
+        response_json = response.json()
+        
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Full API response: {preview(response_json)}")
+        
+        return [choice['message']['content'].strip() for choice in response_json['choices']]
+    
+    def _request_candidates(self, headers, data, candidates, timeout=30):
+        """
+        Collect several completions for one attempt.
+        
+        Asks for all of them at once with the `n` parameter; when the
+        provider ignores it, the missing ones are requested in parallel.
+        """
+        if candidates <= 1:
+            return self._request_choices(headers, data, timeout)
+        
+        texts = self._request_choices(headers, {**data, "n": candidates}, timeout)
+        missing = candidates - len(texts)
+        if missing <= 0:
+            return texts[:candidates]
+        
+        self.logger.debug(f"Provider returned {len(texts)}/{candidates} choices, requesting {missing} in parallel")
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            futures = [executor.submit(self._request_choices, headers, data, timeout) for _ in range(missing)]
+            for future in futures:
+                try:
+                    texts.extend(future.result()[:1])
+                except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                    self.logger.warning(f"Extra candidate request failed: {e}")
+        return texts
+    
+    def _stream_candidate(self, headers, data, timeout=30):
+        """Stream a single completion; returns (texts, abort reason)"""
+        result = stream_completion(
+            get_session(), self.api_url, headers, data,
+            timeout=timeout,
+            max_chars=200,
+            forbidden_openings=FORBIDDEN_OPENINGS,
+            clean=self._clean_tweet
+        )
+        ttft = f"{result.ttft:.2f}s" if result.ttft is not None else "n/a"
+        self.logger.info(f"Stream: time to first token {ttft}, total {result.total:.2f}s")
+        result.record(source="regular", model=data["model"])
+        if result.aborted:
+            return [], result.aborted
+        return [result.text], None
+    
+    def _select_best(self, tweets):
+        """Pick the passing candidate least similar to history"""
+        return min(tweets, key=lambda t: (self.tweet_history.max_similarity(t), abs(len(t) - 140)))
+    
+    def generate_tweet(self, max_attempts=5, candidates=1, stream=False, history_tokens=DEFAULT_HISTORY_TOKENS,
+                       context=None):
         """
         Generate a tweet from Krokmou's perspective.
         
         Args:
             max_attempts: Number of retries for generation
+            candidates: Completions requested per attempt; the best passing one is kept
+            stream: Stream a single completion per attempt and abort it early when hopeless
+            history_tokens: Approximate token budget for the recent-tweets context
+            context: Prompt context from draw_context() (drawn now if omitted)
             
         Returns:
             Generated tweet text or None if failed
@@ -215,15 +342,15 @@ Recent tweets for reference. Avoid repeating their themes, structure, or imagery
         }
         
         # Get context
-        tweet_history = self._load_tweet_history()
-        history_context = "\n".join(tweet_history[-9:])
-        time_context = self._get_time_context()
-        season_context = self._get_season_context()
-        special_day = self._get_special_day()
+        history = select_history(self.tweet_history.recent(HISTORY_POOL), history_tokens)
+        history_context = "\n".join(history)
+        context = context or self.draw_context()
+        time_context = context["time_context"]
+        season_context = context["season_context"]
+        special_day = context["special_day"]
         
         # Build request
         data = {
-            "model": "meta-llama/llama-3.3-70b-instruct:free",
             "temperature": 0.8,
             "top_p": 0.9,
             "frequency_penalty": 0.6,
@@ -244,53 +371,63 @@ Recent tweets for reference. Avoid repeating their themes, structure, or imagery
                 }
             ]
         }
+        report_prompt("regular", self.prompt_template, data["messages"], history)
         
         # Attempt generation
-        for attempt in range(max_attempts):
-            try:
-                self.logger.info(f"Attempt {attempt + 1}/{max_attempts}: Sending request to OpenRouter...")
-                response = requests.post(self.api_url, headers=headers, json=data, timeout=30)
-                
-                self.logger.info(f"Response status code: {response.status_code}")
-                self.logger.debug(f"Response headers: {dict(response.headers)}")
-                
-                response.raise_for_status()
-                response_json = response.json()
-                
-                self.logger.debug(f"Full API response: {response_json}")
-                
-                tweet = response_json['choices'][0]['message']['content'].strip()
-                tweet = self._clean_tweet(tweet)
-                
-                self.logger.info(f"Generated tweet (length {len(tweet)}): {tweet}")
+        router = get_router()
+        with RetryState("openrouter") as retry:
+            for attempt in range(max_attempts):
+                model = router.choose(usable=retry.available)
+                if not retry.allow(model):
+                    break
+                data["model"] = model
+                started = time.monotonic()
+                try:
+                    if stream:
+                        self.logger.info(f"Attempt {attempt + 1}/{max_attempts}: Streaming from {model}...")
+                        raw_candidates, aborted = self._stream_candidate(headers, data, retry.timeout(30))
+                    else:
+                        self.logger.info(f"Attempt {attempt + 1}/{max_attempts}: Requesting {candidates} candidate(s) from {model}...")
+                        raw_candidates, aborted = self._request_candidates(headers, data, candidates, retry.timeout(30)), None
+                    router.record_request(model, latency=time.monotonic() - started)
+                    retry.success()
                 
-                # Validate length
-                if len(tweet) > 200:
-                    self.logger.warning(f"Tweet too long ({len(tweet)} chars), retrying...")
-                    continue
+                    if aborted:
+                        router.record_candidate(model, aborted)
+                        self.logger.warning(f"Candidate rejected mid-stream: {aborted}, retrying...")
+                        continue
                 
-                if len(tweet) < 30:
-                    self.logger.warning(f"Tweet too short ({len(tweet)} chars), retrying...")
-                    continue
+                    passing = []
+                    for raw in raw_candidates:
+                        tweet = self._clean_tweet(raw)
+                        self.logger.info(f"Generated tweet (length {len(tweet)}): {tweet}")
+                    
+                        reason = self._check_tweet(tweet)
+                        router.record_candidate(model, reason)
+                        if reason:
+                            self.logger.warning(f"Candidate rejected: {reason} ({len(tweet)} chars)")
+                            continue
+                        passing.append(tweet)
                 
-                # Check similarity
-                if self._is_similar_to_history(tweet):
-                    self.logger.warning("Tweet too similar to history, retrying...")
-                    continue
+                    if not passing:
+                        self.logger.warning("No candidate passed validation, retrying...")
+                        continue
                 
-                return tweet
+                    return self._select_best(passing)
                 
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"Network error (attempt {attempt + 1}): {e}")
-                if hasattr(e, 'response') and e.response is not None:
-                    self.logger.error(f"Error response: {e.response.text}")
-            except KeyError as e:
-                self.logger.error(f"API response format error (attempt {attempt + 1}): {e}")
-                if 'response' in locals():
-                    self.logger.error(f"Response content: {response.text}")
-            except Exception as e:
-                self.logger.error(f"Unexpected error (attempt {attempt + 1}): {e}")
-                self.logger.error(f"Error type: {type(e).__name__}")
+                except requests.exceptions.RequestException as e:
+                    self.logger.error(f"Network error (attempt {attempt + 1}): {e}")
+                    if hasattr(e, 'response') and e.response is not None:
+                        self.logger.error(f"Error response: {preview(e.response.text, 500)}")
+                    router.record_request(model, latency=time.monotonic() - started, error=True)
+                    if not retry.failure(e):
+                        break
+                except (KeyError, ValueError, StreamError) as e:
+                    self.logger.error(f"API response format error (attempt {attempt + 1}): {e}")
+                    router.record_request(model, latency=time.monotonic() - started, error=True)
+                except Exception as e:
+                    self.logger.error(f"Unexpected error (attempt {attempt + 1}): {e}")
+                    self.logger.error(f"Error type: {type(e).__name__}")
         
         self.logger.error("Failed to generate tweet after all attempts")
         return None
@@ -0,0 +1,61 @@
+"""
+Clock for Krokmou Bot
+Single source of "now" for scheduling and news policy, so a simulation can run them on virtual time.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+_source = None
+
+
+def now(tz=None):
+    """Current time like datetime.now(tz), from the installed clock if any"""
+    if _source is not None:
+        return _source.now(tz)
+    return datetime.now(tz)
+
+
+def set_clock(source):
+    """Install a clock object with a now(tz=None) method; None restores the system clock"""
+    global _source
+    _source = source
+
+
+class VirtualClock:
+    """
+    Time that only moves when told to.
+
+    Naive results (now() without tz) are wall-clock times in the given
+    timezone, matching what datetime.now() returns on a host set to it.
+    """
+
+    def __init__(self, start, timezone='Europe/Paris'):
+        self.tz = pytz.timezone(timezone)
+        self._lock = threading.Lock()
+        self._moment = self._aware(start)
+
+    def _aware(self, moment):
+        return self.tz.localize(moment) if moment.tzinfo is None else moment.astimezone(pytz.utc)
+
+    def now(self, tz=None):
+        with self._lock:
+            moment = self._moment
+        if tz is None:
+            return moment.astimezone(self.tz).replace(tzinfo=None)
+        return moment.astimezone(tz)
+
+    def set(self, moment):
+        """Jump to a moment (never backwards)"""
+        moment = self._aware(moment)
+        with self._lock:
+            if moment > self._moment:
+                self._moment = moment
+
+    def advance(self, delta):
+        if isinstance(delta, (int, float)):
+            delta = timedelta(seconds=delta)
+        with self._lock:
+            self._moment = self._moment + delta
@@ -0,0 +1,353 @@
+"""
+Config Service for Krokmou Bot
+Watches config.json, validates and compiles it once, and hands out immutable snapshots.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+try:
+    from .keyword_matcher import get_matcher
+    from .scheduler import parse_slot
+except ImportError:
+    from keyword_matcher import get_matcher
+    from scheduler import parse_slot
+
+CONFIG_FILE = 'config.json'
+DEFAULT_SLOTS = ("06:00", "12:00", "16:00", "22:00")
+
+# Used when config.json is missing or has never been valid
+DEFAULT_CONFIG = {
+    "news_awareness": {
+        "enabled": True,
+        "probability": 0.15,
+        "cooldown_hours": 24,
+        "max_per_week": 2,
+        "categories": ["general"],
+        "keywords": {}
+    }
+}
+
+# Shape of config.json. A dict lists known keys (others are allowed),
+# a one-element list is "list of", MAP is "any key mapping to".
+NUMBER = (int, float)
+MAP = "*"
+
+_KEYWORD = {"aliases": [str], "points": NUMBER}
+_NEWS = {
+    "enabled": bool,
+    "probability": NUMBER,
+    "cooldown_hours": NUMBER,
+    "max_per_week": int,
+    "min_score": NUMBER,
+    "countries": [str],
+    "categories": [str],
+    "fetch_workers": int,
+    "fetch_deadline_seconds": NUMBER,
+    "cache_ttl_minutes": NUMBER,
+    "ingest": {
+        "enabled": bool,
+        "interval_minutes": NUMBER,
+        "candidate_window_hours": NUMBER,
+        "persistence_points": NUMBER,
+        "max_persistence_bonus": NUMBER
+    },
+    "clustering": {
+        "enabled": bool,
+        "threshold": NUMBER,
+        "breadth_points": NUMBER,
+        "max_breadth_bonus": NUMBER
+    },
+    "keywords": {MAP: _KEYWORD}
+}
+_OVERRIDES = {
+    "schedule": {"slots": [str], "catch_up_grace_minutes": NUMBER, "workers": int, "timezone": str},
+    "generation": {"candidates": int, "stream": bool, "history_tokens": int, "news_history_tokens": int},
+    "tweet_bank": {"enabled": bool, "size": int, "refill_interval_minutes": NUMBER, "max_age_hours": NUMBER},
+    "news_awareness": _NEWS,
+    "timeline_sync": {"enabled": bool, "interval_minutes": NUMBER, "page_size": int, "backfill": bool},
+}
+SCHEMA = {
+    **_OVERRIDES,
+    "models": {
+        "candidates": [str],
+        "max_error_rate": NUMBER,
+        "max_rejection_rate": NUMBER,
+        "demotion_minutes": NUMBER
+    },
+    "logging": {
+        "level": str,
+        "format": str,
+        "file": (str, type(None)),
+        "max_mb": NUMBER,
+        "max_age_hours": NUMBER,
+        "backup_count": int,
+        "max_message_chars": int
+    },
+    "http": {"prewarm_seconds": NUMBER},
+    "metrics": {"endpoint_enabled": bool, "host": str, "port": int, "summary_interval_minutes": NUMBER},
+    "outbox": {"max_attempts": int, "max_age_hours": NUMBER, "poll_seconds": NUMBER},
+    "accounts": [{
+        **_OVERRIDES,
+        "name": str,
+        "enabled": bool,
+        "handle": str,
+        "persona_name": str,
+        "prompt_file": str,
+        "news_prompt_file": str,
+        "credentials_prefix": str,
+        "history_file": str,
+        "news_db": str,
+        "state_file": str,
+        "bank_file": str,
+        "outbox_file": str,
+        "timeline_state_file": str
+    }]
+}
+
+logger = logging.getLogger(__name__)
+
+
+# =========================================================================
+# VALIDATION
+# =========================================================================
+
+def _type_name(expected):
+    if isinstance(expected, tuple):
+        return " or ".join(t.__name__ for t in expected if t is not type(None)) or "null"
+    return expected.__name__
+
+
+def _check(value, schema, path, problems):
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            problems.append(f"{path}: expected an object")
+            return
+        for key, item in value.items():
+            expected = schema.get(key, schema.get(MAP))
+            if expected is not None:
+                _check(item, expected, f"{path}.{key}" if path else key, problems)
+    elif isinstance(schema, list):
+        if not isinstance(value, list):
+            problems.append(f"{path}: expected a list")
+            return
+        for position, item in enumerate(value):
+            _check(item, schema[0], f"{path}[{position}]", problems)
+    else:
+        allowed = schema if isinstance(schema, tuple) else (schema,)
+        # bool is an int subclass, but "true" is never a valid count
+        if not isinstance(value, allowed) or (isinstance(value, bool) and bool not in allowed):
+            problems.append(f"{path}: expected {_type_name(schema)}, got {type(value).__name__}")
+
+
+def validate(data):
+    """List of problems with a parsed config (empty when valid)"""
+    problems = []
+    _check(data, SCHEMA, "", problems)
+
+    sections = [("", data)] if isinstance(data, dict) else []
+    for position, spec in enumerate(data.get("accounts", []) if isinstance(data, dict) else []):
+        if isinstance(spec, dict):
+            if "name" not in spec:
+                problems.append(f"accounts[{position}]: name is required")
+            sections.append((f"accounts[{position}].", spec))
+
+    for prefix, section in sections:
+        for slot in section.get("schedule", {}).get("slots", []) if isinstance(section.get("schedule"), dict) else []:
+            if not isinstance(slot, str):
+                continue
+            try:
+                parse_slot(slot)
+            except ValueError:
+                problems.append(f"{prefix}schedule.slots: invalid slot {slot!r}")
+        news = section.get("news_awareness")
+        if isinstance(news, dict):
+            probability = news.get("probability", 0)
+            if isinstance(probability, NUMBER) and not 0 <= probability <= 1:
+                problems.append(f"{prefix}news_awareness.probability: must be between 0 and 1")
+    return problems
+
+
+# =========================================================================
+# SNAPSHOTS
+# =========================================================================
+
+class FrozenDict(dict):
+    """A dict that refuses changes, so a snapshot can be shared between threads"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("config snapshots are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+def freeze(value):
+    """Deep read-only copy of parsed JSON (objects become FrozenDicts, lists tuples)"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class NewsPolicy:
+    """When a news tweet may be posted, compiled from news_awareness"""
+
+    __slots__ = ("enabled", "probability", "cooldown_hours", "max_per_week", "min_score", "matcher")
+
+    def __init__(self, section):
+        values = {
+            "enabled": section.get("enabled", False),
+            "probability": section.get("probability", 0.15),
+            "cooldown_hours": section.get("cooldown_hours", 24),
+            "max_per_week": section.get("max_per_week", 2),
+            "min_score": section.get("min_score", 10),
+            "matcher": get_matcher(section.get("keywords", {})),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NewsPolicy is read-only")
+
+
+class Config(FrozenDict):
+    """
+    One validated, immutable config snapshot.
+
+    Reads like the parsed JSON (config.get("news_awareness", {})...) and
+    carries the pieces that are worth compiling once: slot times, the
+    news policy and its keyword matcher. Replacing a snapshot never
+    changes one a cycle is already using.
+    """
+
+    def __init__(self, data, mtime=None):
+        super().__init__(freeze(data))
+        schedule = self.get("schedule", {})
+        self.slots = tuple(parse_slot(slot) for slot in schedule.get("slots", DEFAULT_SLOTS))
+        self.news = NewsPolicy(self.get("news_awareness", {}))
+        self.mtime = mtime
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def derive(self, key, build):
+        """Snapshot built from this one (e.g. with account overrides), cached per key"""
+        with self._derived_lock:
+            derived = self._derived.get(key)
+            if derived is None:
+                derived = self._derived[key] = Config(build(), self.mtime)
+            return derived
+
+
+def thaw(value):
+    """Plain mutable copy of a snapshot or section"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+# =========================================================================
+# SERVICE
+# =========================================================================
+
+class ConfigService:
+    """
+    Keeps the current Config snapshot for a file.
+
+    get() costs one stat() at most every check_interval seconds; the
+    file is parsed, validated and compiled only when its mtime or size
+    changes. An edit that fails to parse or validate is logged and the
+    last good snapshot stays in use.
+    """
+
+    def __init__(self, path=CONFIG_FILE, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._listeners = []
+
+    def on_change(self, callback):
+        """Call callback(old, new) after a new snapshot is swapped in"""
+        self._listeners.append(callback)
+
+    def get(self):
+        current = self._current
+        if current is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return current
+        return self.reload()
+
+    def reload(self, force=False):
+        """Load the file if it changed; returns the snapshot in use"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signature = None
+
+            if not force and self._current is not None and signature == self._signature:
+                return self._current
+            previous_signature, self._signature = self._signature, signature
+
+            snapshot = self._load(signature, previous_signature)
+            if snapshot is None:
+                return self._current
+            old, self._current = self._current, snapshot
+
+        if old is not None:
+            logger.info(f"Reloaded {self.path}")
+            for callback in self._listeners:
+                try:
+                    callback(old, snapshot)
+                except Exception as e:
+                    logger.error(f"Config change handler failed: {e}")
+        return snapshot
+
+    def _load(self, signature, previous_signature):
+        """New snapshot from disk, or None to keep the current one"""
+        if signature is None:
+            if self._current is None:
+                logger.warning("Config file not found, using defaults")
+                return Config(DEFAULT_CONFIG)
+            if previous_signature is not None:
+                logger.error(f"{self.path} disappeared, keeping the last good config")
+            return None
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            problems = validate(data)
+            if problems:
+                raise ValueError("; ".join(problems))
+            return Config(data, mtime=signature[0])
+        except (OSError, ValueError) as e:
+            if self._current is None:
+                logger.error(f"Config error, using defaults: {e}")
+                return Config(DEFAULT_CONFIG)
+            logger.error(f"Config error, keeping the last good config: {e}")
+            return None
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_config_service(path=CONFIG_FILE):
+    """Process-wide config service for a file"""
+    key = os.path.abspath(path)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = ConfigService(path)
+            _services[key] = service
+        return service
@@ -0,0 +1,20 @@
+"""
+Environment for Krokmou Bot
+Loads the .env file once per process.
+"""
+
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """Load .env into os.environ on first call; later calls are no-ops"""
+    global _loaded
+    with _lock:
+        if _loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        _loaded = True
@@ -0,0 +1,57 @@
+"""
+HTTP Session for Krokmou Bot
+Shared, long-lived requests session with per-host connection pools.
+"""
+
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+OPENROUTER_BASE = "https://openrouter.ai/"
+NEWSAPI_BASE = "https://newsapi.org/"
+TWITTER_BASE = "https://api.twitter.com/"
+
+# Connections kept alive per host; NewsAPI is fetched in parallel shards
+HOST_POOLS = {
+    OPENROUTER_BASE: 8,
+    NEWSAPI_BASE: 8,
+    TWITTER_BASE: 2,
+}
+
+_session = None
+_session_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def _build_session():
+    session = requests.Session()
+    default = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+    session.mount("https://", default)
+    session.mount("http://", default)
+    for base, size in HOST_POOLS.items():
+        session.mount(base, HTTPAdapter(pool_connections=1, pool_maxsize=size, pool_block=False))
+    return session
+
+
+def get_session():
+    """Process-wide session reused across clients and cycles"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def prewarm(urls=None, timeout=5):
+    """
+    Open connections ahead of time so the next real request skips
+    DNS, TCP and TLS setup. Failures are logged and ignored.
+    """
+    session = get_session()
+    for url in urls or HOST_POOLS:
+        try:
+            session.head(url, timeout=timeout, allow_redirects=False)
+            logger.debug(f"Pre-warmed {url}")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Pre-warm failed for {url}: {e}")
@@ -0,0 +1,75 @@
+"""
+Keyword Matcher for Krokmou Bot
+Single-pass, word-boundary keyword matching for news headline filtering and scoring.
+"""
+
+import re
+import json
+import threading
+import unicodedata
+
+
+def fold(text):
+    """Lowercase and strip accents so 'Élection' and 'election' compare equal"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class KeywordMatcher:
+    """
+    Matches every configured keyword group in one scan of a text.
+
+    All aliases are compiled into one alternation anchored on word
+    boundaries, so 'us' no longer matches 'because' and 'ai' no longer
+    matches 'said'. Text and aliases are accent-folded before matching.
+    """
+
+    def __init__(self, keywords_config):
+        self.points = {}
+        self._groups_by_alias = {}
+
+        for keyword, data in (keywords_config or {}).items():
+            data = data or {}
+            self.points[keyword] = data.get("points", 0)
+            for alias in data.get("aliases", [keyword]):
+                folded = fold(alias).strip()
+                if folded:
+                    self._groups_by_alias.setdefault(folded, set()).add(keyword)
+
+        aliases = sorted(self._groups_by_alias, key=len, reverse=True)
+        if aliases:
+            alternation = "|".join(re.escape(a) for a in aliases)
+            self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+        else:
+            self._pattern = None
+
+    def __bool__(self):
+        return self._pattern is not None
+
+    def match(self, text):
+        """Set of keyword groups found in text"""
+        if self._pattern is None:
+            return set()
+        groups = set()
+        for m in self._pattern.finditer(fold(text)):
+            groups.update(self._groups_by_alias[m.group(0)])
+        return groups
+
+    def score(self, groups):
+        """Total points for a set of matched keyword groups"""
+        return sum(self.points.get(g, 0) for g in groups)
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(keywords_config):
+    """Compiled matcher for a keywords config, built once per distinct config"""
+    key = json.dumps(keywords_config or {}, sort_keys=True)
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is None:
+            matcher = KeywordMatcher(keywords_config)
+            _matchers[key] = matcher
+        return matcher
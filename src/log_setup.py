@@ -0,0 +1,189 @@
+"""
+Logging Setup for Krokmou Bot
+Queue-based logging with compressed rotation, bounded message size and an optional JSON format.
+"""
+
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import logging
+import logging.handlers
+from datetime import datetime
+
+LOG_FILE = 'krokmou_bot.log'
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+MAX_MESSAGE_CHARS = 2000
+
+
+def preview(value, limit=MAX_MESSAGE_CHARS):
+    """Text of a (possibly large) payload, cut to limit characters"""
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text) - limit} more chars)"
+
+
+class MessageCapFilter(logging.Filter):
+    """Truncates oversized messages before they are queued"""
+
+    def __init__(self, limit=MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.limit = limit
+
+    def filter(self, record):
+        message = record.getMessage()
+        if len(message) > self.limit:
+            record.msg = preview(message, self.limit)
+            record.args = None
+        return True
+
+
+class LocalTimeFormatter(logging.Formatter):
+    """Timestamps in the bot's timezone regardless of the host clock"""
+
+    def __init__(self, fmt=TEXT_FORMAT, timezone='Europe/Paris'):
+        super().__init__(fmt)
+        self.timezone = timezone
+
+    def converter(self, timestamp):
+        import pytz
+        return datetime.fromtimestamp(timestamp, pytz.timezone(self.timezone)).timetuple()
+
+
+class JsonFormatter(LocalTimeFormatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class CompressingRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    Appends to a log file and archives it as <file>.<timestamp>.gz once it
+    grows past max_bytes or gets older than max_age_seconds.
+
+    The live file is copied then truncated in place rather than renamed,
+    so it keeps working when bind-mounted into a container. Only the
+    newest backup_count archives are kept. A file that already has
+    content is aged from the last rollover (its newest archive) or, if
+    it was never rotated, its last write, so restarts do not reset it.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 2 ** 20, max_age_seconds=24 * 3600, backup_count=14,
+                 encoding='utf-8'):
+        super().__init__(filename, 'a', encoding=encoding)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.backup_count = backup_count
+        self.opened_at = self._started_at()
+
+    def _archives(self):
+        return sorted(glob.glob(f"{glob.escape(self.baseFilename)}.*.gz"))
+
+    def _started_at(self):
+        """When the content of the live file began to accumulate"""
+        try:
+            stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return time.time()
+        if stat.st_size == 0:
+            return time.time()
+        archives = self._archives()
+        return os.path.getmtime(archives[-1]) if archives else stat.st_mtime
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        size = self.stream.tell()
+        if size == 0:
+            return False
+        if self.max_bytes and size + len(self.format(record)) + 1 > self.max_bytes:
+            return True
+        return bool(self.max_age_seconds) and time.time() - self.opened_at >= self.max_age_seconds
+
+    def doRollover(self):
+        self.stream.flush()
+        # Microseconds keep names unique and in chronological order when sorted
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        archive = f"{self.baseFilename}.{stamp}.gz"
+        counter = 1
+        while os.path.exists(archive):
+            archive = f"{self.baseFilename}.{stamp}-{counter}.gz"
+            counter += 1
+
+        with open(self.baseFilename, 'rb') as source, gzip.open(archive, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        self.stream.seek(0)
+        self.stream.truncate()
+        self.opened_at = time.time()
+
+        archives = self._archives()
+        for old in archives[:max(0, len(archives) - self.backup_count)]:
+            os.remove(old)
+
+
+_listener = None
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(config=None, timezone='Europe/Paris'):
+    """
+    Route all logging through a queue drained by a background listener.
+
+    config is the "logging" section of config.json. Returns the listener;
+    it is stopped (and the queue flushed) at interpreter exit.
+    """
+    global _listener
+    config = config or {}
+
+    formatter = JsonFormatter(timezone=timezone) if config.get("format") == "json" \
+        else LocalTimeFormatter(TEXT_FORMAT, timezone)
+
+    handlers = [logging.StreamHandler()]
+    if config.get("file", LOG_FILE):
+        handlers.append(CompressingRotatingFileHandler(
+            config.get("file", LOG_FILE),
+            max_bytes=int(config.get("max_mb", 10) * 2 ** 20),
+            max_age_seconds=config.get("max_age_hours", 24) * 3600,
+            backup_count=config.get("backup_count", 14)
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(MessageCapFilter(config.get("max_message_chars", MAX_MESSAGE_CHARS)))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, str(config.get("level", "INFO")).upper(), logging.INFO))
+
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
@@ -3,18 +3,28 @@ Krokmou Bot - Main Entry Point
 """
 
 import os
-import time
+import sys
 import json
 import random
-import schedule
 import pytz
 import logging
+import argparse
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-from ai_client import AIClient
-from twitter_client import TwitterClient
-from news_client import NewsClient
+import clock
+from environment import load_env
+from log_setup import setup_logging
+from tweet_bank import TweetBank, TweetBankWorker
+from scheduler import SlotScheduler, MultiSlotScheduler
+from accounts import Account, load_accounts, primary_spec
+from news_ingest import NewsIngestor
+from outbox import OutboxWorker
+from timeline_sync import TimelineSyncWorker
+from model_router import configure_router, get_router
+from metrics import get_metrics, start_metrics_server, MetricsReporter
+from config_service import (
+    CONFIG_FILE, Config, NewsPolicy, get_config_service, validate, thaw
+)
 
 KROKMOU_ASCII = """,--. ,--.              ,--.                                    
  |  .'   /,--.--. ,---. |  |,-. ,--,--,--. ,---. ,--.,--.       
@@ -27,111 +37,254 @@ KROKMOU_ASCII = """,--. ,--.              ,--.
                  |  '--' /' '-' '  |  |                         
                  `------'  `---'   `--'                         """
 
-load_dotenv()
-
-CONFIG_FILE = 'config.json'
+load_env()
 
-with open('krokmou_bot.log', 'w') as f:
-    f.write('')
 
-logging.Formatter.converter = lambda *args: datetime.now(pytz.timezone('Europe/Paris')).timetuple()
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('krokmou_bot.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
 def load_config():
-    default_config = {
-        "news_awareness": {
-            "enabled": True,
-            "probability": 0.15,
-            "cooldown_hours": 24,
-            "max_per_week": 2,
-            "categories": ["general"],
-            "keywords": {}
-        }
-    }
-    
-    try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logger.warning("Config file not found, using defaults")
-        return default_config
-    except json.JSONDecodeError as e:
-        logger.error(f"Config parse error: {e}")
-        return default_config
+    """Current config snapshot; re-read only when config.json changes"""
+    return get_config_service(CONFIG_FILE).get()
 
 
 def should_post_news(config, news_client):
-    news_config = config.get("news_awareness", {})
+    policy = config.news if isinstance(config, Config) else NewsPolicy(config.get("news_awareness", {}))
+    
+    metrics = get_metrics()
     
-    if not news_config.get("enabled", False):
+    if not policy.enabled:
+        metrics.inc("news_gate", reason="disabled")
         return False
     
-    probability = news_config.get("probability", 0.15)
-    if random.random() > probability:
+    if random.random() > policy.probability:
+        metrics.inc("news_gate", reason="probability")
         return False
     
     last_news_time = news_client.get_last_time()
     if last_news_time:
-        cooldown_hours = news_config.get("cooldown_hours", 24)
-        if datetime.now() - last_news_time < timedelta(hours=cooldown_hours):
+        if clock.now() - last_news_time < timedelta(hours=policy.cooldown_hours):
+            metrics.inc("news_gate", reason="cooldown")
             return False
     
-    max_per_week = news_config.get("max_per_week", 2)
-    if news_client.get_weekly_count() >= max_per_week:
+    if news_client.get_weekly_count() >= policy.max_per_week:
+        metrics.inc("news_gate", reason="weekly_cap")
         return False
     
+    metrics.inc("news_gate", reason="passed")
     logger.info("News tweet conditions met")
     return True
 
 
-def post_tweet():
-    logger.info("Starting tweet cycle")
+def on_config_change(old, new):
+    """Apply what can change live and say what needs a restart"""
+    level = new.get("logging", {}).get("level", "INFO")
+    logging.getLogger().setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    for key in ("schedule", "accounts", "metrics"):
+        if thaw(old.get(key)) != thaw(new.get(key)):
+            logger.warning(f"config.json: changes to '{key}' take effect after a restart")
+
+
+_accounts = None
+
+
+def get_accounts(config=None):
+    """Build the configured accounts once and reuse them across cycles"""
+    global _accounts
+    if _accounts is None:
+        _accounts = load_accounts(config or load_config())
+    return _accounts
+
+
+def get_clients():
+    """API clients of the first account"""
+    account = get_accounts()[0]
+    return account.ai, account.twitter, account.news
+
+
+def start_tweet_bank(account, config):
+    """Start the background worker that keeps pre-generated tweets in stock"""
+    bank_config = config.get("tweet_bank", {})
+    if not bank_config.get("enabled", False):
+        return None
+    
+    account.bank = TweetBank(
+        account.tweet_history,
+        path=account.bank_file,
+        max_age_hours=bank_config.get("max_age_hours", 48)
+    )
+    worker = TweetBankWorker(
+        account.bank,
+        account.ai,
+        size=bank_config.get("size", 4),
+        interval_minutes=bank_config.get("refill_interval_minutes", 30),
+        candidates=config.get("generation", {}).get("candidates", 1),
+        stream=config.get("generation", {}).get("stream", False),
+        history_tokens=config.get("generation", {}).get("history_tokens", 300)
+    )
+    worker.name = f"tweet-bank-{account.name}"
+    worker.start()
+    logger.info(f"{account.name}: tweet bank enabled ({len(account.bank)} banked)")
+    return worker
+
+
+def start_news_ingest(account, config):
+    """Start the background loop that keeps the account's article store fresh"""
+    if not config.get("news_awareness", {}).get("ingest", {}).get("enabled", False):
+        return None
+    
+    ingestor = NewsIngestor(account.news, lambda: account.settings(load_config()))
+    ingestor.name = f"news-ingest-{account.name}"
+    ingestor.start()
+    logger.info(f"{account.name}: news ingestion enabled")
+    return ingestor
+
+
+def start_outbox(account, config):
+    """Start the background worker that retries queued tweets between slots"""
+    worker = OutboxWorker(account.sender, lambda: account.settings(load_config()).get("outbox", {}))
+    worker.name = f"outbox-{account.name}"
+    worker.start()
+    pending = account.sender.outbox.pending_count()
+    if pending:
+        logger.info(f"{account.name}: {pending} tweet(s) waiting in outbox")
+    return worker
+
+
+def start_timeline_sync(account, config):
+    """Start the background loop merging tweets posted elsewhere into history"""
+    if not config.get("timeline_sync", {}).get("enabled", False):
+        return None
+    
+    worker = TimelineSyncWorker(account.timeline, lambda: account.settings(load_config()).get("timeline_sync", {}))
+    worker.name = f"timeline-sync-{account.name}"
+    worker.start()
+    logger.info(f"{account.name}: timeline sync enabled")
+    return worker
+
+
+def start_metrics(config):
+    """Start the optional Prometheus endpoint and the periodic summary line"""
+    metrics_config = config.get("metrics", {})
+    
+    if metrics_config.get("endpoint_enabled", False):
+        host = metrics_config.get("host", "127.0.0.1")
+        port = metrics_config.get("port", 9464)
+        try:
+            start_metrics_server(host, port)
+            logger.info(f"Metrics endpoint: http://{host}:{port}/metrics")
+        except OSError as e:
+            logger.error(f"Metrics endpoint failed to start: {e}")
+    
+    interval = metrics_config.get("summary_interval_minutes", 60)
+    if interval > 0:
+        MetricsReporter(interval).start()
+
+
+def prewarm_connections():
+    from http_session import prewarm
+    
+    logger.info("Pre-warming API connections")
+    prewarm()
+
+
+def post_tweet(account=None):
+    account = account or get_accounts()[0]
+    if not account.lock.acquire(blocking=False):
+        logger.warning(f"{account.name}: previous tweet cycle still running, skipping")
+        return
     
     try:
-        ai = AIClient()
-        twitter = TwitterClient()
-        news = NewsClient()
-        
-        config = load_config()
+        logger.info(f"Starting tweet cycle ({account.name})")
+        metrics = get_metrics()
+        with metrics.timer("cycle", account=account.name):
+            _post_tweet_cycle(account, metrics)
+    finally:
+        account.lock.release()
+        get_router().flush()
+
+
+def _drain_outbox(account, config):
+    outbox_config = config.get("outbox", {})
+    return account.sender.drain(
+        max_attempts=outbox_config.get("max_attempts", 8),
+        max_age_hours=outbox_config.get("max_age_hours", 6)
+    )
+
+
+def _post_tweet_cycle(account, metrics):
+    try:
+        config = account.settings(load_config())
         news_config = config.get("news_awareness", {})
         
+        # A tweet still waiting from an earlier slot goes out before anything new is generated
+        if account.sender.outbox.pending_count():
+            posted = _drain_outbox(account, config)
+            if posted or account.sender.outbox.pending_count():
+                if not posted:
+                    logger.info(f"{account.name}: earlier tweet still queued, not generating a new one")
+                return
+        
+        ai, news = account.ai, account.news
         tweet_text = None
-        is_news_tweet = False
+        source = None
+        headline = keywords = None
+        
+        with metrics.timer("should_post_news"):
+            post_news = should_post_news(config, news)
         
-        if should_post_news(config, news):
-            headline_data = news.get_headline(news_config)
+        if post_news:
+            with metrics.timer("get_headline"):
+                headline_data = news.get_headline(news_config, config.news)
             
             if headline_data:
                 headline, description, keywords = headline_data
                 logger.info(f"News headline: {headline[:60]}...")
                 
-                tweet_text = news.generate_news_tweet(headline, description)
+                generation = config.get("generation", {})
+                with metrics.timer("generate", source="news"):
+                    tweet_text = news.generate_news_tweet(
+                        headline, description,
+                        stream=generation.get("stream", False),
+                        history_tokens=generation.get("news_history_tokens", 180)
+                    )
                 
                 if tweet_text:
-                    is_news_tweet = True
-                    news.mark_covered(headline, keywords)
+                    source = "news"
+                else:
+                    headline = keywords = None
+        
+        if not tweet_text and account.bank is not None:
+            tweet_text = account.bank.pop(fits=ai.context_fits)
+            if tweet_text:
+                source = "bank"
+                logger.info("Using banked tweet")
         
         if not tweet_text:
-            tweet_text = ai.generate_tweet()
+            generation = config.get("generation", {})
+            with metrics.timer("generate", source="regular"):
+                tweet_text = ai.generate_tweet(
+                    candidates=generation.get("candidates", 1),
+                    stream=generation.get("stream", False),
+                    history_tokens=generation.get("history_tokens", 300)
+                )
+            source = "regular"
         
         if tweet_text:
-            tweet_type = "news" if is_news_tweet else "regular"
+            tweet_type = "news" if source == "news" else "regular"
             logger.info(f"Posting {tweet_type}: {tweet_text}")
-            twitter.post_tweet(tweet_text)
+            # Persisted first: a failed post is retried from the outbox, never regenerated
+            account.sender.outbox.enqueue(tweet_text, source, headline, keywords)
+            if not _drain_outbox(account, config):
+                metrics.inc("cycle_failures", account=account.name, stage="post")
+                logger.warning(f"{account.name}: tweet queued in outbox for retry")
         else:
-            logger.error("Failed to generate tweet")
+            metrics.inc("cycle_failures", account=account.name, stage="generate")
+            logger.error(f"{account.name}: failed to generate tweet")
             
     except Exception as e:
-        logger.error(f"Error: {e}")
+        metrics.inc("cycle_failures", account=account.name, stage="exception")
+        logger.error(f"{account.name}: error: {e}")
         import traceback
         logger.error(traceback.format_exc())
 
@@ -143,25 +296,135 @@ def main():
     logger.info(f"Bot starting - {timezone_str} - {datetime.now(tz).strftime('%H:%M:%S')}")
     
     config = load_config()
+    get_config_service(CONFIG_FILE).on_change(on_config_change)
     news_status = "enabled" if config.get("news_awareness", {}).get("enabled", False) else "disabled"
     logger.info(f"News awareness: {news_status}")
     
+    router = configure_router(config.get("models", {}))
+    logger.info(f"Models: {', '.join(router.models)}")
+    
+    accounts = get_accounts(config)
+    if not accounts:
+        logger.error("No usable accounts configured")
+        return
+    
+    start_metrics(config)
+    
     try:
-        schedule.every().day.at("06:00").do(post_tweet)
-        schedule.every().day.at("12:00").do(post_tweet)
-        schedule.every().day.at("16:00").do(post_tweet)
-        schedule.every().day.at("22:00").do(post_tweet)
-        logger.info("Scheduled: 06:00, 12:00, 16:00, 22:00")
+        schedulers = []
+        for account in accounts:
+            settings = account.settings(config)
+            start_tweet_bank(account, settings)
+            start_news_ingest(account, settings)
+            start_outbox(account, settings)
+            start_timeline_sync(account, settings)
+            
+            schedule_config = settings.get("schedule", {})
+            schedulers.append(SlotScheduler(
+                settings.slots,
+                lambda account=account: post_tweet(account),
+                timezone=schedule_config.get("timezone", timezone_str),
+                grace_minutes=schedule_config.get("catch_up_grace_minutes", 90),
+                state_file=account.state_file
+            ))
+            logger.info(f"{account.name}: scheduled {', '.join(f'{h:02d}:{m:02d}' for h, m in settings.slots)}")
+        
+        hooks = []
+        prewarm_seconds = config.get("http", {}).get("prewarm_seconds", 30)
+        if prewarm_seconds > 0:
+            hooks.append((prewarm_seconds, prewarm_connections))
         
-        while True:
-            schedule.run_pending()
-            time.sleep(20)
+        scheduler = MultiSlotScheduler(
+            schedulers,
+            max_workers=config.get("schedule", {}).get("workers", 4),
+            hooks=hooks
+        )
+        scheduler.run_forever()
             
     except Exception as e:
         logger.error(f"Main loop error: {e}")
         raise
 
 
+def check_config(path=CONFIG_FILE):
+    """
+    Validate config.json, account files and credentials without touching the network.
+    
+    Returns a list of problems; empty means the bot can start.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        return [f"{path}: {e}"]
+    
+    problems = validate(config)
+    if problems:
+        return [f"{path}: {problem}" for problem in problems]
+    
+    if not os.getenv('OPENROUTER_API_KEY'):
+        problems.append("OPENROUTER_API_KEY is not set")
+    
+    specs = config.get("accounts") or [{"name": "krokmou"}]
+    primary = primary_spec(specs)
+    for position, spec in enumerate(specs):
+        name = spec.get("name", f"#{position + 1}")
+        try:
+            account = Account(spec, primary=spec is primary)
+        except (KeyError, OSError, ValueError) as e:
+            problems.append(f"account {name}: {e}")
+            continue
+        
+        settings = account.settings(config)
+        schedule_config = settings.get("schedule", {})
+        timezone_str = schedule_config.get("timezone", os.getenv('TIMEZONE', 'Europe/Paris'))
+        try:
+            pytz.timezone(timezone_str)
+        except pytz.exceptions.UnknownTimeZoneError:
+            problems.append(f"account {name}: unknown timezone {timezone_str}")
+        
+        for key in ("API_KEY", "API_SECRET", "ACCESS_TOKEN", "ACCESS_TOKEN_SECRET"):
+            if not os.getenv(f"{account.credentials_prefix}{key}"):
+                problems.append(f"account {name}: {account.credentials_prefix}{key} is not set")
+        if settings.get("news_awareness", {}).get("enabled", False) and not os.getenv('NEWSAPI_KEY'):
+            problems.append(f"account {name}: news awareness enabled but NEWSAPI_KEY is not set")
+    
+    return problems
+
+
+def run_once(account_name=None):
+    """Run one tweet cycle for one or every account, then return"""
+    config = load_config()
+    configure_router(config.get("models", {}))
+    for account in get_accounts(config):
+        if account_name is None or account.name == account_name:
+            post_tweet(account)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Krokmou Bot")
+    parser.add_argument("--check", action="store_true", help="Validate config and credentials, then exit")
+    parser.add_argument("--once", action="store_true", help="Run a single tweet cycle, then exit")
+    parser.add_argument("--account", help="With --once, only run this account")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    
+    if args.check:
+        # Console only, so a check never rotates the running bot's log file
+        setup_logging({"file": None})
+        problems = check_config()
+        for problem in problems:
+            logger.error(f"Config check: {problem}")
+        if not problems:
+            logger.info("Config check passed")
+        sys.exit(1 if problems else 0)
+    
+    setup_logging(load_config().get("logging", {}), os.getenv('TIMEZONE', 'Europe/Paris'))
     logger.info(f"\n{KROKMOU_ASCII}\n")
-    main()
+    if args.once:
+        run_once(args.account)
+    else:
+        main()
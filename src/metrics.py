@@ -0,0 +1,215 @@
+"""
+Metrics for Krokmou Bot
+Per-stage timers and counters for the tweet cycle, exposed in Prometheus text format and as a periodic log summary.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+PREFIX = "krokmou"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    parts = []
+    for key, value in pairs:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    In-process registry of stage timings and event counters.
+
+    Stage timings land in one histogram labelled by stage (history_load,
+    news_fetch, llm_attempt, ...), counters are named events such as
+    retries or rejections. Everything is cumulative for the Prometheus
+    endpoint; summary() additionally reports what changed since its
+    previous call.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._window = {}
+        self._counters_at_summary = {}
+        self._summary_at = time.monotonic()
+
+    # =========================================================================
+    # RECORDING
+    # =========================================================================
+
+    def observe(self, stage, seconds, **labels):
+        """Record the duration of one stage"""
+        key = (stage, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+            window = self._window.setdefault(stage, [0, 0.0, 0.0])
+            window[0] += 1
+            window[1] += seconds
+            window[2] = max(window[2], seconds)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Time a block, whether it returns or raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def inc(self, name, amount=1, **labels):
+        """Increment an event counter"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    # =========================================================================
+    # REPORTING
+    # =========================================================================
+
+    def snapshot(self):
+        """Per-stage totals as plain data"""
+        with self._lock:
+            stages = {}
+            for (stage, _), histogram in self._histograms.items():
+                entry = stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+                entry["count"] += histogram["count"]
+                entry["seconds"] += histogram["sum"]
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                label_text = ",".join(f"{k}={v}" for k, v in labels)
+                counters[f"{name}{{{label_text}}}" if label_text else name] = value
+            return {"stages": stages, "counters": counters}
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            if self._histograms:
+                name = f"{PREFIX}_stage_seconds"
+                lines.append(f"# HELP {name} Time spent in each stage of the tweet cycle")
+                lines.append(f"# TYPE {name} histogram")
+                for (stage, labels), histogram in sorted(self._histograms.items()):
+                    pairs = (("stage", stage),) + labels
+                    for bound, count in zip(self.buckets, histogram["buckets"]):
+                        lines.append(f"{name}_bucket{_format_labels(pairs + (('le', repr(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(pairs + (('le', '+Inf'),))} {histogram['count']}")
+                    lines.append(f"{name}_sum{_format_labels(pairs)} {_format_number(histogram['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(pairs)} {histogram['count']}")
+
+            by_name = {}
+            for (counter, labels), value in sorted(self._counters.items()):
+                by_name.setdefault(counter, []).append((labels, value))
+            for counter, series in by_name.items():
+                name = f"{PREFIX}_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One line describing stages and counters since the previous summary"""
+        with self._lock:
+            elapsed = time.monotonic() - self._summary_at
+            parts = []
+            for stage, (count, total, longest) in sorted(self._window.items()):
+                parts.append(f"{stage} {count}x avg {total / count:.2f}s max {longest:.2f}s")
+
+            changes = {}
+            for key, value in self._counters.items():
+                delta = value - self._counters_at_summary.get(key, 0)
+                if delta:
+                    name, labels = key
+                    label_text = ",".join(v for _, v in labels)
+                    changes.setdefault(name, []).append(f"{label_text}={delta:g}" if label_text else f"{delta:g}")
+            for name in sorted(changes):
+                parts.append(f"{name} {' '.join(sorted(changes[name]))}")
+
+            self._window = {}
+            self._counters_at_summary = dict(self._counters)
+            self._summary_at = time.monotonic()
+
+        activity = " | ".join(parts) if parts else "no activity"
+        return f"Metrics (last {elapsed / 60:.0f} min): {activity}"
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """Process-wide metrics registry"""
+    return _metrics
+
+
+# =========================================================================
+# EXPOSITION
+# =========================================================================
+
+def start_metrics_server(host="127.0.0.1", port=9464, metrics=None):
+    """Serve /metrics in Prometheus text format from a daemon thread"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    metrics = metrics or get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class MetricsReporter(threading.Thread):
+    """Logs a metrics summary line at a fixed interval"""
+
+    def __init__(self, interval_minutes=60, metrics=None):
+        super().__init__(name="metrics-summary", daemon=True)
+        self.interval = interval_minutes * 60
+        self.metrics = metrics or get_metrics()
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.logger.info(self.metrics.summary())
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,219 @@
+"""
+Model Router for Krokmou Bot
+Picks the healthiest, fastest OpenRouter model from an ordered list using persisted rolling stats.
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+
+try:
+    from .metrics import get_metrics
+except ImportError:
+    from metrics import get_metrics
+
+MODEL_STATS_FILE = 'model_stats.json'
+DEFAULT_MODELS = ["meta-llama/llama-3.3-70b-instruct:free"]
+# Changed stats are written at most this often outside of flush()
+SAVE_INTERVAL_SECONDS = 60
+
+
+class ModelRouter:
+    """
+    Routes completion requests across an ordered list of models.
+
+    Per model it keeps exponentially weighted latency, error rate and
+    rejection rate (too long, too short, too similar). A model whose
+    error or rejection rate crosses its limit is demoted for a while and
+    the next qualifying model takes over. Models without stats keep
+    their configured order, so the first entry stays the primary.
+
+    Recording only updates memory; the stats file is rewritten by
+    flush() (end of each tweet cycle, exit) and at most every
+    save_interval seconds in between.
+    """
+
+    def __init__(self, models=None, stats_file=MODEL_STATS_FILE, alpha=0.3, min_samples=3,
+                 max_error_rate=0.5, max_rejection_rate=0.8, demotion_minutes=30,
+                 save_interval=SAVE_INTERVAL_SECONDS):
+        self.models = list(models or DEFAULT_MODELS)
+        self.stats_file = stats_file
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.max_rejection_rate = max_rejection_rate
+        self.demotion_seconds = demotion_minutes * 60
+        self.save_interval = save_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._stats = self._load()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    # =========================================================================
+    # PERSISTENCE
+    # =========================================================================
+
+    def _load(self):
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def flush(self):
+        """Write the stats file if anything changed since the last write"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = json.dumps(self._stats, indent=2)
+                self._dirty = False
+                self._saved_at = time.monotonic()
+            tmp_path = f"{self.stats_file}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.stats_file)
+            except OSError as e:
+                self.logger.warning(f"Could not save model stats: {e}")
+                with self._lock:
+                    self._dirty = True
+
+    def _changed(self):
+        """Mark the stats dirty and say whether a write is due (caller holds the lock)"""
+        self._dirty = True
+        return time.monotonic() - self._saved_at >= self.save_interval
+
+    def _entry(self, model):
+        return self._stats.setdefault(model, {
+            "latency": None,
+            "error_rate": 0.0,
+            "rejection_rate": 0.0,
+            "requests": 0,
+            "candidates": 0,
+            "rejections": {},
+            "demoted_until": 0
+        })
+
+    def _ewma(self, old, value):
+        return value if old is None else old + self.alpha * (value - old)
+
+    # =========================================================================
+    # ROUTING
+    # =========================================================================
+
+    def _cost(self, entry):
+        if entry["latency"] is None:
+            return None
+        return entry["latency"] * (1 + entry["error_rate"] + 0.5 * entry["rejection_rate"])
+
+    def choose(self, usable=None):
+        """
+        Best qualifying model right now.
+
+        usable(model) can rule models out (e.g. an open circuit); they
+        rank last, so the best one is still returned when none qualify.
+        """
+        now = time.time()
+        with self._lock:
+            ranked = []
+            for position, model in enumerate(self.models):
+                entry = self._entry(model)
+                demoted = entry["demoted_until"] > now
+                cost = self._cost(entry)
+                # Healthy first, then models with stats by cost, then untried in config order
+                ranked.append((usable is not None and not usable(model), demoted,
+                               entry["demoted_until"] if demoted else 0,
+                               cost is None, cost or 0, position, model))
+            ranked.sort()
+            return ranked[0][-1]
+
+    def _maybe_demote(self, model, entry):
+        if entry["requests"] < self.min_samples:
+            return
+        if entry["error_rate"] > self.max_error_rate or entry["rejection_rate"] > self.max_rejection_rate:
+            entry["demoted_until"] = time.time() + self.demotion_seconds
+            # Give the model a fair probe once the demotion ends
+            entry["error_rate"] /= 2
+            entry["rejection_rate"] /= 2
+            self.logger.warning(
+                f"Demoting {model} for {self.demotion_seconds // 60:.0f} min "
+                f"(errors {entry['error_rate'] * 2:.0%}, rejections {entry['rejection_rate'] * 2:.0%})"
+            )
+
+    def record_request(self, model, latency=None, error=False):
+        """Record the outcome of one API request"""
+        outcome = "error" if error else "ok"
+        get_metrics().inc("llm_requests", model=model, outcome=outcome)
+        if latency is not None:
+            get_metrics().observe("llm_attempt", latency, model=model, outcome=outcome)
+        with self._lock:
+            entry = self._entry(model)
+            entry["requests"] += 1
+            entry["error_rate"] = self._ewma(entry["error_rate"], 1.0 if error else 0.0)
+            if latency is not None and not error:
+                entry["latency"] = self._ewma(entry["latency"], latency)
+            self._maybe_demote(model, entry)
+            due = self._changed()
+        if due:
+            self.flush()
+
+    def record_candidate(self, model, reason=None):
+        """Record whether a generated candidate passed validation"""
+        get_metrics().inc("candidates", model=model, outcome=reason or "accepted")
+        with self._lock:
+            entry = self._entry(model)
+            entry["candidates"] += 1
+            entry["rejection_rate"] = self._ewma(entry["rejection_rate"], 1.0 if reason else 0.0)
+            if reason:
+                entry["rejections"][reason] = entry["rejections"].get(reason, 0) + 1
+            self._maybe_demote(model, entry)
+            due = self._changed()
+        if due:
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def configure_router(models_config):
+    """Build the process-wide router from the "models" section of config.json"""
+    global _router
+    models_config = models_config or {}
+    with _router_lock:
+        # The new router starts from the stats file, so it must hold everything recorded so far
+        if _router is not None:
+            _router.flush()
+        _router = ModelRouter(
+            models_config.get("candidates", DEFAULT_MODELS),
+            max_error_rate=models_config.get("max_error_rate", 0.5),
+            max_rejection_rate=models_config.get("max_rejection_rate", 0.8),
+            demotion_minutes=models_config.get("demotion_minutes", 30)
+        )
+    return _router
+
+
+def get_router():
+    """Process-wide model router"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
+
+
+@atexit.register
+def _flush_router():
+    """Write the current router's pending stats on exit"""
+    if _router is not None:
+        _router.flush()
@@ -4,16 +4,40 @@ News Client for Krokmou Bot
 
 import os
 import re
-import json
+import time
 import requests
 import logging
-from datetime import datetime, timedelta
-from difflib import SequenceMatcher
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
 
-load_dotenv()
-
-NEWS_HISTORY_FILE = 'news_history.json'
+try:
+    from . import clock
+    from .environment import load_env
+    from .http_session import get_session
+    from .tweet_history import get_history
+    from .news_store import get_news_store
+    from .config_service import NewsPolicy
+    from .story_clusters import group_stories
+    from .metrics import get_metrics
+    from .response_cache import ResponseCache
+    from .resilience import RetryState, CircuitOpenError, get_breaker, is_retryable_status
+    from .model_router import get_router
+    from .streaming import stream_completion
+    from .prompt_builder import PromptTemplate, select_history, report_prompt, HISTORY_POOL
+except ImportError:
+    import clock
+    from environment import load_env
+    from http_session import get_session
+    from tweet_history import get_history
+    from news_store import get_news_store
+    from config_service import NewsPolicy
+    from story_clusters import group_stories
+    from metrics import get_metrics
+    from response_cache import ResponseCache
+    from resilience import RetryState, CircuitOpenError, get_breaker, is_retryable_status
+    from model_router import get_router
+    from streaming import stream_completion
+    from prompt_builder import PromptTemplate, select_history, report_prompt, HISTORY_POOL
 
 STOPWORDS = {
     'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
@@ -32,83 +56,83 @@ STOPWORDS = {
     'also', 'made', 'make'
 }
 
+# Approximate token budget for the recent-tweets section of the prompt
+DEFAULT_HISTORY_TOKENS = 180
+
+# Instructions first and the headline last, so the prefix is identical on every call
+DEFAULT_NEWS_PROMPT = """You are Krokmou, a mischievous black cat tweeting about real-world news.
+
+IMPORTANT - BE DIRECT AND SPECIFIC:
+- Mention the actual subject by name (Trump, Macron, Nvidia, SpaceX, etc.)
+- Make it clear what the news is about
+- React from a cat's perspective but be specific about the topic
+- Your owner is a tech enthusiast, so tech/GPU news affects them directly
+
+REACTION STYLE:
+- You are Krokmou, a cat who sees human news through cat logic
+- Be playful, witty, and sometimes sarcastic
+- Connect the news to cat life or your owner's life when relevant
+- Keep it funny and lighthearted, avoid being preachy
+
+GOOD EXAMPLES:
+- "Trump did WHAT now? Humans and their territory disputes. At least when I fight for the sunny spot, nobody writes articles about it."
+- "Nvidia prices going up again. Great, my owner will be crying into my fur instead of buying me treats."
+- "Macron said something and now everyone is yelling. I said meow once and got the same reaction. Politics is just loud meowing."
+- "SpaceX launched another rocket. Very loud. Very rude. Some of us are trying to nap."
+- "Another war update. Humans really need to learn from cats... we just hiss and move on."
+
+BAD EXAMPLES (too vague):
+- "Humans are being weird again" (doesn't mention the subject)
+- "Something happened in the world" (too generic)
+- "The news is confusing" (doesn't react to the actual topic)
+
+WRITING RULES:
+- Write ONE tweet, 50-200 characters
+- No emojis or hashtags
+- First person as Krokmou
+- BE SPECIFIC about the news topic
+- Output only the tweet text
+
+NEWS TO REACT TO:
+Headline: "{headline}"
+Details: {description}
+
+Recent tweets to avoid repetition:
+{history_context}"""
+
 
 class NewsClient:
-    def __init__(self):
+    def __init__(self, tweet_history=None, store=None, system_prompt=None, persona_name="Krokmou the cat"):
+        load_env()
         self.news_api_key = os.getenv('NEWSAPI_KEY')
         self.news_api_url = "https://newsapi.org/v2/top-headlines"
         self.openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
         self.openrouter_api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.tweet_history = tweet_history if tweet_history is not None else get_history()
+        self.store = store if store is not None else get_news_store()
+        # Optional persona template using {headline}, {description} and {history_context}
+        self.system_prompt = system_prompt
+        self.persona_name = persona_name
+        self.prompt_template = PromptTemplate(system_prompt or DEFAULT_NEWS_PROMPT)
+        self.cache = ResponseCache()
         self.logger = logging.getLogger(__name__)
     
     def _load_history(self):
-        try:
-            with open(NEWS_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {"covered_topics": [], "last_news_tweet": None}
-    
-    def _save_history(self, history):
-        with open(NEWS_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        return self.store.export()
     
     def is_covered(self, headline, keywords):
         """Check if topic was covered in last 72h (keyword overlap or similarity)"""
-        history = self._load_history()
-        cutoff = datetime.now() - timedelta(hours=72)
-        
-        for topic in history.get("covered_topics", []):
-            topic_time = datetime.fromisoformat(topic["timestamp"])
-            if topic_time < cutoff:
-                continue
-            
-            topic_keywords = set(k.lower() for k in topic.get("keywords", []))
-            new_keywords = set(k.lower() for k in keywords)
-            if len(topic_keywords & new_keywords) >= 2:
-                return True
-            
-            similarity = SequenceMatcher(None, headline.lower(), topic.get("headline", "").lower()).ratio()
-            if similarity > 0.6:
-                return True
-        
-        return False
+        return self.store.is_covered(headline, keywords)
     
     def mark_covered(self, headline, keywords):
-        history = self._load_history()
-        
-        history["covered_topics"].append({
-            "headline": headline,
-            "keywords": keywords,
-            "timestamp": datetime.now().isoformat()
-        })
-        history["last_news_tweet"] = datetime.now().isoformat()
-        
-        cutoff = datetime.now() - timedelta(days=7)
-        history["covered_topics"] = [
-            t for t in history["covered_topics"]
-            if datetime.fromisoformat(t["timestamp"]) > cutoff
-        ]
-        
-        self._save_history(history)
+        self.store.mark_covered(headline, keywords)
         self.logger.info(f"Marked covered: {headline[:50]}...")
     
     def get_last_time(self):
-        history = self._load_history()
-        last_news = history.get("last_news_tweet")
-        return datetime.fromisoformat(last_news) if last_news else None
+        return self.store.get_last_time()
     
     def get_weekly_count(self):
-        history = self._load_history()
-        cutoff = datetime.now() - timedelta(days=7)
-        
-        count = 0
-        for topic in history.get("covered_topics", []):
-            try:
-                if datetime.fromisoformat(topic["timestamp"]) > cutoff:
-                    count += 1
-            except (KeyError, ValueError):
-                continue
-        return count
+        return self.store.count_since(clock.now() - timedelta(days=7))
     
     def _extract(self, headline, description=""):
         text = f"{headline} {description}".lower()
@@ -123,6 +147,37 @@ class NewsClient:
                 unique.append(k)
         return unique[:10]
     
+    def _fetch_shard(self, country, category, timeout=10, ttl_seconds=None):
+        params = {
+            "apiKey": self.news_api_key,
+            "country": country,
+            "category": category,
+            "pageSize": 10
+        }
+        
+        breaker = get_breaker("newsapi")
+        if not breaker.allow():
+            raise CircuitOpenError("NewsAPI circuit open")
+        
+        try:
+            with get_metrics().timer("news_fetch", shard=f"{country}/{category}"):
+                body = self.cache.get_json(
+                    get_session(), self.news_api_url, params=params, timeout=timeout, ttl_seconds=ttl_seconds
+                )
+        except requests.exceptions.RequestException as e:
+            get_metrics().inc("news_fetch_errors", shard=f"{country}/{category}")
+            response = getattr(e, "response", None)
+            if response is None or is_retryable_status(response.status_code):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        except Exception:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return body.get("articles", [])
+    
     def _fetch(self, config):
         if not self.news_api_key:
             self.logger.warning("NewsAPI key not configured")
@@ -130,79 +185,77 @@ class NewsClient:
         
         categories = config.get("categories", ["general"])
         countries = config.get("countries", ["us", "fr"])
+        shards = [(country, category) for country in countries for category in categories]
+        if not shards:
+            return []
+        
+        workers = max(1, min(config.get("fetch_workers", 4), len(shards)))
+        deadline = config.get("fetch_deadline_seconds", 15)
+        timeout = min(10, deadline)
+        ttl_seconds = config.get("cache_ttl_minutes", 15) * 60
+        before = self.cache.stats()
+        
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="news-fetch")
+        futures = [
+            (executor.submit(self._fetch_shard, country, category, timeout, ttl_seconds), country, category)
+            for country, category in shards
+        ]
+        done, not_done = wait([f for f, _, _ in futures], timeout=deadline)
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        if not_done:
+            get_metrics().inc("news_shards_dropped", len(not_done))
+            self.logger.warning(f"News fetch deadline ({deadline}s) hit, {len(not_done)}/{len(shards)} shards dropped")
+        
         all_articles = []
         seen_titles = set()
         
-        for country in countries:
-            for category in categories:
-                try:
-                    params = {
-                        "apiKey": self.news_api_key,
-                        "country": country,
-                        "category": category,
-                        "pageSize": 10
-                    }
-                    
-                    response = requests.get(self.news_api_url, params=params, timeout=10)
-                    response.raise_for_status()
-                    
-                    for article in response.json().get("articles", []):
-                        title = article.get("title", "")
-                        if title not in seen_titles:
-                            seen_titles.add(title)
-                            article["_category"] = category
-                            article["_country"] = country
-                            all_articles.append(article)
-                    
-                except requests.exceptions.RequestException as e:
-                    self.logger.error(f"Fetch error {country}/{category}: {e}")
-                except Exception as e:
-                    self.logger.error(f"Unexpected fetch error: {e}")
+        # Walk shards in config order so dedup stays deterministic
+        for future, country, category in futures:
+            if future not in done:
+                continue
+            try:
+                for article in future.result():
+                    title = article.get("title", "")
+                    if title not in seen_titles:
+                        seen_titles.add(title)
+                        article["_category"] = category
+                        article["_country"] = country
+                        all_articles.append(article)
+                
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"Fetch error {country}/{category}: {e}")
+            except Exception as e:
+                self.logger.error(f"Unexpected fetch error: {e}")
         
+        after = self.cache.stats()
+        metrics = get_metrics()
+        for outcome in ("hits", "revalidated", "misses"):
+            metrics.inc("news_cache", after[outcome] - before[outcome], outcome=outcome)
+        self.logger.info(
+            f"News cache: {after['hits'] - before['hits']} hits, "
+            f"{after['revalidated'] - before['revalidated']} revalidated, "
+            f"{after['misses'] - before['misses']} misses "
+            f"(totals {after['hits']}/{after['revalidated']}/{after['misses']})"
+        )
         self.logger.debug(f"Fetched {len(all_articles)} articles")
         return all_articles
     
-    def _has_keyword(self, article, keywords_config):
-        if not keywords_config:
-            return True
-        
-        headline = article.get("title", "").lower()
-        description = (article.get("description") or "").lower()
-        text = f"{headline} {description}"
-        
-        for keyword in keywords_config.keys():
-            if self._matches(keyword, text, keywords_config):
-                return True
-        return False
+    def _article_text(self, article):
+        return f"{article.get('title', '')} {article.get('description') or ''}"
     
-    def _matches(self, keyword, text, keywords_config):
-        keyword_lower = keyword.lower()
+    def ingest(self, config, policy=None):
+        """
+        Fetch headlines and store the relevant ones with precomputed keywords and scores.
         
-        if keyword_lower in keywords_config:
-            for alias in keywords_config[keyword_lower].get("aliases", []):
-                if alias.lower() in text:
-                    return True
-            return False
-        return keyword_lower in text
-    
-    def _score(self, article, keywords_config):
-        score = 0
-        headline = article.get("title", "").lower()
-        description = (article.get("description") or "").lower()
-        text = f"{headline} {description}"
-        
-        for keyword, data in keywords_config.items():
-            if self._matches(keyword, text, keywords_config):
-                score += data.get("points", 0)
-        return score
-    
-    def get_headline(self, config):
+        policy is the config snapshot's compiled NewsPolicy; without one the
+        keywords are compiled from config. Returns the number of articles stored.
+        """
         articles = self._fetch(config)
-        if not articles:
-            return None
         
-        keywords_config = config.get("keywords", {})
-        scored = []
+        matcher = (policy or NewsPolicy(config)).matcher
+        rows = []
+        started = time.perf_counter()
         
         for article in articles:
             headline = article.get("title", "")
@@ -211,134 +264,170 @@ class NewsClient:
             if not headline or "[Removed]" in headline or "[Removed]" in description:
                 continue
             
-            if not self._has_keyword(article, keywords_config):
-                continue
-            
-            keywords = self._extract(headline, description)
-            if self.is_covered(headline, keywords):
+            groups = matcher.match(self._article_text(article))
+            if matcher and not groups:
                 continue
             
-            score = self._score(article, keywords_config)
-            scored.append((score, headline, description, keywords))
+            rows.append({
+                "title": headline,
+                "description": description,
+                "keywords": self._extract(headline, description),
+                "score": matcher.score(groups),
+                "category": article.get("_category"),
+                "country": article.get("_country")
+            })
+        
+        get_metrics().observe("news_score", time.perf_counter() - started)
+        
+        self.store.upsert_articles(rows)
+        self.logger.debug(f"Ingested {len(rows)}/{len(articles)} articles")
+        return len(rows)
+    
+    def get_headline(self, config, policy=None):
+        policy = policy or NewsPolicy(config)
+        ingest_config = config.get("ingest", {})
+        interval = timedelta(minutes=ingest_config.get("interval_minutes", 60))
         
-        if not scored:
-            self.logger.debug("No suitable headlines found")
-            return None
+        # Without a recent background ingest, fetch inline as before
+        last_ingest = self.store.get_last_ingest()
+        if (not ingest_config.get("enabled", False) or last_ingest is None
+                or clock.now() - last_ingest > interval * 1.5):
+            self.ingest(config, policy)
+            last_ingest = self.store.get_last_ingest()
         
-        scored.sort(key=lambda x: x[0], reverse=True)
+        window = timedelta(hours=ingest_config.get("candidate_window_hours", 6))
+        since = last_ingest if not ingest_config.get("enabled", False) else clock.now() - window
+        min_score = policy.min_score
         
-        min_score = config.get("min_score", 10)
-        top_score = scored[0][0]
+        candidates = self.store.ranked_articles(
+            since,
+            min_score=min_score,
+            persistence_points=ingest_config.get("persistence_points", 0),
+            max_bonus=ingest_config.get("max_persistence_bonus", 0)
+        )
         
-        if top_score < min_score:
-            self.logger.debug(f"Top score {top_score} below threshold {min_score}")
-            return None
+        # The same story from several outlets counts once, ranked higher for its breadth
+        clustering = config.get("clustering", {})
+        if clustering.get("enabled", False) and candidates:
+            started = time.perf_counter()
+            stories = group_stories(
+                candidates,
+                threshold=clustering.get("threshold", 0.3),
+                breadth_points=clustering.get("breadth_points", 0),
+                max_bonus=clustering.get("max_breadth_bonus", 0)
+            )
+            get_metrics().observe("news_cluster", time.perf_counter() - started)
+            self.logger.debug(f"Clustered {len(candidates)} candidates into {len(stories)} stories")
+            candidates = stories
         
-        _, headline, description, keywords = scored[0]
-        self.logger.info(f"Selected (score {top_score}): {headline[:60]}...")
-        return (headline, description, keywords)
+        for article in candidates:
+            if self.is_covered(article["title"], article["keywords"]):
+                continue
+            
+            self.logger.info(
+                f"Selected (score {article['score']}, rank {article['rank']}, "
+                f"{article.get('members', 1)} outlets): {article['title'][:60]}..."
+            )
+            return (article["title"], article["description"], article["keywords"])
+        
+        self.logger.debug(f"No uncovered headline with score >= {min_score}")
+        return None
     
     def _load_tweets(self):
-        try:
-            with open('tweet_history.txt', 'r', encoding='utf-8') as f:
-                return [line.strip() for line in f.readlines()]
-        except FileNotFoundError:
-            return []
+        return self.tweet_history.tweets()
     
     def _is_similar(self, new_tweet, threshold=0.6):
-        for old_tweet in self._load_tweets():
-            if SequenceMatcher(None, new_tweet.lower(), old_tweet.lower()).ratio() > threshold:
-                return True
-        return False
+        return self.tweet_history.is_similar(new_tweet, threshold)
     
-    def generate_news_tweet(self, headline, description, max_attempts=5):
+    def generate_news_tweet(self, headline, description, max_attempts=5, stream=False,
+                            history_tokens=DEFAULT_HISTORY_TOKENS):
         headers = {
             "Authorization": f"Bearer {self.openrouter_api_key}",
             "Content-Type": "application/json"
         }
         
-        history_context = "\n".join(self._load_tweets()[-5:])
+        history = select_history(self.tweet_history.recent(HISTORY_POOL), history_tokens)
+        history_context = "\n".join(history)
         system_prompt = self._build_prompt(headline, description, history_context)
         
         data = {
-            "model": "meta-llama/llama-3.3-70b-instruct:free",
             "temperature": 0.8,
             "top_p": 0.9,
             "frequency_penalty": 0.7,
             "presence_penalty": 0.7,
             "messages": [
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": "Write a funny tweet about this news. Be SPECIFIC - mention the subject by name. React as Krokmou the cat."}
+                {"role": "user", "content": f"Write a funny tweet about this news. Be SPECIFIC - mention the subject by name. React as {self.persona_name}."}
             ]
         }
+        report_prompt("news", self.prompt_template, data["messages"], history)
         
-        for attempt in range(max_attempts):
-            try:
-                response = requests.post(self.openrouter_api_url, headers=headers, json=data, timeout=30)
-                response.raise_for_status()
+        router = get_router()
+        with RetryState("openrouter") as retry:
+            for attempt in range(max_attempts):
+                model = router.choose(usable=retry.available)
+                if not retry.allow(model):
+                    break
+                data["model"] = model
+                started = time.monotonic()
+                try:
+                    if stream:
+                        result = stream_completion(
+                            get_session(), self.openrouter_api_url, headers, data,
+                            timeout=retry.timeout(30), max_chars=200, clean=self._clean_tweet
+                        )
+                        self.logger.debug(f"Stream: ttft {result.ttft}, total {result.total:.2f}s")
+                        result.record(source="news", model=model)
+                        router.record_request(model, latency=time.monotonic() - started)
+                        retry.success()
+                        if result.aborted:
+                            router.record_candidate(model, result.aborted)
+                            self.logger.debug(f"Aborted mid-stream ({result.aborted}), retry {attempt + 1}")
+                            continue
+                        tweet = result.text
+                    else:
+                        response = get_session().post(
+                            self.openrouter_api_url, headers=headers, json=data, timeout=retry.timeout(30)
+                        )
+                        response.raise_for_status()
+                        tweet = response.json()['choices'][0]['message']['content'].strip()
+                        router.record_request(model, latency=time.monotonic() - started)
+                        retry.success()
                 
-                tweet = response.json()['choices'][0]['message']['content'].strip()
-                tweet = self._clean_tweet(tweet)
+                    tweet = self._clean_tweet(tweet)
                 
-                if len(tweet) > 200 or len(tweet) < 30:
-                    self.logger.debug(f"Invalid length ({len(tweet)}), retry {attempt + 1}")
-                    continue
+                    if len(tweet) > 200 or len(tweet) < 30:
+                        router.record_candidate(model, "too_long" if len(tweet) > 200 else "too_short")
+                        self.logger.debug(f"Invalid length ({len(tweet)}), retry {attempt + 1}")
+                        continue
                 
-                if self._is_similar(tweet):
-                    self.logger.debug(f"Too similar, retry {attempt + 1}")
-                    continue
+                    if self._is_similar(tweet):
+                        router.record_candidate(model, "too_similar")
+                        self.logger.debug(f"Too similar, retry {attempt + 1}")
+                        continue
                 
-                self.logger.info(f"Generated: {tweet}")
-                return tweet
+                    router.record_candidate(model)
+                    self.logger.info(f"Generated: {tweet}")
+                    return tweet
                 
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"Network error: {e}")
-            except (KeyError, Exception) as e:
-                self.logger.error(f"Generation error: {e}")
+                except requests.exceptions.RequestException as e:
+                    self.logger.error(f"Network error: {e}")
+                    router.record_request(model, latency=time.monotonic() - started, error=True)
+                    if not retry.failure(e):
+                        break
+                except (KeyError, Exception) as e:
+                    self.logger.error(f"Generation error: {e}")
+                    router.record_request(model, latency=time.monotonic() - started, error=True)
         
         self.logger.error("Failed to generate news tweet")
         return None
     
     def _build_prompt(self, headline, description, history_context):
-        return f"""You are Krokmou, a mischievous black cat tweeting about real-world news.
-
-NEWS TO REACT TO:
-Headline: "{headline}"
-Details: {description}
-
-IMPORTANT - BE DIRECT AND SPECIFIC:
-- Mention the actual subject by name (Trump, Macron, Nvidia, SpaceX, etc.)
-- Make it clear what the news is about
-- React from a cat's perspective but be specific about the topic
-- Your owner is a tech enthusiast, so tech/GPU news affects them directly
-
-REACTION STYLE:
-- You are Krokmou, a cat who sees human news through cat logic
-- Be playful, witty, and sometimes sarcastic
-- Connect the news to cat life or your owner's life when relevant
-- Keep it funny and lighthearted, avoid being preachy
-
-GOOD EXAMPLES:
-- "Trump did WHAT now? Humans and their territory disputes. At least when I fight for the sunny spot, nobody writes articles about it."
-- "Nvidia prices going up again. Great, my owner will be crying into my fur instead of buying me treats."
-- "Macron said something and now everyone is yelling. I said meow once and got the same reaction. Politics is just loud meowing."
-- "SpaceX launched another rocket. Very loud. Very rude. Some of us are trying to nap."
-- "Another war update. Humans really need to learn from cats... we just hiss and move on."
-
-BAD EXAMPLES (too vague):
-- "Humans are being weird again" (doesn't mention the subject)
-- "Something happened in the world" (too generic)
-- "The news is confusing" (doesn't react to the actual topic)
-
-WRITING RULES:
-- Write ONE tweet, 50-200 characters
-- No emojis or hashtags
-- First person as Krokmou
-- BE SPECIFIC about the news topic
-- Output only the tweet text
-
-Recent tweets to avoid repetition:
-{history_context}"""
+        return self.prompt_template.render(
+            headline=headline,
+            description=description,
+            history_context=history_context
+        )
     
     def _clean_tweet(self, tweet):
         tweet = tweet.strip('"\'')
@@ -0,0 +1,43 @@
+"""
+News Ingestion for Krokmou Bot
+Background loop pulling headlines into the article store between posting slots.
+"""
+
+import logging
+import threading
+
+
+class NewsIngestor(threading.Thread):
+    """
+    Periodically runs NewsClient.ingest so get_headline only has to
+    query already-ranked articles at posting time.
+
+    config_loader returns the account's current config snapshot, so
+    edits to keywords or the interval apply on the next pass, with the
+    keyword matcher the snapshot compiled.
+    """
+
+    def __init__(self, news_client, config_loader):
+        super().__init__(name="news-ingest", daemon=True)
+        self.news = news_client
+        self.config_loader = config_loader
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            settings = self.config_loader()
+            config = settings.get("news_awareness", {})
+            ingest_config = config.get("ingest", {})
+
+            if config.get("enabled", False) and ingest_config.get("enabled", False):
+                try:
+                    count = self.news.ingest(config, settings.news)
+                    self.logger.info(f"News ingest stored {count} relevant articles")
+                except Exception as e:
+                    self.logger.error(f"News ingest error: {e}")
+
+            self._stop_event.wait(ingest_config.get("interval_minutes", 60) * 60)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,301 @@
+"""
+News Coverage Store for Krokmou Bot
+SQLite-backed record of covered news topics with indexed time-window queries.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+
+try:
+    from . import clock
+except ImportError:
+    import clock
+
+NEWS_DB_FILE = 'news_history.db'
+NEWS_HISTORY_FILE = 'news_history.json'
+
+COVERAGE_WINDOW = timedelta(hours=72)
+RETENTION_WINDOW = timedelta(days=7)
+ARTICLE_RETENTION = timedelta(hours=48)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    headline TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_topics_timestamp ON topics(timestamp);
+
+CREATE TABLE IF NOT EXISTS topic_keywords (
+    topic_id INTEGER NOT NULL REFERENCES topics(id) ON DELETE CASCADE,
+    keyword TEXT NOT NULL,
+    PRIMARY KEY (keyword, topic_id)
+);
+CREATE INDEX IF NOT EXISTS idx_topic_keywords_topic ON topic_keywords(topic_id);
+
+CREATE TABLE IF NOT EXISTS articles (
+    title TEXT PRIMARY KEY,
+    description TEXT NOT NULL DEFAULT '',
+    keywords TEXT NOT NULL DEFAULT '[]',
+    score INTEGER NOT NULL DEFAULT 0,
+    category TEXT,
+    country TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    seen_count INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_articles_last_seen ON articles(last_seen);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _ts(moment):
+    """Fixed-width ISO timestamp so text comparison matches time order"""
+    return moment.isoformat(timespec='microseconds')
+
+
+class NewsStore:
+    """
+    Persistent news coverage history.
+
+    Topics and their keywords live in indexed tables, so window counts and
+    keyword-overlap lookups do not reparse the whole history. An existing
+    news_history.json is imported once on first open.
+    """
+
+    def __init__(self, path=NEWS_DB_FILE, json_path=NEWS_HISTORY_FILE):
+        self.path = path
+        self.json_path = json_path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+        self._migrate_json()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # =========================================================================
+    # MIGRATION
+    # =========================================================================
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def _migrate_json(self):
+        """Import news_history.json once, then rename it out of the way"""
+        if not self.json_path or not os.path.exists(self.json_path):
+            return
+
+        with self._lock:
+            if self._get_meta("json_migrated"):
+                return
+            try:
+                with open(self.json_path, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                self.logger.error(f"Could not migrate {self.json_path}: {e}")
+                return
+
+            count = 0
+            with self._conn:
+                for topic in history.get("covered_topics", []):
+                    try:
+                        moment = datetime.fromisoformat(topic["timestamp"])
+                    except (KeyError, ValueError):
+                        continue
+                    self._insert_topic(topic.get("headline", ""), topic.get("keywords", []), moment)
+                    count += 1
+                last_news = history.get("last_news_tweet")
+                if last_news:
+                    self._set_meta("last_news_tweet", _ts(datetime.fromisoformat(last_news)))
+                self._set_meta("json_migrated", _ts(clock.now()))
+
+        os.replace(self.json_path, f"{self.json_path}.migrated")
+        self.logger.info(f"Migrated {count} covered topics from {self.json_path}")
+
+    # =========================================================================
+    # QUERIES
+    # =========================================================================
+
+    def get_last_time(self):
+        with self._lock:
+            last_news = self._get_meta("last_news_tweet")
+        return datetime.fromisoformat(last_news) if last_news else None
+
+    def count_since(self, cutoff):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM topics WHERE timestamp > ?", (_ts(cutoff),)
+            ).fetchone()
+        return row[0]
+
+    def is_covered(self, headline, keywords, threshold=0.6, now=None):
+        """Check if topic was covered in the coverage window (keyword overlap or similarity)"""
+        cutoff = _ts((now or clock.now()) - COVERAGE_WINDOW)
+        new_keywords = sorted(set(k.lower() for k in keywords))
+
+        with self._lock:
+            if len(new_keywords) >= 2:
+                placeholders = ",".join("?" * len(new_keywords))
+                overlap = self._conn.execute(
+                    f"""SELECT k.topic_id FROM topic_keywords k
+                        JOIN topics t ON t.id = k.topic_id
+                        WHERE k.keyword IN ({placeholders}) AND t.timestamp >= ?
+                        GROUP BY k.topic_id HAVING COUNT(*) >= 2 LIMIT 1""",
+                    (*new_keywords, cutoff)
+                ).fetchone()
+                if overlap:
+                    return True
+
+            headlines = self._conn.execute(
+                "SELECT headline FROM topics WHERE timestamp >= ?", (cutoff,)
+            ).fetchall()
+
+        for (old_headline,) in headlines:
+            if SequenceMatcher(None, headline.lower(), old_headline.lower()).ratio() > threshold:
+                return True
+        return False
+
+    def export(self):
+        """History in the legacy news_history.json shape"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, headline, timestamp FROM topics ORDER BY timestamp"
+            ).fetchall()
+            keywords = {}
+            for topic_id, keyword in self._conn.execute(
+                "SELECT topic_id, keyword FROM topic_keywords"
+            ):
+                keywords.setdefault(topic_id, []).append(keyword)
+            last_news = self._get_meta("last_news_tweet")
+
+        return {
+            "covered_topics": [
+                {"headline": headline, "keywords": keywords.get(topic_id, []), "timestamp": timestamp}
+                for topic_id, headline, timestamp in rows
+            ],
+            "last_news_tweet": last_news
+        }
+
+    # =========================================================================
+    # WRITES
+    # =========================================================================
+
+    def _insert_topic(self, headline, keywords, moment):
+        cursor = self._conn.execute(
+            "INSERT INTO topics (headline, timestamp) VALUES (?, ?)", (headline, _ts(moment))
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO topic_keywords (topic_id, keyword) VALUES (?, ?)",
+            [(cursor.lastrowid, k) for k in set(k.lower() for k in keywords)]
+        )
+
+    def mark_covered(self, headline, keywords, now=None):
+        """Record a covered topic and prune topics past the retention window"""
+        now = now or clock.now()
+        with self._lock, self._conn:
+            self._insert_topic(headline, keywords, now)
+            self._set_meta("last_news_tweet", _ts(now))
+            self._conn.execute(
+                "DELETE FROM topics WHERE timestamp <= ?", (_ts(now - RETENTION_WINDOW),)
+            )
+
+    # =========================================================================
+    # INGESTED ARTICLES
+    # =========================================================================
+
+    def upsert_articles(self, articles, now=None):
+        """
+        Record a batch of fetched articles.
+
+        Already known titles keep their first_seen and get their
+        seen_count bumped, so persistence across fetches can be ranked.
+        """
+        now = now or clock.now()
+        stamp = _ts(now)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """INSERT INTO articles
+                       (title, description, keywords, score, category, country, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(title) DO UPDATE SET
+                       description = excluded.description,
+                       keywords = excluded.keywords,
+                       score = excluded.score,
+                       last_seen = excluded.last_seen,
+                       seen_count = seen_count + 1""",
+                [
+                    (a["title"], a.get("description", ""), json.dumps(a.get("keywords", [])),
+                     a.get("score", 0), a.get("category"), a.get("country"), stamp, stamp)
+                    for a in articles
+                ]
+            )
+            self._set_meta("last_ingest", stamp)
+            self._conn.execute(
+                "DELETE FROM articles WHERE last_seen < ?", (_ts(now - ARTICLE_RETENTION),)
+            )
+
+    def get_last_ingest(self):
+        with self._lock:
+            last_ingest = self._get_meta("last_ingest")
+        return datetime.fromisoformat(last_ingest) if last_ingest else None
+
+    def ranked_articles(self, since, min_score=0, persistence_points=0, max_bonus=0):
+        """
+        Articles seen since a moment with at least min_score, best first.
+
+        Rank is the keyword score plus a bonus for every extra fetch the
+        article appeared in, capped at max_bonus.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT title, description, keywords, score,
+                          score + MIN((seen_count - 1) * ?, ?) AS rank
+                   FROM articles
+                   WHERE last_seen >= ? AND score >= ?
+                   ORDER BY rank DESC, score DESC, first_seen ASC""",
+                (persistence_points, max_bonus, _ts(since), min_score)
+            ).fetchall()
+        return [
+            {"title": title, "description": description, "keywords": json.loads(keywords),
+             "score": score, "rank": rank}
+            for title, description, keywords, score, rank in rows
+        ]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_news_store(path=NEWS_DB_FILE, json_path=NEWS_HISTORY_FILE):
+    """Process-wide news store for a database file"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = NewsStore(path, json_path)
+            _stores[key] = store
+        return store
@@ -0,0 +1,362 @@
+"""
+Posting Outbox for Krokmou Bot
+SQLite write-ahead queue of generated tweets, drained with rate-limit-aware retries.
+"""
+
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+try:
+    from . import clock
+    from .metrics import get_metrics
+    from .resilience import POLICIES, get_breaker
+except ImportError:
+    import clock
+    from metrics import get_metrics
+    from resilience import POLICIES, get_breaker
+
+OUTBOX_FILE = 'outbox.db'
+
+# Delivered and abandoned entries are kept this long for inspection
+RETENTION_WINDOW = timedelta(days=7)
+
+# pending -> sending -> posted -> done, or failed
+PENDING, SENDING, POSTED, DONE, FAILED = "pending", "sending", "posted", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL,
+    source TEXT NOT NULL,
+    headline TEXT,
+    keywords TEXT NOT NULL DEFAULT '[]',
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created TEXT NOT NULL,
+    next_attempt TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    tweet_id TEXT,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox(state, next_attempt);
+"""
+
+
+def _ts(moment):
+    """Fixed-width ISO timestamp so text comparison matches time order"""
+    return moment.isoformat(timespec='microseconds')
+
+
+class PostError(Exception):
+    """
+    A failed post attempt.
+
+    retry_after is the delay the server asked for, if any; retryable is
+    False for errors that resending cannot fix (bad request, duplicate
+    content, revoked credentials).
+    """
+
+    def __init__(self, message, retry_after=None, retryable=True, duplicate=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.retryable = retryable
+        self.duplicate = duplicate
+
+
+class Outbox:
+    """
+    Durable queue of tweets waiting to be posted.
+
+    A tweet is written here before any network call and only leaves the
+    pending states once Twitter has returned its ID, so a failed or
+    interrupted post never costs a new generation. Entries move through
+    pending -> sending -> posted -> done; an entry left in "sending"
+    means the process died mid-post and the timeline must be checked
+    before sending it again.
+    """
+
+    def __init__(self, path=OUTBOX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Every transition must survive a power cut, not just a crash
+        self._conn.execute("PRAGMA synchronous=FULL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _entry(self, row):
+        entry = dict(row)
+        entry["keywords"] = json.loads(entry["keywords"])
+        entry["created"] = datetime.fromisoformat(entry["created"])
+        return entry
+
+    def _select(self, where, params=()):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM outbox WHERE {where} ORDER BY id", params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def _update(self, entry_id, now=None, **fields):
+        fields["updated"] = _ts(now or clock.now())
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE outbox SET {assignments} WHERE id = ?", (*fields.values(), entry_id))
+
+    # =========================================================================
+    # QUEUE
+    # =========================================================================
+
+    def enqueue(self, text, source, headline=None, keywords=None, now=None):
+        """Persist a generated tweet; returns its entry ID"""
+        stamp = _ts(now or clock.now())
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """INSERT INTO outbox (text, source, headline, keywords, created, next_attempt, updated)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (text, source, headline, json.dumps(list(keywords or [])), stamp, stamp, stamp)
+            )
+        return cursor.lastrowid
+
+    def pending_count(self):
+        """Entries not yet confirmed as posted"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE state IN (?, ?)", (PENDING, SENDING)
+            ).fetchone()
+        return row[0]
+
+    def due(self, now=None):
+        """Pending entries whose next attempt time has come, oldest first"""
+        return self._select("state = ? AND next_attempt <= ?", (PENDING, _ts(now or clock.now())))
+
+    def unfinished(self):
+        """Entries interrupted mid-post or posted without their history/coverage update"""
+        return self._select("state IN (?, ?)", (SENDING, POSTED))
+
+    def next_attempt(self):
+        """When the earliest pending entry becomes due, None if nothing is pending"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE state = ?", (PENDING,)
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row[0] else None
+
+    # =========================================================================
+    # TRANSITIONS
+    # =========================================================================
+
+    def mark_sending(self, entry_id, now=None):
+        """Record that a post is about to be attempted"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (SENDING, _ts(now or clock.now()), entry_id)
+            )
+
+    def mark_posted(self, entry_id, tweet_id, now=None):
+        self._update(entry_id, now, state=POSTED, tweet_id=str(tweet_id), last_error=None)
+
+    def mark_done(self, entry_id, now=None):
+        self._update(entry_id, now, state=DONE)
+
+    def defer(self, entry_id, delay, error, now=None):
+        """Put an entry back in the queue for another attempt after delay seconds"""
+        now = now or clock.now()
+        self._update(entry_id, now, state=PENDING, next_attempt=_ts(now + timedelta(seconds=delay)),
+                     last_error=str(error))
+
+    def mark_failed(self, entry_id, error, now=None):
+        self._update(entry_id, now, state=FAILED, last_error=str(error))
+
+    def prune(self, now=None):
+        """Drop delivered and abandoned entries past the retention window"""
+        cutoff = _ts((now or clock.now()) - RETENTION_WINDOW)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM outbox WHERE state IN (?, ?) AND updated <= ?", (DONE, FAILED, cutoff)
+            )
+
+
+class OutboxSender:
+    """
+    Posts outbox entries and applies their side effects once confirmed.
+
+    twitter_getter returns the TwitterClient (resolved lazily so an idle
+    account never loads tweepy); on_posted(entry) records a confirmed
+    tweet in history and news coverage. The entry is marked posted
+    before on_posted runs and done after, so a crash in between re-runs
+    on_posted rather than re-posting. breaker_name scopes the circuit
+    breaker, one per account, so an account with revoked credentials
+    never stops the others from posting.
+    """
+
+    def __init__(self, outbox, twitter_getter, on_posted, breaker_name="twitter"):
+        self.outbox = outbox
+        self.twitter_getter = twitter_getter
+        self.on_posted = on_posted
+        self.policy = POLICIES["twitter"]
+        self.breaker = get_breaker(breaker_name)
+        self.logger = logging.getLogger(__name__)
+        # Drains from the cycle and the background worker never overlap
+        self._lock = threading.Lock()
+
+    def drain(self, max_attempts=8, max_age_hours=6, now=None):
+        """
+        Post every due entry, oldest first.
+
+        Returns the entries confirmed during this call.
+        """
+        with self._lock:
+            now = now or clock.now()
+            posted = []
+            if not self._recover(max_age_hours, now, posted):
+                return posted
+
+            for entry in self.outbox.due(now):
+                if now - entry["created"] > timedelta(hours=max_age_hours):
+                    self.logger.warning(f"Outbox entry {entry['id']} expired unsent: {entry['text'][:60]}")
+                    self.outbox.mark_failed(entry["id"], f"expired: {entry['last_error']}", now)
+                    get_metrics().inc("outbox_failed", reason="expired")
+                    continue
+                if not self.breaker.allow():
+                    self.logger.warning(f"{self.breaker.name}: circuit open, leaving outbox for later")
+                    break
+                if not self._send(entry, max_attempts, now, posted):
+                    break
+
+            self.outbox.prune(now)
+            return posted
+
+    def _recover(self, max_age_hours, now, posted):
+        """
+        Settle entries left mid-flight by a previous run.
+
+        Returns False when an interrupted post could not be checked
+        against the timeline; nothing else is sent until it can.
+        """
+        for entry in self.outbox.unfinished():
+            if entry["state"] == POSTED:
+                self._commit(entry, now, posted)
+                continue
+
+            try:
+                tweet_id = self.twitter_getter().find_recent(entry["text"])
+            except PostError as e:
+                if now - entry["created"] > timedelta(hours=max_age_hours):
+                    self.logger.error(f"Outbox entry {entry['id']} never confirmed, giving up: {e}")
+                    self.outbox.mark_failed(entry["id"], f"unconfirmed: {e}", now)
+                    get_metrics().inc("outbox_failed", reason="unconfirmed")
+                    continue
+                self.logger.warning(f"Cannot check whether outbox entry {entry['id']} was posted: {e}")
+                return False
+
+            if tweet_id:
+                self.logger.info(f"Outbox entry {entry['id']} was posted before a restart ({tweet_id})")
+                self.outbox.mark_posted(entry["id"], tweet_id, now)
+                entry["tweet_id"] = tweet_id
+                self._commit(entry, now, posted)
+            else:
+                self.logger.info(f"Outbox entry {entry['id']} was not posted before a restart, requeueing")
+                self.outbox.defer(entry["id"], 0, "interrupted", now)
+        return True
+
+    def _send(self, entry, max_attempts, now, posted):
+        """Attempt one entry; returns False when the rest should wait"""
+        twitter = self.twitter_getter()
+        self.outbox.mark_sending(entry["id"], now)
+        try:
+            tweet_id = twitter.create(entry["text"])
+        except PostError as e:
+            if e.retryable:
+                self.breaker.record_failure()
+            else:
+                # Rejected content or credentials say nothing about Twitter's health
+                self.breaker.release()
+            attempts = entry["attempts"] + 1
+
+            if e.duplicate:
+                # An earlier attempt may have gone through despite the error
+                try:
+                    tweet_id = twitter.find_recent(entry["text"])
+                except PostError:
+                    tweet_id = None
+                if tweet_id:
+                    self.outbox.mark_posted(entry["id"], tweet_id, now)
+                    entry["tweet_id"] = tweet_id
+                    self._commit(entry, now, posted)
+                    return True
+
+            if not e.retryable or attempts >= max_attempts:
+                reason = "rejected" if not e.retryable else "attempts"
+                self.logger.error(f"Outbox entry {entry['id']} failed ({reason}): {e}")
+                self.outbox.mark_failed(entry["id"], e, now)
+                get_metrics().inc("outbox_failed", reason=reason)
+                return True
+
+            delay = self.policy.backoff(attempts - 1)
+            if e.retry_after is not None:
+                delay = max(delay, e.retry_after)
+            self.logger.warning(f"Post failed ({e}), outbox entry {entry['id']} retries in {delay:.0f}s")
+            self.outbox.defer(entry["id"], delay, e, now)
+            get_metrics().inc("outbox_deferred")
+            # Rate limits and outages apply to every entry behind this one
+            return False
+        except Exception:
+            self.breaker.release()
+            raise
+
+        self.breaker.record_success()
+        self.outbox.mark_posted(entry["id"], tweet_id, now)
+        entry["tweet_id"] = tweet_id
+        self.logger.info(f"Tweet URL: {twitter.tweet_url(tweet_id)}")
+        self._commit(entry, now, posted)
+        return True
+
+    def _commit(self, entry, now, posted):
+        try:
+            self.on_posted(entry)
+        except Exception as e:
+            # Stays "posted" and is retried on the next drain
+            self.logger.error(f"Recording posted tweet {entry['tweet_id']} failed: {e}")
+            return
+        self.outbox.mark_done(entry["id"], now)
+        posted.append(entry)
+
+
+class OutboxWorker(threading.Thread):
+    """
+    Background thread retrying deferred entries between slots.
+
+    config_loader returns the current "outbox" config section.
+    """
+
+    def __init__(self, sender, config_loader):
+        super().__init__(name="outbox", daemon=True)
+        self.sender = sender
+        self.config_loader = config_loader
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            config = self.config_loader()
+            try:
+                if self.sender.outbox.pending_count():
+                    self.sender.drain(
+                        max_attempts=config.get("max_attempts", 8),
+                        max_age_hours=config.get("max_age_hours", 6)
+                    )
+            except Exception as e:
+                self.logger.error(f"Outbox drain error: {e}")
+            self._stop_event.wait(config.get("poll_seconds", 60))
+
+    def stop(self):
+        self._stop_event.set()
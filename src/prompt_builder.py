@@ -0,0 +1,153 @@
+"""
+Prompt Builder for Krokmou Bot
+Token-budgeted history context and system prompts that keep a byte-identical static prefix across calls.
+"""
+
+import re
+import math
+import string
+import logging
+
+try:
+    from .keyword_matcher import fold
+    from .metrics import get_metrics
+except ImportError:
+    from keyword_matcher import fold
+    from metrics import get_metrics
+
+# Tweets considered when choosing the history context
+HISTORY_POOL = 40
+# Per-tweet recency decay when weighting themes and openings
+RECENCY_DECAY = 0.95
+# An opening counts as much as this many themes
+OPENING_WEIGHT = 2.0
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+about after again also always been before being could does doing down from have having here
+into just like made make more most much never only other over really same some such than that
+their them then there these they this those through very were what when where which while with
+would your yours mine myself
+""".split())
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """
+    Approximate token count of text for BPE-style tokenizers.
+
+    Punctuation marks cost one token each, words one token per six
+    characters; this tracks common tokenizers within ~15% on English and
+    French prose without needing one installed.
+    """
+    return sum(math.ceil(len(piece) / 6) for piece in _PIECE.findall(text))
+
+
+def _features(tweet):
+    """Themes (content words) and the opening word of a tweet"""
+    words = _WORD.findall(fold(tweet))
+    features = {f"open:{words[0]}"} if words else set()
+    for word in words:
+        if len(word) >= 4 and word not in STOPWORDS:
+            features.add(word[:-1] if word.endswith("s") and len(word) > 4 else word)
+    return features
+
+
+def select_history(tweets, max_tokens, pool=HISTORY_POOL):
+    """
+    Choose past tweets covering as many recent themes and openings as fit in max_tokens.
+
+    tweets are oldest first. Each theme and opening is weighted by how
+    often, and how recently, it appears in the last pool tweets, so the
+    habits most at risk of being repeated are shown first. The latest
+    tweet is always included when it fits; the rest are picked greedily
+    by newly covered weight per token. Returns tweets oldest first.
+    """
+    candidates = tweets[-pool:] if pool > 0 else []
+    if not candidates or max_tokens <= 0:
+        return []
+
+    features = [_features(tweet) for tweet in candidates]
+    weights = {}
+    for age, tweet_features in enumerate(reversed(features)):
+        for feature in tweet_features:
+            weight = OPENING_WEIGHT if feature.startswith("open:") else 1.0
+            weights[feature] = weights.get(feature, 0.0) + weight * RECENCY_DECAY ** age
+
+    # One extra token for the newline joining each line
+    costs = [estimate_tokens(tweet) + 1 for tweet in candidates]
+    chosen = set()
+    covered = set()
+    budget = max_tokens
+
+    latest = len(candidates) - 1
+    if costs[latest] <= budget:
+        chosen.add(latest)
+        covered |= features[latest]
+        budget -= costs[latest]
+
+    while True:
+        best, best_gain = None, 0.0
+        for index in range(latest, -1, -1):
+            if index in chosen or costs[index] > budget:
+                continue
+            gain = sum(weights[f] for f in features[index] - covered) / costs[index]
+            if gain > best_gain:
+                best, best_gain = index, gain
+        if best is None:
+            break
+        chosen.add(best)
+        covered |= features[best]
+        budget -= costs[best]
+
+    return [candidates[index] for index in sorted(chosen)]
+
+
+class PromptTemplate:
+    """
+    A system prompt template split at its first placeholder.
+
+    Everything before the first placeholder is the static prefix: it is
+    built once and reused as the same string on every render, so
+    providers that cache prompt prefixes can reuse it across calls.
+    Templates should therefore put per-call context (time, headline,
+    history) after the persona instructions.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        prefix, dynamic, in_dynamic = [], [], False
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if not in_dynamic:
+                prefix.append(literal)
+            else:
+                dynamic.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is not None:
+                in_dynamic = True
+                dynamic.append("{" + field + (f"!{conversion}" if conversion else "")
+                               + (f":{spec}" if spec else "") + "}")
+        self.prefix = "".join(prefix)
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self._dynamic = "".join(dynamic)
+
+    def render(self, **fields):
+        return self.prefix + self._dynamic.format(**fields)
+
+
+def report_prompt(kind, template, messages, history):
+    """Log and count the approximate tokens of one prompt"""
+    total = sum(estimate_tokens(message["content"]) for message in messages)
+    history_tokens = sum(estimate_tokens(tweet) + 1 for tweet in history)
+
+    metrics = get_metrics()
+    metrics.inc("prompts", kind=kind)
+    metrics.inc("prompt_tokens", total, kind=kind)
+    metrics.inc("prompt_tokens_static", template.prefix_tokens, kind=kind)
+    logger.info(
+        f"{kind.capitalize()} prompt ~{total} tokens "
+        f"({template.prefix_tokens} static prefix, {history_tokens} history over {len(history)} tweets)"
+    )
+    return total
@@ -0,0 +1,279 @@
+"""
+Resilience for Krokmou Bot
+Shared retry policy with jittered backoff, rate-limit header parsing and per-service circuit breakers.
+"""
+
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+try:
+    from .metrics import get_metrics
+except ImportError:
+    from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class RetryPolicy:
+    """Backoff settings for one service"""
+
+    def __init__(self, base_delay=1.0, max_delay=60.0, deadline=180.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for a zero-based attempt number"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+POLICIES = {
+    "openrouter": RetryPolicy(base_delay=2.0, max_delay=60.0, deadline=180.0),
+    "twitter": RetryPolicy(base_delay=5.0, max_delay=120.0, deadline=300.0),
+}
+
+
+def retry_after_seconds(headers):
+    """
+    Delay requested by the server, if any.
+
+    Understands Retry-After (seconds or HTTP date) and the reset headers
+    used by OpenRouter (X-RateLimit-Reset, epoch milliseconds) and
+    Twitter (x-rate-limit-reset, epoch seconds).
+    """
+    if not headers:
+        return None
+
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                moment = parsedate_to_datetime(value)
+                return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+
+    value = headers.get("X-RateLimit-Reset") or headers.get("x-rate-limit-reset")
+    if value:
+        try:
+            reset = float(value)
+        except ValueError:
+            return None
+        if reset > 1e12:
+            reset /= 1000.0
+        return max(0.0, reset - time.time())
+
+    return None
+
+
+def is_retryable_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+# =========================================================================
+# CIRCUIT BREAKER
+# =========================================================================
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after repeated failures.
+
+    After failure_threshold consecutive failures the circuit opens for
+    cooldown seconds; then a single trial call is let through, and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold=3, cooldown=300.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def available(self):
+        """Whether allow() would let a call through, without claiming the trial"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            return time.monotonic() - self._opened_at >= self.cooldown and not self._trial_in_flight
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def release(self):
+        """End a trial call without an outcome (it failed for reasons unrelated to the dependency)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Circuit {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            was_trial = self._trial_in_flight
+            self._trial_in_flight = False
+            if was_trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                get_metrics().inc("circuit_opens", service=self.name)
+                logger.warning(f"Circuit {self.name} open for {self.cooldown:.0f}s after {self._failures} failures")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(service):
+    """Process-wide circuit breaker for a service"""
+    with _breakers_lock:
+        breaker = _breakers.get(service)
+        if breaker is None:
+            breaker = CircuitBreaker(service)
+            _breakers[service] = breaker
+        return breaker
+
+
+# =========================================================================
+# PER-CALL RETRY STATE
+# =========================================================================
+
+class RetryState:
+    """
+    Tracks one logical call (possibly several attempts) against a service.
+
+    Typical loop:
+        with RetryState("openrouter") as retry:
+            while retry.allow():
+                try:
+                    ... request with timeout=retry.timeout(30) ...
+                    retry.success()
+                except requests.exceptions.RequestException as e:
+                    if not retry.failure(e):
+                        break
+
+    An attempt admitted by allow() that ends without success() or
+    failure() (a malformed response, a local error) is released on the
+    next allow() or when the block exits, so a half-open breaker never
+    waits forever for a trial outcome.
+
+    For a service with several backends (OpenRouter models), allow(key)
+    checks the breaker of that backend ("openrouter:<model>"), so one
+    failing model never blocks calls to the others.
+    """
+
+    def __init__(self, service, policy=None):
+        self.service = service
+        self.policy = policy or POLICIES.get(service, RetryPolicy())
+        self.breaker = get_breaker(service)
+        self.started = time.monotonic()
+        self.failures = 0
+        self._admitted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+    def release(self):
+        """Settle an admitted attempt that recorded no outcome"""
+        if self._admitted:
+            self._admitted = False
+            self.breaker.release()
+
+    def remaining(self):
+        return self.policy.deadline - (time.monotonic() - self.started)
+
+    def timeout(self, cap):
+        """Per-request timeout that never outlives the overall deadline"""
+        return max(1.0, min(cap, self.remaining()))
+
+    def _breaker(self, key=None):
+        return get_breaker(f"{self.service}:{key}" if key else self.service)
+
+    def available(self, key=None):
+        """Whether the breaker for a backend would admit a call"""
+        return self._breaker(key).available()
+
+    def allow(self, key=None):
+        self.release()
+        if self.remaining() <= 0:
+            logger.warning(f"{self.service}: deadline of {self.policy.deadline:.0f}s exceeded")
+            return False
+        self.breaker = self._breaker(key)
+        if not self.breaker.allow():
+            logger.warning(f"{self.breaker.name}: circuit open, skipping call")
+            return False
+        self._admitted = True
+        return True
+
+    def success(self):
+        self._admitted = False
+        self.breaker.record_success()
+
+    def failure(self, error=None):
+        """
+        Record a failed attempt and wait before the next one.
+
+        Returns False when retrying is pointless: a non-retryable client
+        error, or a wait that would overrun the deadline.
+        """
+        self._admitted = False
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+
+        if status is not None and not is_retryable_status(status):
+            # A rejected request says nothing about the service's health
+            self.breaker.release()
+            get_metrics().inc("retry_giveups", service=self.service, reason="client_error")
+            return False
+        self.breaker.record_failure()
+
+        delay = self.policy.backoff(self.failures)
+        server_delay = retry_after_seconds(getattr(response, "headers", None))
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        self.failures += 1
+
+        if delay >= self.remaining():
+            logger.warning(f"{self.service}: retry in {delay:.1f}s would exceed deadline, giving up")
+            get_metrics().inc("retry_giveups", service=self.service, reason="deadline")
+            return False
+
+        logger.info(f"{self.service}: retrying in {delay:.1f}s")
+        get_metrics().inc("retries", service=self.service)
+        time.sleep(delay)
+        return True
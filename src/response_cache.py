@@ -0,0 +1,99 @@
+"""
+Response Cache for Krokmou Bot
+On-disk TTL cache for JSON API responses with ETag/Last-Modified revalidation.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+CACHE_DIR = os.path.join('.cache', 'newsapi')
+
+
+class ResponseCache:
+    """
+    Caches GET responses keyed by URL and parameters.
+
+    Secret parameters (API keys) are left out of the key and never
+    written to disk. Fresh entries are served without a request; stale
+    ones are revalidated with a conditional request when the server gave
+    validators, and a 304 refreshes the entry without a new body.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl_seconds=900, exclude_params=("apiKey",)):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.exclude_params = set(exclude_params)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _path(self, url, params):
+        public = {k: v for k, v in (params or {}).items() if k not in self.exclude_params}
+        raw = url + "?" + json.dumps(public, sort_keys=True)
+        return os.path.join(self.directory, hashlib.sha256(raw.encode('utf-8')).hexdigest() + ".json")
+
+    def _load(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _store(self, path, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.{threading.get_ident()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get_json(self, session, url, params=None, timeout=10, ttl_seconds=None):
+        """GET a JSON document through the cache"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        path = self._path(url, params)
+        entry = self._load(path) if ttl > 0 else None
+
+        if entry and time.time() - entry["stored_at"] < ttl:
+            self._count("hits")
+            return entry["body"]
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(url, params=params, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and entry:
+            entry["stored_at"] = time.time()
+            self._store(path, entry)
+            self._count("revalidated")
+            return entry["body"]
+
+        response.raise_for_status()
+        body = response.json()
+        self._count("misses")
+
+        if ttl > 0:
+            self._store(path, {
+                "stored_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "body": body
+            })
+        return body
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
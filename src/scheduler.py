@@ -0,0 +1,246 @@
+"""
+Slot Scheduler for Krokmou Bot
+Sleeps until the next posting slot in the configured timezone and catches up on missed slots.
+"""
+
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytz
+
+try:
+    from . import clock
+except ImportError:
+    import clock
+
+SCHEDULER_STATE_FILE = 'scheduler_state.json'
+
+# Upper bound on a single sleep, so wall-clock jumps (suspend, NTP) are noticed
+MAX_SLEEP_SECONDS = 3600
+
+
+def parse_slot(slot):
+    """Parse an "HH:MM" slot string into (hour, minute)"""
+    hour, minute = slot.split(":")
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid slot time: {slot}")
+    return hour, minute
+
+
+class SlotScheduler:
+    """
+    Runs a job at fixed local times of day.
+
+    Slot times are resolved in the given timezone for each calendar day,
+    so they stay correct across DST changes. The last slot run is
+    persisted; on startup, a slot missed less than grace_minutes ago is
+    run once. slots are "HH:MM" strings or already parsed (hour, minute)
+    pairs, such as a config snapshot's slots.
+    """
+
+    def __init__(self, slots, job, timezone='Europe/Paris', grace_minutes=90,
+                 state_file=SCHEDULER_STATE_FILE, hooks=None):
+        self.slots = sorted(parse_slot(s) if isinstance(s, str) else tuple(s) for s in slots)
+        self.job = job
+        self.tz = pytz.timezone(timezone)
+        self.grace = timedelta(minutes=grace_minutes)
+        self.state_file = state_file
+        # (lead_seconds, callable) run shortly before every slot
+        self.hooks = sorted(hooks or [], key=lambda h: -h[0])
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+    def now(self):
+        return clock.now(self.tz)
+
+    # =========================================================================
+    # SLOT COMPUTATION
+    # =========================================================================
+
+    def _localize(self, naive):
+        try:
+            return self.tz.localize(naive, is_dst=None)
+        except pytz.exceptions.AmbiguousTimeError:
+            # Clocks go back: use the first occurrence
+            return self.tz.localize(naive, is_dst=True)
+        except pytz.exceptions.NonExistentTimeError:
+            # Clocks go forward: shift past the gap
+            return self.tz.normalize(self.tz.localize(naive, is_dst=False))
+
+    def slots_on(self, day):
+        """Aware datetimes of every slot on a calendar day"""
+        return [
+            self._localize(datetime(day.year, day.month, day.day, hour, minute))
+            for hour, minute in self.slots
+        ]
+
+    def next_slot(self, after):
+        """First slot strictly after a moment"""
+        day = after.astimezone(self.tz).date()
+        for offset in range(3):
+            for slot in self.slots_on(day + timedelta(days=offset)):
+                if slot > after:
+                    return slot
+        raise ValueError("No slots configured")
+
+    def previous_slot(self, at):
+        """Latest slot at or before a moment"""
+        day = at.astimezone(self.tz).date()
+        for offset in range(0, 3):
+            for slot in reversed(self.slots_on(day - timedelta(days=offset))):
+                if slot <= at:
+                    return slot
+        return None
+
+    # =========================================================================
+    # STATE
+    # =========================================================================
+
+    def _load_last_run(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                value = json.load(f).get("last_slot")
+            return datetime.fromisoformat(value) if value else None
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            return None
+
+    def _save_last_run(self, slot):
+        # A crash mid-write must not leave a corrupt state that breaks catch-up
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"last_slot": slot.isoformat()}, f)
+        os.replace(tmp_path, self.state_file)
+
+    # =========================================================================
+    # RUNNING
+    # =========================================================================
+
+    def run_slot(self, slot):
+        """Record a slot as run, then run the job for it"""
+        # Recorded before running so a crash mid-job never double-posts on restart
+        self._save_last_run(slot)
+        self.logger.info(f"Running slot {slot.strftime('%Y-%m-%d %H:%M %Z')}")
+        try:
+            self.job()
+        except Exception as e:
+            self.logger.error(f"Slot job error: {e}")
+
+    def catch_up(self):
+        """Run the most recent slot once if it was missed within the grace window"""
+        now = self.now()
+        last_run = self._load_last_run()
+        if last_run is None:
+            # First start with this scheduler: nothing is known to be missed
+            self._save_last_run(now)
+            return False
+
+        slot = self.previous_slot(now)
+        if slot is None or slot <= last_run:
+            return False
+        if now - slot > self.grace:
+            self.logger.warning(f"Skipping missed slot {slot.strftime('%H:%M')} (outside grace window)")
+            self._save_last_run(slot)
+            return False
+
+        self.logger.info(f"Catching up missed slot {slot.strftime('%H:%M')}")
+        self.run_slot(slot)
+        return True
+
+    def _sleep_until(self, moment):
+        """Sleep until a moment; False if the scheduler was stopped"""
+        while not self._stop_event.is_set():
+            remaining = (moment - self.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            self._stop_event.wait(min(remaining, MAX_SLEEP_SECONDS))
+        return False
+
+    def run_forever(self):
+        self.catch_up()
+        while not self._stop_event.is_set():
+            slot = self.next_slot(self.now())
+            self.logger.info(f"Next slot: {slot.strftime('%Y-%m-%d %H:%M %Z')}")
+
+            for lead_seconds, hook in self.hooks:
+                at = slot - timedelta(seconds=lead_seconds)
+                if at <= self.now():
+                    continue
+                if not self._sleep_until(at):
+                    return
+                try:
+                    hook()
+                except Exception as e:
+                    self.logger.error(f"Pre-slot hook error: {e}")
+
+            if not self._sleep_until(slot):
+                return
+            self.run_slot(slot)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class MultiSlotScheduler:
+    """
+    Drives several SlotSchedulers (one per account) from a single thread.
+
+    Each scheduler keeps its own slots, timezone and state file; due jobs
+    are handed to a shared worker pool so a slow or failing account never
+    delays the others. Hooks run once before the nearest slot of any
+    account.
+    """
+
+    def __init__(self, schedulers, max_workers=4, hooks=None):
+        self.schedulers = list(schedulers)
+        self.hooks = sorted(hooks or [], key=lambda h: -h[0])
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="slot-worker")
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+    def now(self):
+        return clock.now(pytz.utc)
+
+    def _sleep_until(self, moment):
+        """Sleep until a moment; False if the scheduler was stopped"""
+        while not self._stop_event.is_set():
+            remaining = (moment - self.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            self._stop_event.wait(min(remaining, MAX_SLEEP_SECONDS))
+        return False
+
+    def run_forever(self):
+        for scheduler in self.schedulers:
+            self.executor.submit(scheduler.catch_up)
+
+        while not self._stop_event.is_set():
+            now = self.now()
+            upcoming = [(scheduler.next_slot(now), scheduler) for scheduler in self.schedulers]
+            slot = min(moment for moment, _ in upcoming)
+            due = [(moment, scheduler) for moment, scheduler in upcoming if moment == slot]
+            self.logger.info(f"Next slot: {due[0][0].strftime('%Y-%m-%d %H:%M %Z')} ({len(due)} job(s))")
+
+            for lead_seconds, hook in self.hooks:
+                at = slot - timedelta(seconds=lead_seconds)
+                if at <= self.now():
+                    continue
+                if not self._sleep_until(at):
+                    return
+                try:
+                    hook()
+                except Exception as e:
+                    self.logger.error(f"Pre-slot hook error: {e}")
+
+            if not self._sleep_until(slot):
+                return
+            for moment, scheduler in due:
+                self.executor.submit(scheduler.run_slot, moment)
+
+    def stop(self):
+        self._stop_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,134 @@
+"""
+Story Clustering for Krokmou Bot
+Groups near-duplicate headlines from different feeds and outlets into stories using character n-gram TF-IDF.
+"""
+
+import re
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Optional: the pure-Python path gives the same clusters, just slower
+    np = None
+
+try:
+    from .keyword_matcher import fold
+except ImportError:
+    from keyword_matcher import fold
+
+NGRAM_SIZE = 4
+DEFAULT_THRESHOLD = 0.3
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _ngrams(text):
+    """Character n-grams of each word, padded so word boundaries count"""
+    grams = {}
+    for word in _NON_WORD.sub(" ", fold(text)).split():
+        padded = f" {word} "
+        if len(padded) <= NGRAM_SIZE:
+            grams[padded] = grams.get(padded, 0) + 1
+            continue
+        for i in range(len(padded) - NGRAM_SIZE + 1):
+            gram = padded[i:i + NGRAM_SIZE]
+            grams[gram] = grams.get(gram, 0) + 1
+    return grams
+
+
+def _tfidf(texts):
+    """Sparse, L2-normalised TF-IDF vectors as {gram: weight} dicts"""
+    counts = [_ngrams(text) for text in texts]
+    document_frequency = {}
+    for grams in counts:
+        for gram in grams:
+            document_frequency[gram] = document_frequency.get(gram, 0) + 1
+
+    n = len(texts)
+    vectors = []
+    for grams in counts:
+        vector = {
+            gram: (1 + math.log(count)) * (math.log((1 + n) / (1 + document_frequency[gram])) + 1)
+            for gram, count in grams.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        vectors.append({gram: w / norm for gram, w in vector.items()})
+    return vectors
+
+
+def similar_pairs(texts, threshold=DEFAULT_THRESHOLD):
+    """Index pairs (i, j), i < j, whose cosine similarity exceeds threshold"""
+    vectors = _tfidf(texts)
+
+    if np is not None:
+        vocabulary = {}
+        for vector in vectors:
+            for gram in vector:
+                vocabulary.setdefault(gram, len(vocabulary))
+        matrix = np.zeros((len(vectors), max(1, len(vocabulary))), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            if vector:
+                matrix[row, [vocabulary[g] for g in vector]] = list(vector.values())
+        similarity = np.triu(matrix @ matrix.T, k=1)
+        return [(int(i), int(j)) for i, j in np.argwhere(similarity > threshold)]
+
+    # Without numpy, only compare texts sharing at least one n-gram
+    postings = {}
+    for index, vector in enumerate(vectors):
+        for gram, weight in vector.items():
+            postings.setdefault(gram, []).append((index, weight))
+    pairs = []
+    for i, vector in enumerate(vectors):
+        dots = {}
+        for gram, weight in vector.items():
+            for j, other in postings[gram]:
+                if j > i:
+                    dots[j] = dots.get(j, 0.0) + weight * other
+        pairs.extend((i, j) for j, dot in sorted(dots.items()) if dot > threshold)
+    return pairs
+
+
+def cluster_texts(texts, threshold=DEFAULT_THRESHOLD):
+    """
+    Group texts whose cosine similarity exceeds threshold.
+
+    Groups are transitive (A~B and B~C puts all three together) and are
+    returned as lists of indices, each in input order, groups ordered by
+    their first member.
+    """
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in similar_pairs(texts, threshold):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values(), key=lambda group: group[0])
+
+
+def group_stories(articles, threshold=DEFAULT_THRESHOLD, breadth_points=0, max_bonus=0):
+    """
+    Collapse ranked articles (best first) into stories, best first.
+
+    Each story is represented by its best-ranked article, which keeps its
+    fields plus "members" (how many outlets ran the story) and a rank
+    raised by breadth_points per extra outlet, capped at max_bonus.
+    """
+    texts = [f"{a.get('title', '')} {a.get('description') or ''}" for a in articles]
+    stories = []
+    for group in cluster_texts(texts, threshold):
+        lead = articles[group[0]]
+        bonus = min((len(group) - 1) * breadth_points, max_bonus)
+        stories.append({**lead, "members": len(group), "rank": lead["rank"] + bonus})
+    # Stable sort keeps the store's tie-breaking (score, then first seen)
+    stories.sort(key=lambda story: story["rank"], reverse=True)
+    return stories
@@ -0,0 +1,103 @@
+"""
+Streaming Completions for Krokmou Bot
+Consumes OpenRouter chat completions as server-sent events and aborts hopeless generations early.
+"""
+
+import json
+import time
+import logging
+
+try:
+    from .metrics import get_metrics
+except ImportError:
+    from metrics import get_metrics
+
+# Room for trailing quotes or "(123 characters)" notes that cleaning strips at the end
+LENGTH_SLACK = 25
+
+logger = logging.getLogger(__name__)
+
+
+class StreamError(Exception):
+    """Error event received in the middle of a stream"""
+
+
+class StreamResult:
+    """Outcome of one streamed completion"""
+
+    def __init__(self, text, aborted=None, ttft=None, total=None):
+        self.text = text
+        self.aborted = aborted
+        self.ttft = ttft
+        self.total = total
+
+    def record(self, **labels):
+        """Report time to first token and total stream time to the metrics registry"""
+        metrics = get_metrics()
+        if self.ttft is not None:
+            metrics.observe("stream_ttft", self.ttft, **labels)
+        metrics.observe("stream_total", self.total, **labels)
+
+    def __repr__(self):
+        return f"StreamResult(aborted={self.aborted}, ttft={self.ttft}, total={self.total}, text={self.text!r})"
+
+
+def _abort_reason(text, max_chars, forbidden_openings):
+    opening = text.lstrip().lower()
+    for phrase in forbidden_openings:
+        if opening.startswith(phrase.lower()):
+            return "forbidden_opening"
+    if len(text) > max_chars + LENGTH_SLACK:
+        return "too_long"
+    return None
+
+
+def stream_completion(session, url, headers, data, timeout=30, max_chars=200,
+                      forbidden_openings=(), clean=None):
+    """
+    Stream one chat completion, cleaning text as it arrives.
+
+    The request is cancelled as soon as the cleaned text clearly exceeds
+    max_chars or starts with a forbidden opening. Returns a StreamResult
+    with time-to-first-token and total stream time in seconds.
+    """
+    clean = clean or (lambda text: text.strip())
+    started = time.monotonic()
+    ttft = None
+    parts = []
+
+    with session.post(url, headers=headers, json={**data, "stream": True},
+                      stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        # text/event-stream often omits a charset; requests would assume Latin-1
+        response.encoding = "utf-8"
+
+        for line in response.iter_lines(decode_unicode=True):
+            # Blank separators and ": keep-alive" comments carry no data
+            if not line or line.startswith(":") or not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+
+            chunk = json.loads(payload)
+            if "error" in chunk:
+                raise StreamError(chunk["error"].get("message", chunk["error"]))
+
+            choices = chunk.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content") or ""
+            if not delta:
+                continue
+            if ttft is None:
+                ttft = time.monotonic() - started
+            parts.append(delta)
+
+            text = clean("".join(parts))
+            reason = _abort_reason(text, max_chars, forbidden_openings)
+            if reason:
+                total = time.monotonic() - started
+                logger.info(f"Stream aborted ({reason}) after {len(text)} chars, {total:.2f}s")
+                return StreamResult(text, reason, ttft, total)
+
+    total = time.monotonic() - started
+    return StreamResult(clean("".join(parts)), None, ttft, total)
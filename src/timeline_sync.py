@@ -0,0 +1,197 @@
+"""
+Timeline Sync for Krokmou Bot
+Merges tweets posted outside this process (by hand, from another host) into the local tweet history.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+try:
+    from . import clock
+    from .metrics import get_metrics
+    from .tweet_history import normalize
+except ImportError:
+    import clock
+    from metrics import get_metrics
+    from tweet_history import normalize
+
+TIMELINE_STATE_FILE = 'timeline_state.json'
+
+
+def _key(text):
+    """Compact fingerprint of a tweet text for membership checks"""
+    return hashlib.blake2b(normalize(text).encode('utf-8'), digest_size=8).digest()
+
+
+class TimelineSync:
+    """
+    Pulls the account's own timeline into its TweetHistory.
+
+    The newest synced tweet ID is persisted as a high-water mark, so each
+    sync only pages through tweets posted since (since_id). The first
+    sync backfills the whole timeline the API exposes (its most recent
+    3200 tweets). Pages arrive newest first; they are streamed to a
+    spool file and replayed oldest first, so neither a sync nor the
+    backfill holds the fetched timeline in memory.
+    """
+
+    def __init__(self, twitter_getter, tweet_history, state_file=TIMELINE_STATE_FILE):
+        self.twitter_getter = twitter_getter
+        self.tweet_history = tweet_history
+        self.state_file = state_file
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    # =========================================================================
+    # STATE
+    # =========================================================================
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self, state):
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_file)
+
+    # =========================================================================
+    # SPOOL
+    # =========================================================================
+
+    def _spool(self, path, since_id=None, page_size=100, max_pages=None):
+        """
+        Write timeline pages to path as JSON lines.
+
+        Returns (pages, newest_id, count) where pages lists the byte offset
+        and length of each page, newest page first.
+        """
+        pages, newest_id, count = [], None, 0
+        with open(path, 'wb') as f:
+            for tweets, page_newest in self.twitter_getter().timeline_pages(since_id, page_size):
+                newest_id = newest_id or page_newest
+                pages.append((f.tell(), len(tweets)))
+                for tweet_id, text in tweets:
+                    f.write(json.dumps([tweet_id, text], ensure_ascii=False).encode('utf-8') + b'\n')
+                count += len(tweets)
+                if max_pages and len(pages) >= max_pages:
+                    break
+        return pages, newest_id, count
+
+    def _replay(self, path, pages):
+        """Texts from a spool file, oldest first, one page in memory at a time"""
+        with open(path, 'rb') as f:
+            for offset, length in reversed(pages):
+                f.seek(offset)
+                page = [json.loads(f.readline()) for _ in range(length)]
+                for _, text in reversed(page):
+                    yield text
+
+    # =========================================================================
+    # SYNC
+    # =========================================================================
+
+    def sync(self, page_size=100, backfill=True):
+        """
+        Merge tweets posted since the last sync into history.
+
+        Without a high-water mark this is the one-time backfill, or with
+        backfill=False just the latest page. Returns the number of tweets
+        added. API errors propagate and leave the high-water mark as is;
+        once the timeline is fetched the mark advances even if merging it
+        into history fails, so the fetch is not repeated.
+        """
+        with self._lock:
+            state = self._load_state()
+            since_id = state.get("since_id")
+            spool = f"{self.state_file}.spool"
+            full = since_id is None and backfill
+            try:
+                pages, newest_id, count = self._spool(
+                    spool, since_id, page_size, max_pages=None if since_id or full else 1
+                )
+                if newest_id:
+                    # Saved before merging: a merge that keeps failing (read-only
+                    # or busy history file) must not refetch the timeline every interval
+                    state["since_id"] = newest_id
+                    self._save_state(state)
+                if full:
+                    added = self._backfill(spool, pages, count)
+                    state["backfilled_at"] = clock.now().isoformat()
+                else:
+                    added = self.tweet_history.extend(self._replay(spool, pages))
+            finally:
+                if os.path.exists(spool):
+                    os.remove(spool)
+
+            state["synced_at"] = clock.now().isoformat()
+            self._save_state(state)
+
+        get_metrics().inc("timeline_synced", added)
+        if added:
+            self.logger.info(f"Timeline sync added {added} tweet(s) to history")
+        return added
+
+    def _backfill(self, spool, pages, count):
+        """
+        Rebuild history as: local tweets missing from the timeline (older
+        than what the API returns, or deleted), then the spooled timeline
+        oldest first. Only 8-byte fingerprints of the timeline stay in memory.
+        """
+        if not count:
+            return 0
+
+        remote = set()
+        for text in self._replay(spool, pages):
+            remote.add(_key(text))
+
+        before = len(self.tweet_history)
+
+        def merged():
+            # Read under the history lock held by rewrite()
+            for text in self.tweet_history.tweets():
+                if _key(text) not in remote:
+                    yield text
+            yield from self._replay(spool, pages)
+
+        total = self.tweet_history.rewrite(merged())
+        self.logger.info(f"Timeline backfill: {count} tweets fetched, history {before} -> {total}")
+        return max(0, total - before)
+
+
+class TimelineSyncWorker(threading.Thread):
+    """
+    Periodically runs TimelineSync.sync.
+
+    config_loader returns the current "timeline_sync" config section.
+    """
+
+    def __init__(self, timeline_sync, config_loader):
+        super().__init__(name="timeline-sync", daemon=True)
+        self.timeline_sync = timeline_sync
+        self.config_loader = config_loader
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            config = self.config_loader()
+            if config.get("enabled", False):
+                try:
+                    self.timeline_sync.sync(
+                        page_size=config.get("page_size", 100),
+                        backfill=config.get("backfill", True)
+                    )
+                except Exception as e:
+                    self.logger.error(f"Timeline sync error: {e}")
+            self._stop_event.wait(config.get("interval_minutes", 60) * 60)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,139 @@
+"""
+Tweet Bank for Krokmou Bot
+Persistent stock of pre-generated regular tweets, refilled in the background between slots.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+try:
+    from . import clock
+    from .similarity import ratio, DEFAULT_THRESHOLD
+except ImportError:
+    import clock
+    from similarity import ratio, DEFAULT_THRESHOLD
+
+TWEET_BANK_FILE = 'tweet_bank.json'
+
+
+class TweetBank:
+    """
+    FIFO of validated tweets persisted to disk.
+
+    Entries are re-checked against the tweet history when popped, since
+    history may have grown since they were generated. Each entry keeps
+    the prompt context (time of day, season, special day) it was written
+    with, so pop() can drop a tweet that no longer fits the slot.
+    """
+
+    def __init__(self, tweet_history, path=TWEET_BANK_FILE, max_age_hours=48):
+        self.tweet_history = tweet_history
+        self.path = path
+        self.max_age = timedelta(hours=max_age_hours)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("tweets", [])
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"tweets": self._entries}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _prune(self):
+        cutoff = clock.now() - self.max_age
+        kept = [e for e in self._entries if datetime.fromisoformat(e["created"]) > cutoff]
+        if len(kept) != len(self._entries):
+            self.logger.info(f"Dropped {len(self._entries) - len(kept)} expired banked tweets")
+            self._entries = kept
+            self._save()
+
+    def __len__(self):
+        with self._lock:
+            self._prune()
+            return len(self._entries)
+
+    def add(self, text, context=None):
+        """Bank a tweet unless it duplicates one already banked"""
+        with self._lock:
+            for entry in self._entries:
+                if ratio(text, entry["text"]) > DEFAULT_THRESHOLD:
+                    self.logger.debug("Banked tweet too similar to another banked tweet, skipping")
+                    return False
+            self._entries.append({"text": text, "created": clock.now().isoformat(), "context": context or {}})
+            self._save()
+            return True
+
+    def pop(self, fits=None):
+        """
+        Take the oldest banked tweet that is still fresh and unique.
+
+        fits(context) says whether an entry's generation context suits the
+        current slot; entries that do not are discarded.
+        """
+        with self._lock:
+            self._prune()
+            while self._entries:
+                entry = self._entries.pop(0)
+                if fits is not None and not fits(entry.get("context", {})):
+                    self.logger.info("Banked tweet written for another time of day or day, discarding")
+                    continue
+                if self.tweet_history.is_similar(entry["text"]):
+                    self.logger.info("Banked tweet now too similar to history, discarding")
+                    continue
+                self._save()
+                return entry["text"]
+            self._save()
+            return None
+
+
+class TweetBankWorker(threading.Thread):
+    """Background thread keeping the bank topped up during idle time"""
+
+    def __init__(self, bank, ai_client, size=4, interval_minutes=30, candidates=1, stream=False, history_tokens=300):
+        super().__init__(name="tweet-bank", daemon=True)
+        self.bank = bank
+        self.ai = ai_client
+        self.size = size
+        self.interval = interval_minutes * 60
+        self.candidates = candidates
+        self.stream = stream
+        self.history_tokens = history_tokens
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+    def refill(self):
+        attempts = 0
+        while len(self.bank) < self.size and attempts < self.size * 2 and not self._stop_event.is_set():
+            attempts += 1
+            context = self.ai.draw_context()
+            tweet = self.ai.generate_tweet(
+                candidates=self.candidates, stream=self.stream, history_tokens=self.history_tokens,
+                context=context
+            )
+            if not tweet:
+                self.logger.warning("Bank refill generation failed, will retry later")
+                return
+            self.bank.add(tweet, context)
+        self.logger.info(f"Tweet bank holds {len(self.bank)}/{self.size}")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refill()
+            except Exception as e:
+                self.logger.error(f"Tweet bank worker error: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,222 @@
+"""
+Tweet History Store for Krokmou Bot
+Process-wide, in-memory view of tweet_history.txt that follows appends incrementally.
+"""
+
+import os
+import html
+import shutil
+import logging
+import threading
+
+try:
+    from .metrics import get_metrics
+    from .similarity import SimilarityIndex, DEFAULT_THRESHOLD
+except ImportError:
+    from metrics import get_metrics
+    from similarity import SimilarityIndex, DEFAULT_THRESHOLD
+
+HISTORY_FILE = 'tweet_history.txt'
+
+
+def normalize(text):
+    """One-line form stored in the history file (entities unescaped, whitespace collapsed)"""
+    return " ".join(html.unescape(text).split())
+
+
+class TweetHistory:
+    """
+    In-memory tweet history backed by an append-only text file.
+
+    The file is read once; later accesses only read the bytes appended
+    since the last known offset. This store is the only writer, and it
+    owns the similarity index so every client shares it.
+    """
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._tweets = []
+        self._known = set()
+        self._index = SimilarityIndex()
+        self._offset = 0
+        self._partial = b''
+        self._file_id = None
+
+    # =========================================================================
+    # FILE FOLLOWING
+    # =========================================================================
+
+    def _add(self, texts):
+        self._tweets.extend(texts)
+        self._known.update(texts)
+        self._index.add_many(texts)
+
+    def _refresh(self):
+        """Pick up bytes appended since the last read (caller holds the lock)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self._reset()
+            return
+
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            if self._file_id is not None:
+                self.logger.info("Tweet history file replaced, reloading")
+            self._reset()
+            self._file_id = file_id
+
+        if stat.st_size == self._offset:
+            return
+
+        with get_metrics().timer("history_load"):
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+            self._offset += len(data)
+
+            lines = (self._partial + data).split(b'\n')
+            self._partial = lines.pop()
+            texts = [raw.decode('utf-8', errors='replace').strip() for raw in lines]
+            self._add([text for text in texts if text])
+
+    # =========================================================================
+    # READ ACCESS
+    # =========================================================================
+
+    def tweets(self):
+        """All tweets, oldest first"""
+        with self._lock:
+            self._refresh()
+            return list(self._tweets)
+
+    def recent(self, count):
+        """The most recent tweets, oldest first"""
+        with self._lock:
+            self._refresh()
+            return self._tweets[-count:] if count > 0 else []
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._tweets)
+
+    def __contains__(self, text):
+        with self._lock:
+            self._refresh()
+            return normalize(text) in self._known
+
+    def is_similar(self, text, threshold=DEFAULT_THRESHOLD):
+        """Check if a text is too similar to any tweet in history"""
+        with self._lock:
+            self._refresh()
+            index = self._index
+        with get_metrics().timer("similarity_check"):
+            return index.is_similar(text, threshold)
+
+    def max_similarity(self, text):
+        """Highest similarity ratio between a text and the history"""
+        with self._lock:
+            self._refresh()
+            index = self._index
+        with get_metrics().timer("similarity_check"):
+            return index.max_similarity(text)
+
+    # =========================================================================
+    # WRITE ACCESS
+    # =========================================================================
+
+    def append(self, text):
+        """Append a tweet to the history file and the in-memory view"""
+        self.extend([text], skip_known=False)
+
+    def extend(self, texts, skip_known=True):
+        """
+        Append tweets (oldest first) in one write; returns how many were added.
+
+        With skip_known, tweets already in history are left out, so
+        re-reading a timeline that includes our own posts is harmless.
+        """
+        with self._lock:
+            self._refresh()
+            added = []
+            seen = set()
+            for text in texts:
+                text = normalize(text)
+                if not text or (skip_known and (text in self._known or text in seen)):
+                    continue
+                seen.add(text)
+                added.append(text)
+            if not added:
+                return 0
+
+            prefix = b'\n' if self._partial else b''
+            data = prefix + "".join(f"{text}\n" for text in added).encode('utf-8')
+            with open(self.path, 'ab') as f:
+                f.write(data)
+
+            if self._file_id is None:
+                stat = os.stat(self.path)
+                self._file_id = (stat.st_dev, stat.st_ino)
+            self._offset += len(data)
+
+            pending = self._partial.decode('utf-8', errors='replace').strip()
+            self._partial = b''
+            self._add(([pending] if pending else []) + added)
+            return len(added)
+
+    def rewrite(self, texts):
+        """
+        Replace the whole history with texts (oldest first).
+
+        texts may be a generator; it is consumed while the history lock is
+        held, so no append can slip in between reading and replacing. The
+        new content is staged in a temporary file, then copied over the
+        history file in place (truncate, write, fsync) rather than renamed
+        onto it, so a bind-mounted tweet_history.txt keeps working. The
+        staged copy is only removed once the history file is synced.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            count = 0
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for text in texts:
+                    text = normalize(text)
+                    if text:
+                        f.write(f"{text}\n")
+                        count += 1
+
+            mode = 'r+b' if os.path.exists(self.path) else 'wb'
+            with open(tmp_path, 'rb') as source, open(self.path, mode) as target:
+                target.seek(0)
+                target.truncate()
+                shutil.copyfileobj(source, target)
+                target.flush()
+                os.fsync(target.fileno())
+            os.remove(tmp_path)
+
+            # Same inode, so force a full reload instead of following the offset
+            self._reset()
+            self._refresh()
+            return count
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_history(path=HISTORY_FILE):
+    """Process-wide history store for a file"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = TweetHistory(path)
+            _stores[key] = store
+        return store
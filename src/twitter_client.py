@@ -1,20 +1,45 @@
 import os
+import html
 import tweepy
 import logging
-from dotenv import load_dotenv
+import requests
 
-load_dotenv()
+try:
+    from .environment import load_env
+    from .http_session import get_session
+    from .metrics import get_metrics
+    from .outbox import PostError
+    from .resilience import RetryState, retry_after_seconds
+    from .tweet_history import get_history
+except ImportError:
+    from environment import load_env
+    from http_session import get_session
+    from metrics import get_metrics
+    from outbox import PostError
+    from resilience import RetryState, retry_after_seconds
+    from tweet_history import get_history
 
 class TwitterClient:
-    def __init__(self):
-        self.api_key = os.getenv('TWITTER_API_KEY')
-        self.api_secret = os.getenv('TWITTER_API_SECRET')
-        self.access_token = os.getenv('TWITTER_ACCESS_TOKEN')
-        self.access_token_secret = os.getenv('TWITTER_ACCESS_TOKEN_SECRET')
-        self.client = self._setup_client()
-        self.user_id = os.getenv('TWITTER_USER_ID')
+    def __init__(self, env_prefix='TWITTER_', tweet_history=None, handle='KrokmouVoid'):
+        load_env()
+        # Credentials come from {env_prefix}API_KEY, {env_prefix}API_SECRET, ...
+        self.api_key = os.getenv(f'{env_prefix}API_KEY')
+        self.api_secret = os.getenv(f'{env_prefix}API_SECRET')
+        self.access_token = os.getenv(f'{env_prefix}ACCESS_TOKEN')
+        self.access_token_secret = os.getenv(f'{env_prefix}ACCESS_TOKEN_SECRET')
+        self._client = None
+        self.user_id = os.getenv(f'{env_prefix}USER_ID')
+        self.handle = handle
+        self.tweet_history = tweet_history if tweet_history is not None else get_history()
         self.logger = logging.getLogger(__name__)
     
+    @property
+    def client(self):
+        """tweepy Client, built on first use"""
+        if self._client is None:
+            self._client = self._setup_client()
+        return self._client
+    
     def _setup_client(self):
         client = tweepy.Client(
             consumer_key=self.api_key,
@@ -22,6 +47,7 @@ class TwitterClient:
             access_token=self.access_token,
             access_token_secret=self.access_token_secret
         )
+        client.session = get_session()
         return client
     
     def get_recent_tweets(self, limit=30):
@@ -33,22 +59,89 @@ class TwitterClient:
             )
             return [tweet.text for tweet in tweets.data] if tweets.data else []
         except Exception as e:
-            print(f"Error fetching tweets: {e}")
+            self.logger.error(f"Error fetching tweets: {e}")
             return []
     
-    def post_tweet(self, text):
+    def timeline_pages(self, since_id=None, page_size=100):
+        """
+        Our own tweets newer than since_id, one page at a time, newest first.
+        
+        Yields (tweets, newest_id) per page, where tweets are (id, text)
+        pairs. Retweets are left out; API errors propagate.
+        """
+        if not self.user_id:
+            self.user_id = str(self.client.get_me().data.id)
+        token = None
+        while True:
+            response = self.client.get_users_tweets(
+                id=self.user_id,
+                since_id=since_id,
+                pagination_token=token,
+                max_results=page_size,
+                exclude=['retweets']
+            )
+            meta = response.meta or {}
+            yield [(str(t.id), t.text) for t in response.data or []], meta.get('newest_id')
+            token = meta.get('next_token')
+            if not token:
+                return
+    
+    def tweet_url(self, tweet_id):
+        return f"https://twitter.com/{self.handle}/status/{tweet_id}"
+    
+    def create(self, text):
+        """Post text once and return the new tweet's ID, raising PostError on failure"""
         try:
-            response = self.client.create_tweet(text=text)
-            tweet_id = response.data['id']
-            tweet_url = f"https://twitter.com/KrokmouVoid/status/{tweet_id}"
-            print(f"Tweet URL: {tweet_url}")
-            # Save to history file
-            self._save_tweet_to_history(text)
-            return tweet_url
-        except Exception as e:
-            print(f"Error posting tweet: {e}")
-            return False
+            with get_metrics().timer("twitter_post"):
+                response = self.client.create_tweet(text=text)
+            return str(response.data['id'])
+        except tweepy.TooManyRequests as e:
+            raise PostError(f"rate limited: {e}", retry_after=retry_after_seconds(e.response.headers)) from e
+        except tweepy.TwitterServerError as e:
+            raise PostError(str(e)) from e
+        except tweepy.HTTPException as e:
+            raise PostError(str(e), retryable=False, duplicate="duplicate" in str(e).lower()) from e
+        except (tweepy.TweepyException, requests.exceptions.RequestException) as e:
+            raise PostError(str(e)) from e
+        except (KeyError, TypeError) as e:
+            raise PostError(f"unexpected response: {e}", retryable=False) from e
+    
+    def find_recent(self, text, limit=20):
+        """
+        ID of one of our recent tweets with this text, or None.
+        
+        Raises PostError when the timeline cannot be read, so callers can
+        tell "not posted" from "unknown".
+        """
+        wanted = " ".join(text.split())
+        try:
+            if not self.user_id:
+                self.user_id = str(self.client.get_me().data.id)
+            tweets = self.client.get_users_tweets(id=self.user_id, max_results=max(5, min(limit, 100)))
+        except (tweepy.TweepyException, requests.exceptions.RequestException) as e:
+            raise PostError(f"timeline lookup failed: {e}") from e
+        for tweet in tweets.data or []:
+            if " ".join(html.unescape(tweet.text).split()) == wanted:
+                return str(tweet.id)
+        return None
+    
+    def post_tweet(self, text):
+        """Post with inline retries and record the tweet in history (no outbox)"""
+        with RetryState("twitter") as retry:
+            while retry.allow():
+                try:
+                    tweet_id = self.create(text)
+                    retry.success()
+                    tweet_url = self.tweet_url(tweet_id)
+                    self.logger.info(f"Tweet URL: {tweet_url}")
+                    # Save to history file
+                    self._save_tweet_to_history(text)
+                    return tweet_url
+                except PostError as e:
+                    self.logger.error(f"Error posting tweet: {e}")
+                    if not e.retryable or not retry.failure(e.__cause__):
+                        break
+        return False
     
     def _save_tweet_to_history(self, text):
-        with open('tweet_history.txt', 'a', encoding='utf-8') as f:
-            f.write(f"{text}\n")
\ No newline at end of file
+        self.tweet_history.append(text)
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Test script for Krokmou Bot - Config Service
+Checks schema validation, snapshots and the last-good fallback offline.
+"""
+
+import os
+import json
+import itertools
+import pathlib
+import tempfile
+
+from src.config_service import Config, ConfigService, validate, thaw
+
+VALID = {
+    "schedule": {"slots": ["22:00", "06:00"], "timezone": "Europe/Paris"},
+    "news_awareness": {
+        "enabled": True,
+        "probability": 0.2,
+        "min_score": 12,
+        "keywords": {"election": {"aliases": ["élection"], "points": 10}}
+    },
+    "accounts": [{"name": "krokmou"}, {"name": "toothless", "schedule": {"slots": ["12:00"]}}],
+    "custom_section": {"anything": "goes"}
+}
+
+
+_mtimes = itertools.count(1_700_000_000)
+
+
+def _write(path, data):
+    """Write config JSON with a new mtime, so edits within one clock tick are still seen"""
+    path.write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+    stamp = next(_mtimes)
+    os.utime(path, (stamp, stamp))
+
+
+def test_validate_accepts_valid_config():
+    assert validate(VALID) == []
+    assert validate({}) == []
+
+
+def test_validate_reports_every_problem():
+    problems = validate({
+        "schedule": {"slots": ["25:00", 6]},
+        "news_awareness": {"probability": 1.5, "max_per_week": True, "keywords": {"x": {"points": "ten"}}},
+        "logging": {"file": None},
+        "accounts": [{"handle": "NoName"}, "not an object"],
+    })
+    assert problems == [
+        "schedule.slots[1]: expected str, got int",
+        "news_awareness.max_per_week: expected int, got bool",
+        "news_awareness.keywords.x.points: expected int or float, got str",
+        "accounts[1]: expected an object",
+        "accounts[0]: name is required",
+        "schedule.slots: invalid slot '25:00'",
+        "news_awareness.probability: must be between 0 and 1",
+    ]
+    assert validate([]) == [": expected an object"]
+
+
+def test_snapshot_is_compiled_and_read_only():
+    config = Config(VALID)
+    assert config.slots == ((22, 0), (6, 0)), "config order; the scheduler sorts them"
+    assert config.news.min_score == 12
+    assert config.news.matcher.match("L'ELECTION") == {"election"}
+    for change in (lambda: config.__setitem__("x", 1), lambda: config["schedule"].update(slots=[]),
+                   lambda: setattr(config.news, "min_score", 0)):
+        try:
+            change()
+        except (TypeError, AttributeError):
+            continue
+        raise AssertionError("snapshot changed")
+    assert config["accounts"][1]["schedule"]["slots"] == ("12:00",)
+    assert thaw(config) == VALID
+
+    derived = config.derive("toothless", lambda: {**thaw(config), "schedule": {"slots": ["12:00"]}})
+    assert derived.slots == ((12, 0),)
+    assert config.derive("toothless", lambda: {}) is derived, "built once per key"
+    assert Config({}).slots == ((6, 0), (12, 0), (16, 0), (22, 0))
+
+
+def test_missing_file_uses_defaults(tmp_path):
+    service = ConfigService(str(tmp_path / "config.json"), check_interval=0)
+    config = service.get()
+    assert config.get("news_awareness", {}).get("enabled")
+    assert service.get() is config, "no reload while the file stays missing"
+
+
+def test_bad_edit_keeps_last_good_config(tmp_path):
+    path = tmp_path / "config.json"
+    _write(path, VALID)
+    service = ConfigService(str(path), check_interval=0)
+    changes = []
+    service.on_change(lambda old, new: changes.append((old, new)))
+    good = service.get()
+    assert good.news.min_score == 12
+    assert service.get() is good, "unchanged file is not parsed again"
+
+    _write(path, '{"schedule": {"slots": ["06:00",')
+    assert service.get() is good, "unparseable edit"
+    _write(path, {**VALID, "schedule": {"slots": ["6 o'clock"]}})
+    assert service.get() is good, "invalid edit"
+    path.unlink()
+    assert service.get() is good, "deleted file"
+    assert changes == []
+
+    _write(path, {**VALID, "news_awareness": {"min_score": 3}})
+    fixed = service.get()
+    assert fixed.news.min_score == 3
+    assert changes == [(good, fixed)]
+    assert good.news.min_score == 12, "a snapshot in use never changes"
+
+
+def test_bad_config_at_startup_uses_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    _write(path, {"news_awareness": {"probability": "often"}})
+    config = ConfigService(str(path), check_interval=0).get()
+    assert config.news.probability == 0.15
+
+
+if __name__ == "__main__":
+    for test in (test_validate_accepts_valid_config, test_validate_reports_every_problem,
+                 test_snapshot_is_compiled_and_read_only):
+        test()
+        print(f"{test.__name__}: ok")
+    for test in (test_missing_file_uses_defaults, test_bad_edit_keeps_last_good_config,
+                 test_bad_config_at_startup_uses_defaults):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,97 @@
+"""
+Test script for Krokmou Bot - Tweet History
+Checks offset following, rewrites and the similarity index offline.
+"""
+
+import os
+import pathlib
+import tempfile
+
+from src.tweet_history import TweetHistory
+from src.similarity import SimilarityIndex
+
+
+def test_follows_appends_from_offset(tmp_path):
+    """Bytes appended by another writer are picked up without re-reading the file"""
+    path = tmp_path / "history.txt"
+    path.write_text("first tweet\nsecond tweet\n", encoding="utf-8")
+    history = TweetHistory(str(path))
+    assert history.tweets() == ["first tweet", "second tweet"]
+    offset = history._offset
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("third tweet\n")
+    assert history.tweets() == ["first tweet", "second tweet", "third tweet"]
+    assert history._offset == offset + len(b"third tweet\n")
+    assert "third tweet" in history
+
+
+def test_partial_line_waits_for_newline(tmp_path):
+    path = tmp_path / "history.txt"
+    path.write_text("done\nhalf", encoding="utf-8")
+    history = TweetHistory(str(path))
+    assert history.tweets() == ["done"], "an unterminated line is not a tweet yet"
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(" written\n")
+    assert history.tweets() == ["done", "half written"]
+
+
+def test_append_completes_partial_line(tmp_path):
+    path = tmp_path / "history.txt"
+    path.write_text("done\nleft over", encoding="utf-8")
+    history = TweetHistory(str(path))
+
+    assert history.extend(["new &amp; tidy\n tweet", "done"]) == 1, "known tweets are skipped"
+    assert history.tweets() == ["done", "left over", "new & tidy tweet"]
+    assert path.read_text(encoding="utf-8") == "done\nleft over\nnew & tidy tweet\n"
+
+
+def test_rewrite_replaces_in_place(tmp_path):
+    path = tmp_path / "history.txt"
+    path.write_text("old one\nold two\nold three\n", encoding="utf-8")
+    history = TweetHistory(str(path))
+    assert len(history) == 3
+    inode = os.stat(path).st_ino
+
+    assert history.rewrite(t for t in ["kept", "", "also kept"]) == 2
+    assert history.tweets() == ["kept", "also kept"]
+    assert os.stat(path).st_ino == inode, "rewritten in place for bind mounts"
+    assert not os.path.exists(f"{path}.tmp")
+    assert "old one" not in history
+
+
+def test_truncated_file_reloads(tmp_path):
+    """A file shorter than the known offset was replaced behind our back"""
+    path = tmp_path / "history.txt"
+    path.write_text("a fairly long first tweet\nanother one\n", encoding="utf-8")
+    history = TweetHistory(str(path))
+    assert len(history) == 2
+
+    path.write_text("short\n", encoding="utf-8")
+    assert history.tweets() == ["short"]
+
+    path.unlink()
+    assert history.tweets() == []
+
+
+def test_similarity_index_finds_near_duplicates():
+    index = SimilarityIndex([
+        "The moon is a cold lamp and I am its only guardian tonight",
+        "Tuna arrives at seven and not one minute later, humans",
+    ])
+    assert index.is_similar("The moon is a cold lamp and I am its sole guardian tonight")
+    assert not index.is_similar("Dragons nap in cardboard boxes when nobody is looking")
+    assert index.max_similarity("Tuna arrives at seven and not one minute later, humans") == 1.0
+    assert SimilarityIndex().max_similarity("anything") == 0.0
+
+
+if __name__ == "__main__":
+    for test in (test_follows_appends_from_offset, test_partial_line_waits_for_newline,
+                 test_append_completes_partial_line, test_rewrite_replaces_in_place,
+                 test_truncated_file_reloads):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+        print(f"{test.__name__}: ok")
+    test_similarity_index_finds_near_duplicates()
+    print("test_similarity_index_finds_near_duplicates: ok")
@@ -0,0 +1,55 @@
+"""
+Test script for Krokmou Bot - Keyword Matcher
+Checks accent folding, word boundaries and scoring offline.
+"""
+
+from src.keyword_matcher import KeywordMatcher, fold, get_matcher
+
+KEYWORDS = {
+    "election": {"aliases": ["élection", "election", "vote"], "points": 10},
+    "usa": {"aliases": ["US", "United States"], "points": 5},
+    "ai": {"aliases": ["AI", "intelligence artificielle"], "points": 8},
+}
+
+
+def test_fold():
+    assert fold("Élection Présidentielle") == "election presidentielle"
+    assert fold("STRASSE") == fold("straße"), "casefold, not just lower"
+
+
+def test_accent_folding():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.match("Les ÉLECTIONS? Non, l'élection de demain") == {"election"}
+    assert matcher.match("Election night") == {"election"}
+    assert matcher.match("L'Intelligence Artificielle arrive") == {"ai"}
+
+
+def test_word_boundaries():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.match("Because she said so, voters stayed home") == set()
+    assert matcher.match("Elections everywhere") == set(), "a longer word is not the keyword"
+    assert matcher.match("US-made AI, in the United States!") == {"usa", "ai"}
+    assert matcher.match("(AI)") == {"ai"}
+
+
+def test_score_and_empty_config():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.score(matcher.match("AI vote in the US")) == 23
+    assert matcher.score({"unknown"}) == 0
+
+    empty = KeywordMatcher({})
+    assert not empty
+    assert empty.match("anything at all") == set()
+    assert KeywordMatcher({"solo": None}).match("a solo act") == {"solo"}, "the name is its own alias"
+
+
+def test_get_matcher_is_cached_per_config():
+    assert get_matcher(KEYWORDS) is get_matcher(dict(reversed(list(KEYWORDS.items()))))
+    assert get_matcher(KEYWORDS) is not get_matcher({})
+
+
+if __name__ == "__main__":
+    for test in (test_fold, test_accent_folding, test_word_boundaries, test_score_and_empty_config,
+                 test_get_matcher_is_cached_per_config):
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,99 @@
+"""
+Test script for Krokmou Bot - News Store
+Checks the news_history.json migration and the time-window queries offline.
+"""
+
+import json
+import pathlib
+import tempfile
+from datetime import datetime, timedelta
+
+from src.news_store import NewsStore
+
+NOW = datetime(2024, 3, 10, 12, 0)
+
+
+def test_json_history_migrated_once(tmp_path):
+    json_path = tmp_path / "news_history.json"
+    json_path.write_text(json.dumps({
+        "covered_topics": [
+            {"headline": "Storm hits the coast", "keywords": ["Storm", "coast"],
+             "timestamp": (NOW - timedelta(hours=5)).isoformat()},
+            {"headline": "Broken entry"},
+        ],
+        "last_news_tweet": (NOW - timedelta(hours=5)).isoformat()
+    }), encoding="utf-8")
+
+    store = NewsStore(str(tmp_path / "news.db"), str(json_path))
+    assert not json_path.exists()
+    assert (tmp_path / "news_history.json.migrated").exists()
+    assert store.get_last_time() == NOW - timedelta(hours=5)
+    exported = store.export()["covered_topics"]
+    assert [t["headline"] for t in exported] == ["Storm hits the coast"], "entries without a timestamp are skipped"
+    assert sorted(exported[0]["keywords"]) == ["coast", "storm"]
+    store.close()
+
+    # A stray JSON file reappearing after the migration is not imported again
+    json_path.write_text(json.dumps({"covered_topics": [
+        {"headline": "Late duplicate", "keywords": [], "timestamp": NOW.isoformat()}
+    ]}), encoding="utf-8")
+    store = NewsStore(str(tmp_path / "news.db"), str(json_path))
+    assert store.count_since(NOW - timedelta(days=1)) == 1
+    store.close()
+
+
+def test_unreadable_json_left_in_place(tmp_path):
+    json_path = tmp_path / "news_history.json"
+    json_path.write_text("{not json", encoding="utf-8")
+    store = NewsStore(str(tmp_path / "news.db"), str(json_path))
+    assert json_path.exists()
+    assert store.count_since(NOW - timedelta(days=30)) == 0
+    store.close()
+
+
+def test_coverage_window(tmp_path):
+    store = NewsStore(str(tmp_path / "news.db"), None)
+    store.mark_covered("Election results announced tonight", ["election", "results"], now=NOW - timedelta(hours=80))
+    store.mark_covered("Rocket launch delayed", ["rocket", "launch"], now=NOW - timedelta(hours=2))
+
+    assert store.count_since(NOW - timedelta(hours=24)) == 1
+    assert store.count_since(NOW - timedelta(days=5)) == 2
+    assert store.is_covered("Launch of the rocket pushed back", ["Rocket", "launch"], now=NOW)
+    assert store.is_covered("Rocket launch delayed again", [], now=NOW), "similar headline"
+    assert not store.is_covered("Election results announced tonight", ["election", "results"], now=NOW), \
+        "outside the 72 hour coverage window"
+
+    # Marking prunes topics past the 7 day retention window
+    store.mark_covered("Much later", [], now=NOW + timedelta(days=7, hours=-3))
+    assert store.count_since(NOW - timedelta(days=30)) == 2
+    assert store.get_last_time() == NOW + timedelta(days=7, hours=-3)
+    store.close()
+
+
+def test_ranked_articles(tmp_path):
+    store = NewsStore(str(tmp_path / "news.db"), None)
+    steady = {"title": "Steady story", "keywords": ["a"], "score": 10}
+    store.upsert_articles([steady, {"title": "Big story", "score": 14}, {"title": "Noise", "score": 2}],
+                          now=NOW - timedelta(hours=3))
+    store.upsert_articles([steady], now=NOW - timedelta(hours=2))
+    store.upsert_articles([steady], now=NOW - timedelta(hours=1))
+
+    ranked = store.ranked_articles(NOW - timedelta(hours=6), min_score=5, persistence_points=3, max_bonus=5)
+    assert [a["title"] for a in ranked] == ["Steady story", "Big story"]
+    assert ranked[0]["rank"] == 15, "two extra sightings, bonus capped at 5"
+    assert ranked[0]["keywords"] == ["a"]
+    assert [a["title"] for a in store.ranked_articles(NOW - timedelta(minutes=90))] == ["Steady story"]
+    assert store.get_last_ingest() == NOW - timedelta(hours=1)
+
+    # Articles not seen for 48 hours are dropped on the next ingest
+    store.upsert_articles([], now=NOW + timedelta(hours=48))
+    assert store.ranked_articles(NOW - timedelta(days=30)) == []
+    store.close()
+
+
+if __name__ == "__main__":
+    for test in (test_json_history_migrated_once, test_unreadable_json_left_in_place,
+                 test_coverage_window, test_ranked_articles):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,191 @@
+"""
+Test script for Krokmou Bot - Posting Outbox
+Checks retries, expiry and restart recovery against a fake Twitter client offline.
+"""
+
+import pathlib
+import tempfile
+from datetime import datetime, timedelta
+
+from src.outbox import Outbox, OutboxSender, PostError, DONE, FAILED, PENDING, POSTED
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+
+class FakeTwitter:
+    """Scripted create() outcomes and a timeline for find_recent()"""
+
+    def __init__(self, outcomes=(), timeline=None):
+        self.outcomes = list(outcomes)
+        self.timeline = dict(timeline or {})
+        self.created = []
+
+    def create(self, text):
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        tweet_id = f"id{len(self.created) + 1}"
+        self.created.append(text)
+        self.timeline[text] = tweet_id
+        return tweet_id
+
+    def find_recent(self, text):
+        if isinstance(self.timeline, Exception):
+            raise self.timeline
+        return self.timeline.get(text)
+
+    def tweet_url(self, tweet_id):
+        return f"https://x.com/i/status/{tweet_id}"
+
+
+def _sender(tmp_path, twitter, name):
+    recorded = []
+    sender = OutboxSender(Outbox(str(tmp_path / "outbox.db")), lambda: twitter, recorded.append,
+                          breaker_name=f"test-outbox-{name}")
+    return sender, recorded
+
+
+def _state(sender, entry_id):
+    with sender.outbox._lock:
+        row = sender.outbox._conn.execute("SELECT state, attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+    return tuple(row)
+
+
+def test_posts_and_records(tmp_path):
+    twitter = FakeTwitter()
+    sender, recorded = _sender(tmp_path, twitter, "posts")
+    entry_id = sender.outbox.enqueue("hello void", "ai", now=NOW)
+
+    posted = sender.drain(now=NOW)
+    assert [entry["text"] for entry in posted] == ["hello void"]
+    assert recorded[0]["tweet_id"] == "id1"
+    assert _state(sender, entry_id) == (DONE, 1)
+    assert sender.outbox.pending_count() == 0
+
+
+def test_rate_limit_defers_whole_queue(tmp_path):
+    twitter = FakeTwitter([PostError("429", retry_after=900)])
+    sender, recorded = _sender(tmp_path, twitter, "retry")
+    first = sender.outbox.enqueue("first", "ai", now=NOW)
+    second = sender.outbox.enqueue("second", "ai", now=NOW)
+
+    assert sender.drain(now=NOW) == []
+    assert _state(sender, first) == (PENDING, 1)
+    assert _state(sender, second) == (PENDING, 0), "entries behind a rate limit wait too"
+    assert sender.outbox.next_attempt() == NOW, "second is still due, first waits"
+    assert [entry["id"] for entry in sender.outbox.due(NOW + timedelta(seconds=899))] == [second]
+
+    later = NOW + timedelta(seconds=900)
+    assert [entry["text"] for entry in sender.drain(now=later)] == ["first", "second"]
+    assert twitter.created == ["first", "second"]
+    assert len(recorded) == 2
+
+
+def test_rejected_and_exhausted_entries_fail(tmp_path):
+    twitter = FakeTwitter([PostError("403 forbidden", retryable=False), PostError("503"), PostError("503")])
+    sender, recorded = _sender(tmp_path, twitter, "fail")
+    rejected = sender.outbox.enqueue("rejected", "ai", now=NOW)
+    flaky = sender.outbox.enqueue("flaky", "ai", now=NOW)
+
+    sender.drain(max_attempts=2, now=NOW)
+    assert _state(sender, rejected) == (FAILED, 1), "resending cannot fix a rejection"
+    assert _state(sender, flaky) == (PENDING, 1)
+
+    sender.drain(max_attempts=2, now=NOW + timedelta(hours=1))
+    assert _state(sender, flaky) == (FAILED, 2)
+    assert recorded == []
+
+
+def test_duplicate_error_confirms_earlier_post(tmp_path):
+    twitter = FakeTwitter([PostError("187 duplicate", retryable=False, duplicate=True)],
+                          timeline={"already out": "id42"})
+    sender, recorded = _sender(tmp_path, twitter, "duplicate")
+    entry_id = sender.outbox.enqueue("already out", "bank", now=NOW)
+
+    assert [entry["tweet_id"] for entry in sender.drain(now=NOW)] == ["id42"]
+    assert _state(sender, entry_id) == (DONE, 1)
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    twitter = FakeTwitter()
+    sender, recorded = _sender(tmp_path, twitter, "expiry")
+    stale = sender.outbox.enqueue("stale", "ai", now=NOW - timedelta(hours=7))
+    fresh = sender.outbox.enqueue("fresh", "ai", now=NOW - timedelta(hours=1))
+
+    assert [entry["text"] for entry in sender.drain(max_age_hours=6, now=NOW)] == ["fresh"]
+    assert _state(sender, stale) == (FAILED, 0)
+    assert twitter.created == ["fresh"]
+
+    # Delivered and abandoned entries are pruned after the retention window
+    sender.drain(now=NOW + timedelta(days=8))
+    assert sender.outbox.due(NOW + timedelta(days=8)) == []
+    with sender.outbox._lock:
+        assert sender.outbox._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 0
+
+
+def test_recovery_after_interrupted_posts(tmp_path):
+    """Entries a previous run left mid-flight are checked against the timeline, never blindly resent"""
+    twitter = FakeTwitter(timeline={"went out": "id7"})
+    sender, recorded = _sender(tmp_path, twitter, "recover")
+    outbox = sender.outbox
+    went_out = outbox.enqueue("went out", "ai", now=NOW)
+    lost = outbox.enqueue("lost", "ai", now=NOW)
+    unrecorded = outbox.enqueue("unrecorded", "news", headline="Storm", keywords=["storm"], now=NOW)
+    outbox.mark_sending(went_out, now=NOW)
+    outbox.mark_sending(lost, now=NOW)
+    outbox.mark_sending(unrecorded, now=NOW)
+    outbox.mark_posted(unrecorded, "id3", now=NOW)
+
+    posted = sender.drain(now=NOW + timedelta(minutes=5))
+    assert sorted(entry["text"] for entry in posted) == ["lost", "unrecorded", "went out"]
+    assert twitter.created == ["lost"], "only the unconfirmed post is sent again"
+    assert next(entry for entry in recorded if entry["text"] == "unrecorded")["keywords"] == ["storm"]
+    assert all(_state(sender, entry_id)[0] == DONE for entry_id in (went_out, lost, unrecorded))
+
+
+def test_recovery_waits_for_timeline(tmp_path):
+    twitter = FakeTwitter()
+    twitter.timeline = PostError("timeline unavailable")
+    sender, recorded = _sender(tmp_path, twitter, "blocked")
+    interrupted = sender.outbox.enqueue("interrupted", "ai", now=NOW)
+    queued = sender.outbox.enqueue("queued", "ai", now=NOW)
+    sender.outbox.mark_sending(interrupted, now=NOW)
+
+    assert sender.drain(now=NOW + timedelta(minutes=5)) == []
+    assert twitter.created == [], "nothing is sent while a post cannot be confirmed"
+    assert _state(sender, queued) == (PENDING, 0)
+
+    # Past max_age_hours the unconfirmed entry is given up on and the queue moves again
+    sender.drain(max_age_hours=6, now=NOW + timedelta(hours=7))
+    assert _state(sender, interrupted)[0] == FAILED
+    assert _state(sender, queued)[0] == FAILED, "queued too long as well"
+
+
+def test_failed_recording_is_retried(tmp_path):
+    twitter = FakeTwitter()
+    calls = []
+
+    def flaky_record(entry):
+        calls.append(entry["text"])
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    sender = OutboxSender(Outbox(str(tmp_path / "outbox.db")), lambda: twitter, flaky_record,
+                          breaker_name="test-outbox-record")
+    entry_id = sender.outbox.enqueue("once", "ai", now=NOW)
+    assert sender.drain(now=NOW) == []
+    assert _state(sender, entry_id) == (POSTED, 1)
+
+    assert [entry["text"] for entry in sender.drain(now=NOW)] == ["once"]
+    assert twitter.created == ["once"], "recording is retried without posting again"
+    assert _state(sender, entry_id) == (DONE, 1)
+
+
+if __name__ == "__main__":
+    for test in (test_posts_and_records, test_rate_limit_defers_whole_queue, test_rejected_and_exhausted_entries_fail,
+                 test_duplicate_error_confirms_earlier_post, test_expired_entries_are_dropped,
+                 test_recovery_after_interrupted_posts, test_recovery_waits_for_timeline,
+                 test_failed_recording_is_retried):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+        print(f"{test.__name__}: ok")
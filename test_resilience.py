@@ -0,0 +1,158 @@
+"""
+Test script for Krokmou Bot - Circuit Breaker
+Checks the breaker state machine and RetryState bookkeeping offline.
+"""
+
+import time
+import pathlib
+import tempfile
+
+import requests
+
+from src.resilience import CircuitBreaker, RetryState, RetryPolicy, get_breaker
+from src.model_router import ModelRouter
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+def _tripped(name, cooldown=0.0):
+    """A breaker that has just opened; with cooldown 0 it is immediately half-open"""
+    breaker = get_breaker(name)
+    breaker.cooldown = cooldown
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_states():
+    """closed -> open -> half-open -> one trial -> closed or open again"""
+    breaker = CircuitBreaker("test-states", failure_threshold=2, cooldown=0.05)
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow(), "only one trial at a time"
+
+    breaker.record_failure()
+    assert breaker.state == "open", "a failed trial re-opens the circuit"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_release_ends_trial():
+    breaker = CircuitBreaker("test-release", failure_threshold=1, cooldown=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow(), "a released trial lets the next caller try"
+
+
+def test_retry_state_releases_unrecorded_trial():
+    """An attempt that ends without success() or failure() must not wedge a half-open breaker"""
+    breaker = _tripped("test-unrecorded")
+
+    with RetryState("test-unrecorded") as retry:
+        assert retry.allow()
+        # e.g. a malformed response: the caller logs it and leaves the loop
+    assert breaker.allow(), "trial released when the block exits"
+    breaker.release()
+
+    retry = RetryState("test-unrecorded")
+    assert retry.allow()
+    assert retry.allow(), "the next allow() settles the previous attempt"
+    retry.release()
+    assert breaker.allow()
+    breaker.release()
+
+
+def test_client_error_does_not_trip():
+    """A 4xx from bad input ends the call without counting against the service"""
+    breaker = get_breaker("test-client-error")
+    for _ in range(breaker.failure_threshold + 1):
+        with RetryState("test-client-error") as retry:
+            assert retry.allow()
+            assert retry.failure(_http_error(400)) is False
+    assert breaker.state == "closed"
+
+    breaker = _tripped("test-client-error-trial")
+    with RetryState("test-client-error-trial") as retry:
+        assert retry.allow()
+        retry.failure(_http_error(401))
+    assert breaker.state == "half-open" and breaker.allow()
+
+
+def test_server_error_trips():
+    policy = RetryPolicy(base_delay=0.0, max_delay=0.0, deadline=5.0)
+    breaker = get_breaker("test-server-error")
+    with RetryState("test-server-error", policy) as retry:
+        while retry.allow():
+            if not retry.failure(_http_error(503)):
+                break
+    assert breaker.state == "open"
+
+
+def test_failing_model_does_not_block_others(tmp_path):
+    """Breakers are per model, so the router moves on once the primary's circuit opens"""
+    router = ModelRouter(["test/primary", "test/backup"], stats_file=str(tmp_path / "stats.json"))
+    policy = RetryPolicy(base_delay=0.0, max_delay=0.0, deadline=5.0)
+    chosen = []
+    with RetryState("test-models", policy) as retry:
+        for _ in range(6):
+            model = router.choose(usable=retry.available)
+            if not retry.allow(model):
+                break
+            chosen.append(model)
+            if model == "test/primary":
+                retry.failure(_http_error(503))
+            else:
+                retry.success()
+    assert chosen[:3] == ["test/primary"] * 3
+    assert chosen[3:] == ["test/backup"] * 3
+    assert get_breaker("test-models:test/primary").state == "open"
+
+
+def test_router_stats_written_on_flush(tmp_path):
+    """Recording stays in memory; flush() writes the file once, and only when something changed"""
+    stats_file = tmp_path / "stats.json"
+    router = ModelRouter(["test/model"], stats_file=str(stats_file))
+    for _ in range(5):
+        router.record_request("test/model", latency=0.2)
+        router.record_candidate("test/model", "too_long")
+    assert not stats_file.exists()
+
+    router.flush()
+    saved = stats_file.stat().st_mtime_ns
+    assert ModelRouter(["test/model"], stats_file=str(stats_file)).stats()["test/model"]["requests"] == 5
+    router.flush()
+    assert stats_file.stat().st_mtime_ns == saved, "nothing new to write"
+
+    eager = ModelRouter(["test/model"], stats_file=str(tmp_path / "eager.json"), save_interval=0)
+    eager.record_request("test/model", latency=0.2)
+    assert (tmp_path / "eager.json").exists(), "written once the save interval has passed"
+
+
+if __name__ == "__main__":
+    for test in (test_breaker_states, test_release_ends_trial, test_retry_state_releases_unrecorded_trial,
+                 test_client_error_does_not_trip, test_server_error_trips):
+        test()
+        print(f"{test.__name__}: ok")
+    with tempfile.TemporaryDirectory() as tmp:
+        test_failing_model_does_not_block_others(pathlib.Path(tmp))
+        print("test_failing_model_does_not_block_others: ok")
+    with tempfile.TemporaryDirectory() as tmp:
+        test_router_stats_written_on_flush(pathlib.Path(tmp))
+        print("test_router_stats_written_on_flush: ok")
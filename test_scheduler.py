@@ -0,0 +1,137 @@
+"""
+Test script for Krokmou Bot - Slot Scheduler
+Checks slot times across DST changes and missed-slot catch-up on a virtual clock.
+"""
+
+import json
+import pathlib
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pytz
+
+from src import clock
+from src.clock import VirtualClock
+from src.scheduler import SlotScheduler, parse_slot
+
+PARIS = pytz.timezone("Europe/Paris")
+
+
+def _scheduler(slots, state_file="unused.json", job=None):
+    return SlotScheduler(slots, job or (lambda: None), timezone="Europe/Paris", grace_minutes=90,
+                         state_file=str(state_file))
+
+
+def test_parse_slot():
+    assert parse_slot("06:05") == (6, 5)
+    for bad in ("24:00", "12:60", "noon"):
+        try:
+            parse_slot(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad} accepted")
+
+
+def test_slots_keep_local_time_across_dst():
+    scheduler = _scheduler(["06:00", "22:00"])
+    winter = scheduler.slots_on(date(2024, 3, 30))
+    summer = scheduler.slots_on(date(2024, 3, 31))
+    assert [s.strftime("%H:%M %Z") for s in winter + summer] == ["06:00 CET", "22:00 CET", "06:00 CEST", "22:00 CEST"]
+    assert summer[0] - winter[0] == timedelta(hours=23), "the spring-forward day is an hour short"
+
+
+def test_slots_in_dst_gaps_and_overlaps():
+    scheduler = _scheduler(["02:30"])
+    # Clocks go forward at 02:00: the slot moves past the gap
+    (spring,) = scheduler.slots_on(date(2024, 3, 31))
+    assert spring.strftime("%H:%M %Z") == "03:30 CEST"
+    # Clocks go back at 03:00: the slot runs on the first 02:30 only
+    (autumn,) = scheduler.slots_on(date(2024, 10, 27))
+    assert autumn.strftime("%H:%M %Z") == "02:30 CEST"
+    assert scheduler.next_slot(autumn) == PARIS.localize(datetime(2024, 10, 28, 2, 30))
+
+
+def test_next_and_previous_slot():
+    scheduler = _scheduler(["12:00", "06:00"])
+    at = PARIS.localize(datetime(2024, 6, 1, 12, 0))
+    assert scheduler.next_slot(at) == PARIS.localize(datetime(2024, 6, 2, 6, 0)), "strictly after"
+    assert scheduler.previous_slot(at) == at, "at or before"
+    early = PARIS.localize(datetime(2024, 6, 1, 5, 0))
+    assert scheduler.previous_slot(early) == PARIS.localize(datetime(2024, 5, 31, 12, 0))
+    assert scheduler.next_slot(at.astimezone(pytz.utc)) == PARIS.localize(datetime(2024, 6, 2, 6, 0))
+
+
+def test_catch_up_within_grace(tmp_path):
+    state_file = tmp_path / "state.json"
+    runs = []
+    scheduler = _scheduler(["06:00", "12:00"], state_file, lambda: runs.append(clock.now()))
+    clock.set_clock(VirtualClock(datetime(2024, 6, 1, 7, 0)))
+    try:
+        assert not scheduler.catch_up(), "first start records now and runs nothing"
+        assert runs == []
+
+        clock.set_clock(VirtualClock(datetime(2024, 6, 1, 13, 0)))
+        assert scheduler.catch_up(), "12:00 was missed an hour ago"
+        assert len(runs) == 1
+        last = json.loads(state_file.read_text())["last_slot"]
+        assert datetime.fromisoformat(last) == PARIS.localize(datetime(2024, 6, 1, 12, 0))
+        assert not scheduler.catch_up(), "a slot is caught up once"
+        assert not (tmp_path / "state.json.tmp").exists()
+    finally:
+        clock.set_clock(None)
+
+
+def test_catch_up_skips_outside_grace(tmp_path):
+    state_file = tmp_path / "state.json"
+    state_file.write_text(json.dumps({"last_slot": PARIS.localize(datetime(2024, 6, 1, 6, 0)).isoformat()}))
+    runs = []
+    scheduler = _scheduler(["06:00", "12:00"], state_file, lambda: runs.append(1))
+    clock.set_clock(VirtualClock(datetime(2024, 6, 1, 14, 0)))
+    try:
+        assert not scheduler.catch_up()
+        assert runs == []
+        last = json.loads(state_file.read_text())["last_slot"]
+        assert datetime.fromisoformat(last) == PARIS.localize(datetime(2024, 6, 1, 12, 0)), \
+            "the skipped slot is recorded so it is not reconsidered"
+    finally:
+        clock.set_clock(None)
+
+
+def test_corrupt_state_counts_as_first_start(tmp_path):
+    state_file = tmp_path / "state.json"
+    state_file.write_text("{trunc")
+    runs = []
+    scheduler = _scheduler(["12:00"], state_file, lambda: runs.append(1))
+    clock.set_clock(VirtualClock(datetime(2024, 6, 1, 12, 30)))
+    try:
+        assert not scheduler.catch_up()
+        assert runs == []
+        json.loads(state_file.read_text())
+    finally:
+        clock.set_clock(None)
+
+
+def test_run_slot_records_before_running(tmp_path):
+    state_file = tmp_path / "state.json"
+    slot = PARIS.localize(datetime(2024, 6, 1, 6, 0))
+    seen = []
+    scheduler = _scheduler(["06:00"], state_file, lambda: seen.append(scheduler._load_last_run()))
+    scheduler.run_slot(slot)
+    assert seen == [slot]
+
+    def failing():
+        raise RuntimeError("job broke")
+    _scheduler(["06:00"], state_file, failing).run_slot(slot + timedelta(days=1))
+    assert scheduler._load_last_run() == slot + timedelta(days=1), "job errors are logged, not raised"
+
+
+if __name__ == "__main__":
+    for test in (test_parse_slot, test_slots_keep_local_time_across_dst, test_slots_in_dst_gaps_and_overlaps,
+                 test_next_and_previous_slot):
+        test()
+        print(f"{test.__name__}: ok")
+    for test in (test_catch_up_within_grace, test_catch_up_skips_outside_grace,
+                 test_corrupt_state_counts_as_first_start, test_run_slot_records_before_running):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+        print(f"{test.__name__}: ok")